@@ -1,33 +1,86 @@
 import logging
+import contextlib
 
 import pandas as pd
 #from collections import defaultdict
 
-def readInputFile (input_file):
+def inputFileStart (input_file, size = 4096):
+
+	# Read the start of the file, streams are returned to the start
+	if isinstance(input_file, str):
+		with open(input_file, 'rb') as input_stream: return input_stream.read(size)
+	file_start = input_file.read(size)
+	input_file.seek(0)
+	return file_start
+
+def sniffInputFile (input_file):
+	'''
+		Assign the content type of an input file
+
+		Parameters
+		----------
+		input_file : str or file-like
+			Filename or binary stream (e.g. from zipfile.ZipFile.open),
+			streams are returned to the start
+
+		Returns
+		-------
+		str
+			Content type: excel, fasta, json, or table
+	'''
+
+	# Read the start of the file
+	file_start = inputFileStart(input_file)
+
+	# Assign the content type, xlsx files are zip archives
+	if file_start.startswith(b'PK\x03\x04'): return 'excel'
+	file_start = file_start.lstrip(b'\xef\xbb\xbf').lstrip()
+	if file_start.startswith(b'>'): return 'fasta'
+	if file_start[:1] in [b'{', b'[']: return 'json'
+	return 'table'
 
-	# Create an empty dataframe
-	input_dataframe = pd.DataFrame()
+def sniffDelimiter (input_file):
 
-	# Try to read an excel input file
-	try: input_dataframe = pd.read_excel(input_file, dtype = str, engine = 'openpyxl')
-	except:
+	# Assign the delimiter using the header, tabs are preferred as quoted values may have commas
+	header_line = inputFileStart(input_file).lstrip(b'\xef\xbb\xbf').splitlines()
+	header_line = header_line[0] if header_line else b''
+	if b'\t' in header_line: return '\t'
+	if b',' in header_line: return ','
+	return '\t'
+
+def inputFilename (input_file):
+
+	# Return the filename, or the name of the stream
+	if isinstance(input_file, str): return input_file
+	return getattr(input_file, 'name', str(input_file))
+
+def openInputFile (input_file):
+
+	# Open the file in binary mode, streams are returned as given (and left open)
+	if isinstance(input_file, str): return open(input_file, 'rb')
+	return contextlib.nullcontext(input_file)
+
+def readInputFile (input_file):
 
-		# Try to read a tsv input file
-		try: input_dataframe = pd.read_csv(input_file, dtype = str, sep = '\t')
-		except:
+	# Assign the format of the file, to read the file once
+	input_type = sniffInputFile(input_file)
+	if input_type not in ['excel', 'table']: raise Exception(f'Unable to parse input file ({input_type}): {inputFilename(input_file)}')
 
-			# Try to read a csv input file
-			try: input_dataframe = pd.read_csv(input_file, dtype = str)
-			except: pass
+	# Read the file, all columns as strings
+	try:
+		if input_type == 'excel': input_dataframe = pd.read_excel(input_file, dtype = str, engine = 'openpyxl')
+		else: input_dataframe = pd.read_csv(input_file, dtype = str, sep = sniffDelimiter(input_file))
+	except Exception as read_error:
+		raise Exception(f'Unable to parse input file: {inputFilename(input_file)}. {read_error}')
 
 	# Return an exception if the input is empty
-	if input_dataframe.empty: raise Exception(f'Unable to parse input file: {input_file}')
+	if input_dataframe.empty: raise Exception(f'Unable to parse input file: {inputFilename(input_file)}')
 
 	# Remove any empty rows
 	input_dataframe = input_dataframe.dropna(axis = 0, how = 'all')
 
 	# Return the dataframe if not empty
-	logging.info(f'Successfully assigned input file: {input_file}')
+	logging.info(f'Successfully assigned input file: {inputFilename(input_file)}')
 	return input_dataframe
 
 
@@ -6,22 +6,22 @@ import argparse
 import logging
 import json
 import copy
+import heapq
+import shutil
+import tempfile
+import multiprocessing
 
 import pandas as pd
 from collections import defaultdict
 
 from kocher_tools.logger import startLogger
 
-def barcodeFilterParser ():
+def barcodeFilterArguments ():
 	'''
-	Barcode Filter Parser
+	Barcode Filter Arguments
 
-	Assign the parameters for the barcode filter.
-
-	Parameters
-	----------
-	sys.argv : list
-		Parameters from command lind
+	Assign the filter parameters, as a parent parser. Shared by the 
+	barcode filter and the barcode pipeline (i.e. --filter).
 
 	Raises
 	------
@@ -42,16 +42,13 @@ def barcodeFilterParser ():
 		'''Create a formmated metavar list for the help output'''
 		return '{' + ', '.join(var_list) + '}'
 
-	filter_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
-
-	# Input file args
-	filter_parser.add_argument('--blast-file', help = 'Filename of the BLAST output', type = str, action = confirmFile(), required = True)
+	filter_parser = argparse.ArgumentParser(add_help = False)
 
 	# Control filters
 	filter_parser.add_argument('--negative-control', help = 'Negative control ID', type = str, nargs = '+')
 	filter_parser.add_argument('--negative-control-file', help = 'File of negative control IDs', type = str, action = confirmFile())
 
-	# Basic filter cutoff args\
+	# Basic filter cutoff args
 	filter_parser.add_argument('--abundance-cutoff', help = 'Read abundance Cutoff', type = int, default = 25)
 	filter_parser.add_argument('--evalue-cutoff', help = 'E-Value Cutoff', type = float, default = 0.00001)
 	filter_parser.add_argument('--coverage-cutoff', help = 'Coverage cutoff - i.e. percentage of sequence aligned', type = float, default = 0.90)
@@ -62,6 +59,52 @@ def barcodeFilterParser ():
 	filter_parser.add_argument('--sort-best-hits-by', metavar = metavarList(sort_by), help = 'Sort method of best hits', choices = sort_by, default = ['percent_ident'], nargs = '+', type = str)
 	filter_parser.add_argument('--dont-merge-species', help = 'Do not merge best hits within a single species', action = 'store_true')
 
+	# Unsorted input args
+	filter_parser.add_argument('--unsorted', help = 'Hits of a query may not be contiguous (e.g. merged BLAST files). Hits are grouped using an external sort, reporting queries by ID', action = 'store_true')
+	filter_parser.add_argument('--memory-budget', help = 'Memory (MB) used to sort hits in memory before they are written to disk (requires --unsorted)', type = float, default = 512)
+	filter_parser.add_argument('--tmp-dir', help = 'Directory of the temporary files used by --unsorted. Default is the system temporary directory', type = str)
+
+	# Filter engine args
+	engines = ('python', 'pandas')
+	filter_parser.add_argument('--engine', metavar = metavarList(engines), help = 'Filter engine. pandas filters the hits in chunks using vectorized operations', choices = engines, default = 'python', type = str)
+	filter_parser.add_argument('--chunk-size', help = 'Number of BLAST rows read per chunk by the pandas engine', type = int, default = 1000000)
+
+	return filter_parser
+
+def barcodeFilterParser ():
+	'''
+	Barcode Filter Parser
+
+	Assign the parameters for the barcode filter.
+
+	Parameters
+	----------
+	sys.argv : list
+		Parameters from command lind
+
+	Raises
+	------
+	IOError
+		If the specified files do not exist
+	'''
+
+	def confirmFile ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	filter_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter, parents = [barcodeFilterArguments()])
+
+	# Input file args
+	filter_parser.add_argument('--blast-file', help = 'Filename of the BLAST output', type = str, action = confirmFile(), required = True)
+
+	# Multi-process args
+	filter_parser.add_argument('--threads', help = 'Number of processes. Input is split into chunks at query boundaries, filtered separately, and merged in input order', type = int, default = 1)
+
 	# Output file args
 	filter_parser.add_argument('--out-prefix', help = 'Output prefix for the BLAST file', type = str, default = 'Filtered_')
 	filter_parser.add_argument('--out-blast', help = 'Output filename for the BLAST file. Overrides --out-prefix', type = str)
@@ -72,6 +115,17 @@ def barcodeFilterParser ():
 	# Return the arguments
 	return filter_parser.parse_args()
 
+def filterKwargsFromArgs (filter_args):
+
+	# Assign the filter arguments, including the negative control IDs
+	return {'negative_control_list': readNegativeControls(filter_args.negative_control, filter_args.negative_control_file),
+			'abundance_cutoff': filter_args.abundance_cutoff,
+			'evalue_cutoff': filter_args.evalue_cutoff,
+			'coverage_cutoff': filter_args.coverage_cutoff,
+			'identity_cutoff': filter_args.identity_cutoff,
+			'sort_best_hits_by': filter_args.sort_best_hits_by,
+			'dont_merge_species': filter_args.dont_merge_species}
+
 def yieldBestHits (blast_reader):
 
 	# Create a string to store the query being filtered
@@ -194,73 +248,104 @@ def sortBestHits (best_hits, method):
 	# Return the sorted best hits
 	return sorted_best_hits
 
-def main():
+def yieldQuerySortedLines (blast_file, memory_budget = 512, tmp_dir = None):
+	'''
+		Yield the lines of a BLAST file sorted by Query ID
+
+		Lines are sorted in memory until the budget is reached, then
+		written to temporary files that are merged. Hits of each query
+		keep their input order.
+
+		Parameters
+		----------
+		blast_file : file
+			BLAST file with a header
+		memory_budget : float
+			Memory (MB) used to store lines before writing to disk
+		tmp_dir : str, optional
+			Directory of the temporary files
+
+		Yields
+		------
+		str
+			Header, then each line of the file
+	'''
 
-	# Assign the barcode args
-	barcode_args = barcodeFilterParser()
+	# Yield the header, then assign the position of the query column
+	blast_header = next(blast_file, None)
+	if blast_header is None: return
+	yield blast_header
+	query_col = blast_header.rstrip('\r\n').split('\t').index('Query ID')
 
-	# Create the log file
-	startLogger(barcode_args.out_log)
+	# Assign the function to return the query of a line
+	def lineQuery (blast_line):
+		return blast_line.split('\t')[query_col]
 
-	# Check if a BLAST output filename was defined
-	if barcode_args.out_blast:
-		
-		# Define the BLAST output filename
-		blast_out_filename = barcode_args.out_blast
+	# Create lists to store the lines in memory and the sorted temporary files
+	blast_lines = []
+	sorted_files = []
 
-		# Get the output dirname
-		out_dirname = os.path.dirname(blast_out_filename)
+	# Create an int to store the memory used by the lines
+	lines_size = 0
 
-		# Define the JSON output filename
-		failed_out_filename = os.path.join(out_dirname, barcode_args.out_failed)
+	# Read the file, line by line
+	for blast_line in blast_file:
 
-	# If not, define using a prefix
-	else:
+		# Skip empty lines
+		if not blast_line.strip(): continue
 
-		# Get the BLAST basename
-		blast_basename = os.path.basename(barcode_args.blast_file)
+		# Confirm the line ends with a newline
+		if not blast_line.endswith('\n'): blast_line += '\n'
 
-		# Get the BLAST dirname
-		blast_dirname = os.path.dirname(barcode_args.blast_file)
+		# Store the line
+		blast_lines.append(blast_line)
+		lines_size += sys.getsizeof(blast_line)
 
-		# Define the BLAST output filename
-		blast_out_filename = os.path.join(blast_dirname, barcode_args.out_prefix + blast_basename)
+		# Check if the memory budget was reached
+		if lines_size >= memory_budget * 1024 * 1024:
 
-		# Define the JSON output filename
-		failed_out_filename = os.path.join(blast_dirname, barcode_args.out_failed)
+			# Sort the lines by query, then write the lines to a temporary file
+			sorted_file = tempfile.TemporaryFile(mode = 'w+', dir = tmp_dir)
+			sorted_file.writelines(sorted(blast_lines, key = lineQuery))
+			sorted_file.seek(0)
+			sorted_files.append(sorted_file)
 
-	# Check if previous output should be overwritten
-	if barcode_args.overwrite:
+			# Clear the lines
+			blast_lines = []
+			lines_size = 0
 
-		# Remove the previous output, if it exists
-		if os.path.exists(blast_out_filename):
-			os.remove(blast_out_filename)
-		if os.path.exists(failed_out_filename):
-			os.remove(failed_out_filename)
+	# Sort the remaining lines
+	blast_lines.sort(key = lineQuery)
 
-	# Check if previous output shouldn't be overwritten
-	else:
+	# Check if no temporary files were needed
+	if not sorted_files: 
+		yield from blast_lines
+		return
 
-		# Check if previous output exists
-		if os.path.exists(blast_out_filename) or os.path.exists(failed_out_filename):
+	logging.info('Merging %s sorted temporary files' % (len(sorted_files) + 1))
 
-			# Raise an exception
-			raise Exception('Output already exists. Please alter the output arguments or use --overwrite')
+	# Merge the files, ties are returned in file order to keep the input order
+	yield from heapq.merge(*sorted_files, blast_lines, key = lineQuery)
+
+	# Close the temporary files
+	for sorted_file in sorted_files: sorted_file.close()
+
+def readNegativeControls (negative_control_ids = [], negative_control_filename = None):
 
 	# Create a list of negative control IDs
 	negative_control_list = []
 
-	# Check if negative control IDs were given on the command line
-	if barcode_args.negative_control:
+	# Check if negative control IDs were given
+	if negative_control_ids:
 
 		# Assign the negative control IDs
-		negative_control_list.extend(barcode_args.negative_control)
+		negative_control_list.extend(negative_control_ids)
 
 	# Check if a file of negative control IDs was given
-	if barcode_args.negative_control_file:
+	if negative_control_filename:
 
 		# Open the file
-		with open(barcode_args.negative_control_file, 'r') as negative_control_file:
+		with open(negative_control_filename, 'r') as negative_control_file:
 
 			# Read the file, line by line
 			for negative_control_line in negative_control_file:
@@ -268,197 +353,232 @@ def main():
 				# Assign the negative control ID
 				negative_control_list.append(negative_control_line.strip())
 
-	# Create a list to store failed sample dictonaries
-	failed_samples_list = []
+	return negative_control_list
 
-	# Open the BLAST input file
-	with open(barcode_args.blast_file) as blast_file:
+def filterBlastHits (blast_reader, negative_control_list = [], abundance_cutoff = 25, evalue_cutoff = 0.00001, coverage_cutoff = 0.90,
+					 identity_cutoff = 0.95, sort_best_hits_by = ['percent_ident'], dont_merge_species = False):
+	'''
+		Filter the best BLAST hits of each query
 
-		# Read the blast using DictReader
-		blast_reader = csv.DictReader(blast_file, delimiter = '\t')
+		Hits are consumed as they are read, allowing the filter to be used
+		on a file or directly on the output of a running BLAST job. Hits
+		of each query are expected to be contiguous, as reported by BLAST.
 
-		# Create the blast output file
-		blast_out_file = open(blast_out_filename, 'w')
+		Parameters
+		----------
+		blast_reader : iterator
+			BLAST hits, as dicts keyed by the BLAST header
 
-		# Create the blast writer using DictReader
-		blast_writer = csv.DictWriter(blast_out_file, fieldnames = blast_reader.fieldnames, delimiter = '\t')
+		Yields
+		------
+		tuple
+			Query ID, list of passed hits, and the failure dict (None if the query did not fail)
+	'''
 
-		# Write the header for the output file
-		blast_writer.writeheader()
+	# Loop each query with its best hits
+	for current_query, best_blast_hits in yieldBestHits(blast_reader):
 
-		# Loop each query with its best hits
-		for current_query, best_blast_hits in yieldBestHits(blast_reader):
+		# Create a list to store the filtered blast hits
+		filtered_blast_hits = []
 
-			# Create a list to store the filtered blast hits
-			filtered_blast_hits = []
+		# Create a variable to store the failure of the query
+		failed_sample_dict = None
 
-			# Save the current ID
-			current_ID = current_query.rsplit('_', 1)[0]
+		# Save the current ID
+		current_ID = current_query.rsplit('_', 1)[0]
 
-			# Save the current abundance
-			current_abundance = int(current_query.split('=')[1])
+		# Save the current abundance
+		current_abundance = int(current_query.split('=')[1])
 
-			# Check if an abundance cutoff was specified
-			if barcode_args.abundance_cutoff:
+		# Check if an abundance cutoff was specified
+		if abundance_cutoff:
 
-				# Check if the current abundance is below the cutoff
-				if current_abundance < barcode_args.abundance_cutoff:
+			# Check if the current abundance is below the cutoff
+			if current_abundance < abundance_cutoff:
 
-					# Save warning message
-					warning_message = 'Insufficent read abundance'
-					
-					# Create dict to hold all relevant information for the failed sample
-					failed_sample_dict = {'Query ID':current_query, 'Status':'Insufficent reads'}
+				# Save warning message
+				warning_message = 'Insufficent read abundance'
+				
+				# Create dict to hold all relevant information for the failed sample
+				failed_sample_dict = {'Query ID':current_query, 'Status':'Insufficent reads'}
 
-					# Add the dict to the list
-					failed_samples_list.append(failed_sample_dict)
+				# Log the failure
+				logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
+
+				yield current_query, [], failed_sample_dict
+
+				continue
+
+		# Loop each best hit
+		for blast_hit in best_blast_hits:
+
+			# Save the current evalue
+			current_evalue = float(blast_hit['E-Value'])
+
+			# Save the current query length
+			current_query_length = float(blast_hit['Query Length'])
+
+			# Save the current alignment length
+			current_alignment_length = float(blast_hit['Alignment Length'])
 
-					# Log the failure
-					logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
+			# Save the current identity
+			current_identity = float(blast_hit['Percent Identity'])
+
+			# Check if an E-Value cutoff was specified
+			if evalue_cutoff:
 
+				# Check if the current evalue is larger than the cutoff
+				if current_evalue > evalue_cutoff:
 					continue
+					
+			# Check if a coverage cutoff was specified
+			if coverage_cutoff:
 
-			# Loop each best hit
-			for blast_hit in best_blast_hits:
+				# Save the percent coverage
+				current_coverage = current_alignment_length / current_query_length
 
-				# Save the current evalue
-				current_evalue = float(blast_hit['E-Value'])
+				# Check if the current coverage is samller than the cutoff
+				if current_coverage < coverage_cutoff:
+					continue
 
-				# Save the current query length
-				current_query_length = float(blast_hit['Query Length'])
+			# Check if an identity cutoff was specified
+			if identity_cutoff:
 
-				# Save the current alignment length
-				current_alignment_length = float(blast_hit['Alignment Length'])
+				# Check if the current identity is smaller than the cutoff
+				if current_identity < identity_cutoff:
+					continue
 
-				# Save the current identity
-				current_identity = float(blast_hit['Percent Identity'])
+			# Add the blast hit to the filtered list, if passed
+			filtered_blast_hits.append(blast_hit)
 
-				# Check if an E-Value cutoff was specified
-				if barcode_args.evalue_cutoff:
+		# Check if no blast hits passed the filter
+		if len(filtered_blast_hits) == 0:
 
-					# Check if the current evalue is larger than the cutoff
-					if current_evalue > barcode_args.evalue_cutoff:
-						continue
-						
-				# Check if a coverage cutoff was specified
-				if barcode_args.coverage_cutoff:
+			# Save warning message
+			warning_message = 'Filtered resulted in the removal of all data'
+			
+			# Create dict to hold all relevant information for the failed sample
+			failed_sample_dict = {'Query ID':current_query, 'Status':'No Hits'}
 
-					# Save the percent coverage
-					current_coverage = current_alignment_length / current_query_length
+			# Log the failure
+			logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
 
-					# Check if the current coverage is samller than the cutoff
-					if current_coverage < barcode_args.coverage_cutoff:
-						continue
+			yield current_query, [], failed_sample_dict
 
-				# Check if an identity cutoff was specified
-				if barcode_args.identity_cutoff:
+			continue
 
-					# Check if the current identity is smaller than the cutoff
-					if current_identity < barcode_args.identity_cutoff:
-						continue
+		# Copy the filtered list before sorting
+		sorted_best_hits = copy.deepcopy(filtered_blast_hits)
 
-				# Add the blast hit to the filtered list, if passed
-				filtered_blast_hits.append(blast_hit)
+		# Loop the sort methods
+		for sort_method in sort_best_hits_by:
 
-			# Check if no blast hits passed the filter
-			if len(filtered_blast_hits) == 0:
+			# Sort the best hits
+			sorted_best_hits = sortBestHits(sorted_best_hits, sort_method)
 
-				# Save warning message
-				warning_message = 'Filtered resulted in the removal of all data'
-				
-				# Create dict to hold all relevant information for the failed sample
-				failed_sample_dict = {'Query ID':current_query, 'Status':'No Hits'}
+		# Check if there is more than one sorted best hit
+		if len(sorted_best_hits) > 1:
 
-				# Add the dict to the list
-				failed_samples_list.append(failed_sample_dict)
+			# Create a list for checking the number of species
+			sorted_species_list = []
 
-				# Log the failure
-				logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
+			# Create a list for checking the number of bins
+			sorted_bin_list = []
 
-			# Copy the filtered list before sorting
-			sorted_best_hits = copy.deepcopy(filtered_blast_hits)
+			# Loop the sorted best hits
+			for sorted_best_hit in sorted_best_hits:
 
-			# Loop the sort methods
-			for sort_method in barcode_args.sort_best_hits_by:
+				# Assign the species of the hit
+				sorted_species = sorted_best_hit['Subject ID'].split('|')[1].replace('_', ' ')
 
-				# Sort the best hits
-				sorted_best_hits = sortBestHits(sorted_best_hits, sort_method)
+				# Append the species to the list
+				sorted_species_list.append(sorted_species)
 
-			# Check if there is more than one sorted best hit
-			if len(sorted_best_hits) > 1:
+				# Assign the bin of the hit
+				sorted_bin = sorted_best_hit['Subject ID'].split('|')[2]
 
-				# Create a list for checking the number of species
-				sorted_species_list = []
+				# Append the bin to the list
+				sorted_bin_list.append(sorted_bin)
 
-				# Create a list for checking the number of bins
-				sorted_bin_list = []
+			# Remove duplicate species
+			sorted_species_list = list(set(sorted_species_list))
 
-				# Loop the sorted best hits
-				for sorted_best_hit in sorted_best_hits:
+			# Remove duplicate bins
+			sorted_bin_list = list(set(sorted_bin_list))
 
-					# Assign the species of the hit
-					sorted_species = sorted_best_hit['Subject ID'].split('|')[1].replace('_', ' ')
+			# Check if a BOLD:N/A was found
+			if 'BOLD:N/A' in sorted_bin_list and len(sorted_bin_list) > 1:
 
-					# Append the species to the list
-					sorted_species_list.append(sorted_species)
+				# Move the BOLD:N/A to the end of the list
+				sorted_bin_list.append(sorted_bin_list.pop(sorted_bin_list.index('BOLD:N/A'))) 
 
-					# Assign the bin of the hit
-					sorted_bin = sorted_best_hit['Subject ID'].split('|')[2]
+			# Check if more than a single species among the best hits
+			if len(sorted_species_list) > 1:
 
-					# Append the bin to the list
-					sorted_bin_list.append(sorted_bin)
+				# Save warning message
+				warning_message = 'Multiple species identified'
+				
+				# Create dict to hold all relevant information for the failed sample
+				failed_sample_dict = {'Query ID':current_query, 'Status':'Ambiguous Hits', 
+				                      'Species':sorted_species_list , 'Bins':sorted_bin_list}
 
-				# Remove duplicate species
-				sorted_species_list = list(set(sorted_species_list))
+				# Log the failure
+				logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
 
-				# Remove duplicate bins
-				sorted_bin_list = list(set(sorted_bin_list))
+				yield current_query, [], failed_sample_dict
 
-				# Check if a BOLD:N/A was found
-				if 'BOLD:N/A' in sorted_bin_list and len(sorted_bin_list) > 1:
+				continue
 
-					# Move the BOLD:N/A to the end of the list
-					sorted_bin_list.append(sorted_bin_list.pop(sorted_bin_list.index('BOLD:N/A'))) 
+			# Check if merging should occur, and if there is only a single species among the best hits
+			elif not dont_merge_species and len(sorted_species_list) == 1:
 
-				# Check if more than a single species among the best hits
-				if len(sorted_species_list) > 1:
+				# Take the first sorted hit, update this later with preferences
+				sorted_best_hits = [sorted_best_hits[0]]
 
-					# Save warning message
-					warning_message = 'Multiple species identified'
-					
-					# Create dict to hold all relevant information for the failed sample
-					failed_sample_dict = {'Query ID':current_query, 'Status':'Ambiguous Hits', 
-					                      'Species':sorted_species_list , 'Bins':sorted_bin_list}
+		# Check if any negative control IDs are assigned
+		if sorted_best_hits and negative_control_list and current_ID in negative_control_list:
 
-					# Add the dict to the list
-					failed_samples_list.append(failed_sample_dict)
+			logging.warning('Negative control (%s) passed filters. Please consider stricter cutoffs' % current_ID)
 
-					# Log the failure
-					logging.warning('%s: %s' % (current_query.split(';')[0], warning_message))
+			yield current_query, [], None
 
-					continue
+			continue
 
-				# Check if merging should occur, and if there is only a single species among the best hits
-				elif not barcode_args.dont_merge_species and len(sorted_species_list) == 1:
+		# Yield the passed hits
+		yield current_query, sorted_best_hits, None
 
-					# Take the first sorted hit, update this later with preferences
-					sorted_best_hits = [sorted_best_hits[0]]
+def writeFilteredHits (blast_reader, blast_fieldnames, blast_out_filename, failed_out_filename, **filter_kwargs):
 
-			# Check if any negative control IDs are assigned
-			if sorted_best_hits and negative_control_list and current_ID in negative_control_list:
+	# Create a list to store failed sample dictonaries
+	failed_samples_list = []
 
-				logging.warning('Negative control (%s) passed filters. Please consider stricter cutoffs' % current_ID)
+	# Create the blast output file
+	with open(blast_out_filename, 'w') as blast_out_file:
 
-				continue
+		# Create the blast writer using DictReader
+		blast_writer = csv.DictWriter(blast_out_file, fieldnames = blast_fieldnames, delimiter = '\t')
 
-			# Loop the sorted best hits
-			for sorted_best_hit in sorted_best_hits:
+		# Write the header for the output file
+		blast_writer.writeheader()
+
+		# Loop each filtered query
+		for current_query, passed_blast_hits, failed_sample_dict in filterBlastHits(blast_reader, **filter_kwargs):
+
+			# Add the failure to the list, if found
+			if failed_sample_dict: failed_samples_list.append(failed_sample_dict)
+
+			# Loop the passed hits
+			for passed_blast_hit in passed_blast_hits:
 
 				# Write the passed blast entry to the output
-				blast_writer.writerow(sorted_best_hit)
+				blast_writer.writerow(passed_blast_hit)
+
+	# Write the failures
+	writeFailedSamples(failed_samples_list, failed_out_filename)
 
-		# Close the output file
-		blast_out_file.close()
+	return failed_samples_list
+
+def writeFailedSamples (failed_samples_list, failed_out_filename):
 
 	# Check if any samples failed to find best hits
 	if failed_samples_list:
@@ -471,5 +591,457 @@ def main():
 		# Dump the failed sample list to the JSON file
 		json.dump(failed_samples_list, json_failed_file, indent = 4)
 
+def filterBlastDataFrame (blast_dataframe, negative_control_list = [], abundance_cutoff = 25, evalue_cutoff = 0.00001, coverage_cutoff = 0.90,
+						  identity_cutoff = 0.95, sort_best_hits_by = ['percent_ident'], dont_merge_species = False):
+	'''
+		Filter the best BLAST hits of each query using vectorized masks
+
+		Columnar version of filterBlastHits, returning identical hits and 
+		failures. Hits of each query are expected to be contiguous, as 
+		reported by BLAST.
+
+		Parameters
+		----------
+		blast_dataframe : pandas.DataFrame
+			BLAST hits, with the values of each column as strings
+
+		Returns
+		-------
+		tuple
+			DataFrame of the passed hits and the list of failure dicts
+	'''
+
+	# Assign the typed columns used by the filter
+	query_ids = blast_dataframe['Query ID']
+	evalues = blast_dataframe['E-Value'].astype(float)
+	query_lengths = blast_dataframe['Query Length'].astype(float)
+	align_lengths = blast_dataframe['Alignment Length'].astype(float)
+	identities = blast_dataframe['Percent Identity'].astype(float)
+
+	# Assign each contiguous block of a query to a group, as in yieldBestHits
+	query_groups = query_ids.ne(query_ids.shift()).cumsum()
+
+	# Create a dataframe to store the status of each group, in input order
+	group_dataframe = pd.DataFrame({'Query ID': query_ids.groupby(query_groups, sort = False).first()})
+	group_dataframe['Status'] = None
+
+	# Assign the hits with the lowest e-value of each group
+	passed_mask = evalues == evalues.groupby(query_groups).transform('min')
+
+	# Check if an abundance cutoff was specified
+	if abundance_cutoff:
+
+		# Assign the groups with insufficent reads
+		group_abundances = group_dataframe['Query ID'].str.split('=').str[1].astype(int)
+		group_dataframe.loc[group_abundances < abundance_cutoff, 'Status'] = 'Insufficent reads'
+
+		# Remove the hits of the failed groups
+		passed_mask &= query_groups.map(group_dataframe['Status'].isnull())
+
+	# Apply the cutoffs, negated to match the comparisons of filterBlastHits
+	if evalue_cutoff: passed_mask &= ~(evalues > evalue_cutoff)
+	if coverage_cutoff: passed_mask &= ~((align_lengths / query_lengths) < coverage_cutoff)
+	if identity_cutoff: passed_mask &= ~(identities < identity_cutoff)
+
+	# Assign the groups without hits that passed the cutoffs
+	group_passed_counts = passed_mask.groupby(query_groups).sum()
+	group_dataframe.loc[group_dataframe['Status'].isnull() & (group_passed_counts == 0), 'Status'] = 'No Hits'
+
+	# Loop the sort methods
+	for sort_method in sort_best_hits_by:
+
+		# Assign the values of the sort method
+		if sort_method == 'percent_ident': sort_values = identities
+		elif sort_method == 'align_len': sort_values = align_lengths
+		else: raise Exception(f'Unknown sort method: {sort_method}')
+
+		# Keep the highest passed value of each group, sortBestHits only reports values from zero
+		group_max_values = sort_values.where(passed_mask).groupby(query_groups).transform('max')
+		passed_mask &= (sort_values == group_max_values) & (sort_values >= 0)
+
+	# Assign the hits of groups with multiple best hits
+	group_hit_counts = passed_mask.groupby(query_groups).transform('sum')
+	multiple_mask = passed_mask & (group_hit_counts > 1)
+
+	# Assign the species and bin of the hits
+	multiple_groups = query_groups[multiple_mask]
+	multiple_subjects = blast_dataframe.loc[multiple_mask, 'Subject ID'].str.split('|')
+	multiple_species = multiple_subjects.str[1].str.replace('_', ' ', regex = False)
+	multiple_bins = multiple_subjects.str[2]
+
+	# Assign the groups with multiple species
+	group_species_counts = multiple_species.groupby(multiple_groups).nunique()
+	ambiguous_groups = group_species_counts.index[group_species_counts > 1]
+	group_dataframe.loc[ambiguous_groups, 'Status'] = 'Ambiguous Hits'
+
+	# Create a dict to store the species and bins of the ambiguous groups
+	ambiguous_dict = {}
+
+	# Loop the ambiguous hits, only a small subset of the hits
+	ambiguous_mask = multiple_groups.isin(ambiguous_groups)
+	for ambiguous_group, ambiguous_species in multiple_species[ambiguous_mask].groupby(multiple_groups[ambiguous_mask], sort = False):
+
+		# Remove duplicate species and bins, as in filterBlastHits
+		sorted_species_list = list(set(ambiguous_species.tolist()))
+		sorted_bin_list = list(set(multiple_bins[ambiguous_species.index].tolist()))
+
+		# Check if a BOLD:N/A was found
+		if 'BOLD:N/A' in sorted_bin_list and len(sorted_bin_list) > 1:
+
+			# Move the BOLD:N/A to the end of the list
+			sorted_bin_list.append(sorted_bin_list.pop(sorted_bin_list.index('BOLD:N/A'))) 
+
+		ambiguous_dict[ambiguous_group] = {'Species':sorted_species_list , 'Bins':sorted_bin_list}
+
+	# Remove the hits of the ambiguous groups
+	passed_mask &= ~query_groups.isin(ambiguous_groups)
+
+	# Check if merging should occur, keeping the first hit of each group
+	if not dont_merge_species:
+		passed_mask &= ~(query_groups.where(passed_mask).duplicated() & passed_mask)
+
+	# Check if any negative control IDs are assigned
+	if negative_control_list:
+
+		# Assign the negative control groups with passed hits
+		group_IDs = group_dataframe['Query ID'].str.rsplit('_', n = 1).str[0]
+		control_groups = group_IDs.index[group_IDs.isin(negative_control_list) & group_IDs.index.isin(query_groups[passed_mask])]
+
+		# Loop the negative control groups
+		for control_group in control_groups:
+			logging.warning('Negative control (%s) passed filters. Please consider stricter cutoffs' % group_IDs[control_group])
+
+		# Remove the hits of the negative controls
+		passed_mask &= ~query_groups.isin(control_groups)
+
+	# Create a list to store failed sample dictonaries
+	failed_samples_list = []
+
+	# Assign the warning message of each status
+	warning_messages = {'Insufficent reads': 'Insufficent read abundance',
+						'No Hits': 'Filtered resulted in the removal of all data',
+						'Ambiguous Hits': 'Multiple species identified'}
+
+	# Loop the failed groups, in input order
+	for failed_group, failed_query, failed_status in group_dataframe[group_dataframe['Status'].notnull()].itertuples():
+
+		# Create dict to hold all relevant information for the failed sample
+		failed_sample_dict = {'Query ID':failed_query, 'Status':failed_status}
+		if failed_status == 'Ambiguous Hits': failed_sample_dict.update(ambiguous_dict[failed_group])
+
+		# Add the dict to the list
+		failed_samples_list.append(failed_sample_dict)
+
+		# Log the failure
+		logging.warning('%s: %s' % (failed_query.split(';')[0], warning_messages[failed_status]))
+
+	return blast_dataframe[passed_mask], failed_samples_list
+
+def writeFilteredDataFrame (blast_filename, blast_out_filename, failed_out_filename, chunk_size = 1000000, **filter_kwargs):
+
+	# Create a list to store failed sample dictonaries
+	failed_samples_list = []
+
+	# Create a dataframe to store the hits of the last query of the previous chunk
+	carried_dataframe = None
+
+	# Create the blast output file
+	with open(blast_out_filename, 'w') as blast_out_file:
+
+		# Create the blast writer, formatted as in writeFilteredHits
+		blast_writer = csv.writer(blast_out_file, delimiter = '\t')
+
+		# Read the BLAST file in chunks, keeping the values as strings
+		for blast_dataframe in pd.read_csv(blast_filename, sep = '\t', dtype = str, na_filter = False, chunksize = chunk_size):
+
+			# Write the header for the output file
+			if carried_dataframe is None: blast_writer.writerow(blast_dataframe.columns)
+
+			# Add the hits carried from the previous chunk
+			else: blast_dataframe = pd.concat([carried_dataframe, blast_dataframe], ignore_index = True)
+
+			# Skip empty chunks, i.e. a file without hits
+			if blast_dataframe.empty:
+				carried_dataframe = blast_dataframe
+				continue
+
+			# Carry the last query, as its hits may continue in the next chunk
+			query_groups = blast_dataframe['Query ID'].ne(blast_dataframe['Query ID'].shift()).cumsum()
+			last_query_mask = query_groups == query_groups.iloc[-1]
+			carried_dataframe = blast_dataframe[last_query_mask]
+
+			# Filter the complete queries of the chunk
+			passed_dataframe, chunk_failed_list = filterBlastDataFrame(blast_dataframe[~last_query_mask], **filter_kwargs)
+			blast_writer.writerows(passed_dataframe.values.tolist())
+			failed_samples_list.extend(chunk_failed_list)
+
+		# Filter the last query
+		if carried_dataframe is not None and not carried_dataframe.empty:
+			passed_dataframe, chunk_failed_list = filterBlastDataFrame(carried_dataframe, **filter_kwargs)
+			blast_writer.writerows(passed_dataframe.values.tolist())
+			failed_samples_list.extend(chunk_failed_list)
+
+	# Write the failures
+	writeFailedSamples(failed_samples_list, failed_out_filename)
+
+	return failed_samples_list
+
+def queryChunkOffsets (blast_filename, chunk_count):
+	'''
+		Split a BLAST file into byte ranges at query boundaries
+
+		Parameters
+		----------
+		blast_filename : str
+			BLAST file with a header
+		chunk_count : int
+			Number of ranges requested, fewer may be returned
+
+		Returns
+		-------
+		list
+			Start and end byte offset of each range, in file order
+	'''
+
+	# Open the BLAST file as bytes, to seek within the file
+	with open(blast_filename, 'rb') as blast_file:
+
+		# Assign the position of the query column, and the end of the header
+		query_col = blast_file.readline().rstrip(b'\r\n').split(b'\t').index(b'Query ID')
+		header_end = blast_file.tell()
+
+		# Assign the end of the file
+		file_end = blast_file.seek(0, os.SEEK_END)
+
+		# Create a list to store the start of each range
+		chunk_starts = [header_end]
+
+		# Loop the requested boundaries
+		for chunk_pos in range(1, chunk_count):
+
+			# Move to the first full line after the requested boundary
+			blast_file.seek(max(header_end + ((file_end - header_end) * chunk_pos // chunk_count), chunk_starts[-1]))
+			blast_file.readline()
+
+			# Assign the query of the line
+			boundary_line = blast_file.readline()
+			if not boundary_line: break
+			boundary_query = boundary_line.split(b'\t')[query_col]
+
+			# Read until the next query, then assign the start of its line
+			while boundary_line and boundary_line.split(b'\t')[query_col] == boundary_query:
+				chunk_start = blast_file.tell()
+				boundary_line = blast_file.readline()
+			if not boundary_line: break
+
+			chunk_starts.append(chunk_start)
+
+	# Return the ranges
+	return list(zip(chunk_starts, chunk_starts[1:] + [file_end]))
+
+def filterBlastChunk (blast_filename, chunk_start, chunk_end, chunk_out_filename, filter_kwargs):
+
+	# Create a list to store failed sample dictonaries
+	failed_samples_list = []
+
+	# Open the BLAST file as bytes, to seek within the file
+	with open(blast_filename, 'rb') as blast_file:
+
+		# Assign the header
+		blast_fieldnames = next(csv.reader([blast_file.readline().decode()], delimiter = '\t'))
+
+		# Move to the start of the chunk
+		blast_file.seek(chunk_start)
+
+		# Assign the function to read the lines of the chunk
+		def yieldChunkLines ():
+			while blast_file.tell() < chunk_end:
+				yield blast_file.readline().decode()
+
+		# Read the chunk using DictReader
+		blast_reader = csv.DictReader(yieldChunkLines(), fieldnames = blast_fieldnames, delimiter = '\t')
+
+		# Create the chunk output file
+		with open(chunk_out_filename, 'w') as chunk_out_file:
+
+			# Create the blast writer using DictReader
+			blast_writer = csv.DictWriter(chunk_out_file, fieldnames = blast_fieldnames, delimiter = '\t')
+
+			# Loop each filtered query
+			for current_query, passed_blast_hits, failed_sample_dict in filterBlastHits(blast_reader, **filter_kwargs):
+
+				# Add the failure to the list, if found
+				if failed_sample_dict: failed_samples_list.append(failed_sample_dict)
+
+				# Write the passed blast entries to the output
+				blast_writer.writerows(passed_blast_hits)
+
+	return failed_samples_list
+
+def writeFilteredChunks (blast_filename, blast_out_filename, failed_out_filename, threads, tmp_dir = None, **filter_kwargs):
+
+	# Split the file into ranges, using more ranges than processes to balance the work
+	chunk_offsets = queryChunkOffsets(blast_filename, threads * 4)
+
+	# Create a temporary directory to store the output of each range
+	chunk_dir = tempfile.mkdtemp(dir = tmp_dir)
+	chunk_out_filenames = [os.path.join(chunk_dir, 'chunk_%s.out' % chunk_pos) for chunk_pos in range(len(chunk_offsets))]
+
+	logging.info('Filtering %s chunks using %s processes' % (len(chunk_offsets), threads))
+
+	# Filter the ranges, the results are returned in input order
+	with multiprocessing.Pool(threads) as chunk_pool:
+		chunk_failed_lists = chunk_pool.starmap(filterBlastChunk, [(blast_filename, chunk_start, chunk_end, chunk_out_filename, filter_kwargs) for (chunk_start, chunk_end), chunk_out_filename in zip(chunk_offsets, chunk_out_filenames)])
+
+	# Create the blast output file
+	with open(blast_out_filename, 'w') as blast_out_file:
+
+		# Write the header for the output file
+		with open(blast_filename) as blast_file:
+			csv.DictWriter(blast_out_file, fieldnames = csv.DictReader(blast_file, delimiter = '\t').fieldnames, delimiter = '\t').writeheader()
+
+		# Copy the passed hits of each range
+		for chunk_out_filename in chunk_out_filenames:
+			with open(chunk_out_filename, newline = '') as chunk_out_file:
+				shutil.copyfileobj(chunk_out_file, blast_out_file)
+
+	# Remove the temporary directory
+	shutil.rmtree(chunk_dir)
+
+	# Merge the failures of each range
+	failed_samples_list = [failed_sample_dict for chunk_failed_list in chunk_failed_lists for failed_sample_dict in chunk_failed_list]
+
+	# Write the failures
+	writeFailedSamples(failed_samples_list, failed_out_filename)
+
+	return failed_samples_list
+
+def filterBlastFile (blast_filename, blast_out_filename, failed_out_filename, engine = 'python', threads = 1, unsorted = False, memory_budget = 512, tmp_dir = None, chunk_size = 1000000, **filter_kwargs):
+	'''
+	Filter a BLAST file, then write the passed hits and failures
+
+	Parameters
+	----------
+	blast_filename : str
+		Filename of the BLAST output
+	blast_out_filename : str
+		Output filename for the passed hits
+	failed_out_filename : str
+		Output filename for the failures json file
+	engine : str, optional
+		Filter engine: python or pandas
+	threads : int, optional
+		Number of processes (python engine only)
+	unsorted : bool, optional
+		Defines if the hits of a query may not be contiguous
+	memory_budget : float, optional
+		Memory (MB) used to sort unsorted hits
+	tmp_dir : str, optional
+		Directory of the temporary files
+	chunk_size : int, optional
+		Number of BLAST rows read per chunk (pandas engine only)
+	'''
+
+	# Check if the input should be sorted for the methods that read the file directly
+	sorted_blast_filename = None
+	if unsorted and (engine == 'pandas' or threads > 1):
+
+		# Write the sorted hits to a temporary file
+		with open(blast_filename) as blast_file, tempfile.NamedTemporaryFile(mode = 'w', dir = tmp_dir, suffix = '.out', delete = False) as sorted_blast_file:
+			sorted_blast_file.writelines(yieldQuerySortedLines(blast_file, memory_budget, tmp_dir))
+
+		# Filter the sorted hits
+		sorted_blast_filename = sorted_blast_file.name
+		blast_filename = sorted_blast_filename
+
+	# Check if the pandas engine should be used
+	if engine == 'pandas':
+
+		# Filter the hits in chunks, then write the passed hits and failures
+		writeFilteredDataFrame(blast_filename, blast_out_filename, failed_out_filename, chunk_size = chunk_size, **filter_kwargs)
+
+	# Check if multiple processes should be used
+	elif threads > 1:
+
+		# Filter the hits in ranges, then write the passed hits and failures
+		writeFilteredChunks(blast_filename, blast_out_filename, failed_out_filename, threads, tmp_dir = tmp_dir, **filter_kwargs)
+
+	else:
+
+		# Open the BLAST input file
+		with open(blast_filename) as blast_file:
+
+			# Read the blast using DictReader, sorting by query if needed
+			if unsorted: blast_reader = csv.DictReader(yieldQuerySortedLines(blast_file, memory_budget, tmp_dir), delimiter = '\t')
+			else: blast_reader = csv.DictReader(blast_file, delimiter = '\t')
+
+			# Filter the hits, then write the passed hits and failures
+			writeFilteredHits(blast_reader, blast_reader.fieldnames, blast_out_filename, failed_out_filename, **filter_kwargs)
+
+	# Remove the sorted hits, if created
+	if sorted_blast_filename: os.remove(sorted_blast_filename)
+
+def main():
+
+	# Assign the barcode args
+	barcode_args = barcodeFilterParser()
+
+	# Create the log file
+	startLogger(barcode_args.out_log)
+
+	# Check the engine supports multiple processes
+	if barcode_args.threads > 1 and barcode_args.engine == 'pandas':
+		raise Exception('--threads is only supported by the python engine')
+
+	# Check if a BLAST output filename was defined
+	if barcode_args.out_blast:
+		
+		# Define the BLAST output filename
+		blast_out_filename = barcode_args.out_blast
+
+		# Get the output dirname
+		out_dirname = os.path.dirname(blast_out_filename)
+
+		# Define the JSON output filename
+		failed_out_filename = os.path.join(out_dirname, barcode_args.out_failed)
+
+	# If not, define using a prefix
+	else:
+
+		# Get the BLAST basename
+		blast_basename = os.path.basename(barcode_args.blast_file)
+
+		# Get the BLAST dirname
+		blast_dirname = os.path.dirname(barcode_args.blast_file)
+
+		# Define the BLAST output filename
+		blast_out_filename = os.path.join(blast_dirname, barcode_args.out_prefix + blast_basename)
+
+		# Define the JSON output filename
+		failed_out_filename = os.path.join(blast_dirname, barcode_args.out_failed)
+
+	# Check if previous output should be overwritten
+	if barcode_args.overwrite:
+
+		# Remove the previous output, if it exists
+		if os.path.exists(blast_out_filename):
+			os.remove(blast_out_filename)
+		if os.path.exists(failed_out_filename):
+			os.remove(failed_out_filename)
+
+	# Check if previous output shouldn't be overwritten
+	else:
+
+		# Check if previous output exists
+		if os.path.exists(blast_out_filename) or os.path.exists(failed_out_filename):
+
+			# Raise an exception
+			raise Exception('Output already exists. Please alter the output arguments or use --overwrite')
+
+	# Filter the hits, then write the passed hits and failures
+	filterBlastFile(barcode_args.blast_file, blast_out_filename, failed_out_filename, engine = barcode_args.engine, threads = barcode_args.threads, 
+					unsorted = barcode_args.unsorted, memory_budget = barcode_args.memory_budget, tmp_dir = barcode_args.tmp_dir, 
+					chunk_size = barcode_args.chunk_size, **filterKwargsFromArgs(barcode_args))
+
 if __name__== "__main__":
 	main()
\ No newline at end of file
@@ -8,7 +8,8 @@ import multiprocessing
 import pkg_resources
 
 from kocher_tools.multiplex import Multiplex
-from kocher_tools.blast import blastTopHits
+from kocher_tools.blast import blastTopHits, yieldBlastTopHits, top_hits_header
+from kocher_tools.barcode_filter import barcodeFilterArguments, filterKwargsFromArgs, filterBlastFile, writeFilteredHits
 from kocher_tools.logger import startLogger, logArgs
 
 def barcodePipelineParser ():
@@ -37,7 +38,7 @@ def barcodePipelineParser ():
 				setattr(args, self.dest, value)
 		return customAction
 
-	pipeline_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+	pipeline_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter, parents = [barcodeFilterArguments()])
 
 	# Map files
 	pipeline_parser.add_argument('--i5-map', help = 'Defines the filename of the i5 map', type = str, action = parser_confirm_file(), required = True)
@@ -58,6 +59,8 @@ def barcodePipelineParser ():
 	pipeline_parser.add_argument('--out-dir', help = 'Defines the output directory', type = str, default = 'Pipeline_Output')
 	pipeline_parser.add_argument('--out-compiled', help = 'Defines the filename of the compiled reads (i.e. most abundant)', type = str, default = 'Common.fasta')
 	pipeline_parser.add_argument('--out-blast', help = 'Defines the filename of the BLAST output', type = str, default = 'BLAST.out')
+	pipeline_parser.add_argument('--out-filtered', help = 'Defines the filename of the filtered BLAST output (requires --filter)', type = str, default = 'Filtered_BLAST.out')
+	pipeline_parser.add_argument('--out-failed', help = 'Defines the filename of the BLAST failures json file (requires --filter)', type = str, default = 'barcode_failures.json')
 	pipeline_parser.add_argument('--out-log', help = 'Defines the filename of the log file', type = str, default = 'barcode_pipeline.log')
 	pipeline_parser.add_argument('--overwrite', help = 'Defines if previous output should be overwritten', action = 'store_true')
 
@@ -65,6 +68,9 @@ def barcodePipelineParser ():
 	pipeline_parser.add_argument('--threads', help = 'Defines the number of threads. Default is all available threads', type = int, default = multiprocessing.cpu_count())
 	pipeline_parser.add_argument('--blast-database', help = 'Defines the blast database. Default is the COI database', type = str, default = 'BLAST_DBs/Filtered_BOLD.fasta')
 
+	# Filter arguments, the remaining filter arguments are shared with barcode_filter.py
+	pipeline_parser.add_argument('--filter', help = 'Filter the BLAST hits (see barcode_filter.py). Hits are filtered as they are reported, unless using --unsorted or the pandas engine. The python engine filters --unsorted hits using --threads processes', action = 'store_true')
+
 	# Return the arguments
 	return pipeline_parser.parse_args()
 
@@ -178,12 +184,44 @@ def main():
 	# Compile the most abundant reads into a single file
 	demultiplex_job.compileMostAbundant(compiled_file_path)
 
-	logging.info('Starting BLAST')
+	# Check if the BLAST hits should be filtered
+	if barcode_args.filter:
+
+		logging.info('Starting BLAST and filter')
+
+		# Assign the filtered output file paths
+		filtered_file_path = os.path.join(barcode_args.out_dir, barcode_args.out_filtered)
+		failed_file_path = os.path.join(barcode_args.out_dir, barcode_args.out_failed)
+
+		# Check if the hits may be filtered as they are reported
+		if barcode_args.engine == 'python' and not barcode_args.unsorted:
+
+			# Get the top BLAST hits for each sequence in the compiled file, as they are reported
+			blast_reader = yieldBlastTopHits(compiled_file_path, barcode_args.blast_database, barcode_args.threads, blast_output = blast_file_path)
+
+			# Filter the hits, then write the passed hits and failures
+			writeFilteredHits(blast_reader, top_hits_header, filtered_file_path, failed_file_path, **filterKwargsFromArgs(barcode_args))
+
+		else:
+
+			# Assign the filter processes, multiple processes are only supported by the python engine
+			filter_threads = barcode_args.threads if barcode_args.engine == 'python' else 1
+
+			# Get the top BLAST hits for each sequence in the compiled file, then filter the BLAST file
+			blastTopHits(compiled_file_path, blast_file_path, barcode_args.blast_database, barcode_args.threads)
+			filterBlastFile(blast_file_path, filtered_file_path, failed_file_path, engine = barcode_args.engine, threads = filter_threads, unsorted = barcode_args.unsorted, 
+							memory_budget = barcode_args.memory_budget, tmp_dir = barcode_args.tmp_dir, chunk_size = barcode_args.chunk_size, **filterKwargsFromArgs(barcode_args))
+
+		logging.info('Finished BLAST and filter')
+
+	else:
+
+		logging.info('Starting BLAST')
 
-	# Get the top BLAST hits for each sequence in the compiled file
-	blastTopHits(compiled_file_path, blast_file_path, barcode_args.blast_database, barcode_args.threads)
+		# Get the top BLAST hits for each sequence in the compiled file
+		blastTopHits(compiled_file_path, blast_file_path, barcode_args.blast_database, barcode_args.threads)
 
-	logging.info('Finished BLAST')
+		logging.info('Finished BLAST')
 
 if __name__== "__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+import sys
+import json
+import queue
+import time
+import socket
+import logging
+import platform
+import datetime
+import resource
+import traceback
+import multiprocessing
+
+import kocher_tools
+
+def peakMemoryMB (who = resource.RUSAGE_SELF):
+
+	# Convert the max resident set size to MB, linux reports KB and macOS reports bytes
+	max_rss = resource.getrusage(who).ru_maxrss
+	if sys.platform == 'darwin': return max_rss / (1024 * 1024)
+	return max_rss / 1024
+
+def _benchmarkWorker (benchmark_queue, benchmark_function, benchmark_args, benchmark_kwargs):
+
+	try:
+
+		# Time the function
+		start_time = time.perf_counter()
+		benchmark_return = benchmark_function(*benchmark_args, **benchmark_kwargs)
+		elapsed_seconds = time.perf_counter() - start_time
+
+		# Report the peak memory of this process and any external executables it called
+		benchmark_queue.put({'status': 'ok',
+							 'seconds': elapsed_seconds,
+							 'peak_memory_mb': max(peakMemoryMB(resource.RUSAGE_SELF), peakMemoryMB(resource.RUSAGE_CHILDREN)),
+							 'returned': benchmark_return})
+
+	except Exception as benchmark_error:
+		benchmark_queue.put({'status': 'failed', 'error': str(benchmark_error), 'traceback': traceback.format_exc()})
+
+def timeFunction (benchmark_function, *benchmark_args, poll_seconds = 1, **benchmark_kwargs):
+	'''
+		Time a function within a new process
+
+		Running within a new process isolates the peak memory of each
+		benchmark, including the external executables it calls.
+
+		Parameters
+		----------
+		benchmark_function : function
+			Function to benchmark, must be picklable
+		poll_seconds : float, optional
+			Seconds between checks that the benchmark process is alive
+
+		Returns
+		-------
+		dict
+			Status, seconds, peak memory (MB), and the value returned by
+			the function. Processes killed without reporting (e.g. out of
+			memory) are failed with their exit code
+	'''
+
+	# Start the benchmark process
+	benchmark_queue = multiprocessing.Queue()
+	benchmark_process = multiprocessing.Process(target = _benchmarkWorker, args = (benchmark_queue, benchmark_function, benchmark_args, benchmark_kwargs))
+	benchmark_process.start()
+
+	# Wait for the results while the process is alive, as a killed process never reports
+	benchmark_results = None
+	while benchmark_results is None and benchmark_process.is_alive():
+		try:
+			benchmark_results = benchmark_queue.get(timeout = poll_seconds)
+		except queue.Empty:
+			pass
+
+	# Check for results reported just before the process exited
+	if benchmark_results is None:
+		try:
+			benchmark_results = benchmark_queue.get(timeout = poll_seconds)
+		except queue.Empty:
+			pass
+
+	# Wait for the process
+	benchmark_process.join()
+
+	# Report the exit code, if the process exited without a result
+	if benchmark_results is None:
+		benchmark_results = {'status': 'failed', 'error': f'Benchmark process exited without a result (exit code: {benchmark_process.exitcode})', 'exitcode': benchmark_process.exitcode}
+
+	# Log the failure, if found
+	if benchmark_results['status'] == 'failed': logging.warning(f'Benchmark failed: {benchmark_results["error"]}')
+
+	return benchmark_results
+
+def benchmarkMetadata ():
+
+	# Return the information needed to compare results between releases
+	return {'kocher_tools_version': kocher_tools.__version__,
+			'created': datetime.datetime.now().isoformat(timespec = 'seconds'),
+			'host': socket.gethostname(),
+			'platform': platform.platform(),
+			'python': platform.python_version(),
+			'cpu_count': multiprocessing.cpu_count()}
+
+def writeBenchmarkJSON (json_filename, benchmark_settings, benchmark_results):
+
+	# Create the JSON data
+	json_data = benchmarkMetadata()
+	json_data['settings'] = benchmark_settings
+	json_data['results'] = benchmark_results
+
+	# Write the JSON file
+	with open(json_filename, 'w') as json_file:
+		json.dump(json_data, json_file, indent = 4, default = str)
+
+	logging.info(f'Benchmark results written to: {json_filename}')
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+import os
+import sys
+import csv
+import yaml
+import argparse
+import shutil
+import logging
+import tempfile
+
+from sqlalchemy import inspect
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from kocher_tools.synthetic_database import SyntheticDatabase
+from kocher_tools.output import columnar_formats, pyarrow
+from kocher_tools.benchmark import timeFunction, writeBenchmarkJSON
+from kocher_tools.logger import startLogger, logArgs
+
+# Foreign keys added to the schema (if not defined) to join the tables
+benchmark_foreign_keys = {'storage': {'unique_id': 'collection.unique_id'},
+						  'sequencing': {'sample_id': 'storage.sample_id'}}
+
+def benchmarkParser ():
+	'''
+	Database Benchmark Parser
+
+	Assign the parameters for the database benchmark
+
+	Parameters
+	----------
+	sys.argv : list
+		Parameters from command lind
+
+	Raises
+	------
+	IOError
+		If the specified files do not exist
+	'''
+
+	def parser_confirm_file ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	def metavarList (var_list):
+		'''Create a formmated metavar list for the help output'''
+		return '{' + ', '.join(var_list) + '}'
+
+	benchmark_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+
+	# Database arguments
+	benchmark_parser.add_argument('--yaml', dest = 'config_file', help = 'Defines the database YAML config file of the schema (e.g. testDB_large.yml). The sql section is replaced', type = str, required = True, action = parser_confirm_file())
+	benchmark_parser.add_argument('--postgresql-yaml', help = 'Defines a YAML config file with the sql section of a scratch PostgreSQL database. Benchmarks SQLite only if not given', type = str, action = parser_confirm_file())
+
+	# Simulation arguments
+	benchmark_parser.add_argument('--rows', help = 'Defines the number of simulated samples. Multiple values run multiple benchmarks', type = int, nargs = '+', default = [10000, 100000, 1000000])
+	benchmark_parser.add_argument('--row-insert-rows', help = 'Defines the maximum number of rows inserted one at a time', type = int, default = 10000)
+	benchmark_parser.add_argument('--seq-len', help = 'Defines the length of the simulated sequences', type = int, default = 150)
+	benchmark_parser.add_argument('--seed', help = 'Defines the random seed', type = int, default = 1)
+
+	# Benchmark arguments
+	operation_types = ('row_insert', 'bulk_insert', 'insert_ignore', 'update', 'select_in', 'select_like', 'export')
+	benchmark_parser.add_argument('--operations', metavar = metavarList(operation_types), help = 'Defines the operations to benchmark. The tables are always populated using bulk inserts', type = str, choices = operation_types, nargs = '+', default = list(operation_types))
+	export_formats = ['tsv'] + columnar_formats
+	benchmark_parser.add_argument('--export-format', metavar = metavarList(export_formats), help = 'Defines the format of the export benchmark. Columnar formats require pyarrow', type = str, choices = export_formats, default = 'tsv')
+
+	# Output arguments
+	benchmark_parser.add_argument('--out-dir', help = 'Defines the working directory. Default is a temporary directory', type = str)
+	benchmark_parser.add_argument('--out-json', help = 'Defines the filename of the benchmark results', type = str, default = 'database_benchmark.json')
+	benchmark_parser.add_argument('--out-log', help = 'Defines the filename of the log file', type = str, default = 'database_benchmark.log')
+	benchmark_parser.add_argument('--keep-output', help = 'Defines if the databases and exported files should be kept', action = 'store_true')
+	benchmark_parser.add_argument('--overwrite', help = 'Defines if previous output (including benchmark tables within PostgreSQL) should be overwritten', action = 'store_true')
+
+	# Return the arguments
+	return benchmark_parser.parse_args()
+
+def writeBenchmarkConfig (config_filename, sql_dict, out_filename):
+
+	# Read the schema, then replace the sql section
+	with open(config_filename) as config_file: config_yaml = yaml.load(config_file, Loader = yaml.FullLoader)
+	config_yaml['sql'] = sql_dict
+
+	# Add the foreign keys used to join the tables, if not defined
+	config_tables = config_yaml['database']['tables']
+	for table, foreign_keys in benchmark_foreign_keys.items():
+		if table not in config_tables: raise Exception(f'Unable to benchmark, table not found: {table}')
+		for column, parent_key in foreign_keys.items():
+			if column not in config_tables[table]: raise Exception(f'Unable to benchmark, column not found: {table}.{column}')
+			if 'foreign_key' not in config_tables[table][column]: config_tables[table][column]['foreign_key'] = {'parent_key': parent_key}
+
+	# Write the config
+	with open(out_filename, 'w') as out_file: yaml.dump(config_yaml, out_file, sort_keys = False)
+	return out_filename
+
+def createBenchmarkTables (config_data, overwrite):
+
+	# Create the engine, only used to create the tables
+	sql_engine = createEngineFromConfig(config_data)
+
+	# Check for previous tables, to avoid removing data
+	previous_tables = set(inspect(sql_engine).get_table_names(schema = config_data.schema)) & set(config_data.tables)
+	if previous_tables:
+		if not overwrite: raise Exception(f'Found tables: {", ".join(sorted(previous_tables))}. Please use a scratch database or use --overwrite')
+		config_data.meta.drop_all(sql_engine)
+
+	createAllFromConfig(config_data, sql_engine)
+	sql_engine.dispose()
+
+def dropBenchmarkTables (config_data):
+
+	# Drop the tables created by the benchmark
+	sql_engine = createEngineFromConfig(config_data)
+	config_data.meta.drop_all(sql_engine)
+	sql_engine.dispose()
+
+def rowInsertBenchmark (config_filename, table, dataframe):
+
+	# Insert each row using a single statement
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	for row_dict in dataframe.to_dict('records'):
+		sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
+		sql_insert.addTableToInsert(config_data[table])
+		sql_insert.addDictValues(row_dict)
+		sql_insert.insert()
+	sql_connection.commit()
+	sql_connection.close()
+	return len(dataframe)
+
+def bulkInsertBenchmark (config_filename, table, dataframe):
+
+	# Insert the dataframe using the bulk loader of the database
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	bulk_loader = BulkLoader.fromConfig(config_data, sql_connection)
+	with bulk_loader.fastLoad():
+		bulk_loader.load(config_data[table], dataframe)
+		sql_connection.commit()
+	sql_connection.close()
+	return len(dataframe)
+
+def insertIgnoreBenchmark (config_filename, table, dataframe, ignore_col):
+
+	# Insert the dataframe, ignoring conflicts
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
+	sql_insert.addTableToInsert(config_data[table])
+	sql_insert.addDataFrameValues(dataframe)
+	sql_insert.addIgnore(ignore_col)
+	sql_insert.bulkInsertIgnore()
+	sql_connection.commit()
+	sql_connection.close()
+	return len(dataframe)
+
+def updateBenchmark (config_filename, table, dataframe, key_col):
+
+	# Update the rows using the key column
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	sql_update = SQLUpdate.fromConfig(config_data, sql_connection)
+	sql_update.addTableToUpdate(config_data[table])
+	sql_update.addDataFrameValues(dataframe, key_col)
+	sql_update.bulkUpdate()
+	sql_connection.commit()
+	sql_connection.close()
+	return len(dataframe)
+
+def selectBenchmark (config_filename, tables, where_dict, cmp_type):
+
+	# Select from the joined tables
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+	for table in tables: sql_select.addTableToSelect(config_data[table])
+	sql_select.addDictWhere(where_dict, include = True, cmp_type = cmp_type, dict_type = 'Table')
+	sql_select.select()
+	sql_connection.close()
+	return len(sql_select.select_results)
+
+def exportBenchmark (config_filename, tables, out_filename, out_format = 'tsv'):
+
+	# Export the joined tables
+	config_data = ConfigDB.readConfig(config_filename)
+	sql_connection = startSessionFromConfig(config_data)
+	sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+	for table in tables: sql_select.addTableToSelect(config_data[table])
+	if out_format in columnar_formats: sql_select.toColumnarFile(out_filename, out_format)
+	else: sql_select.toFileChunks(out_filename, '\t')
+	sql_connection.close()
+
+	# Return the exported rows of columnar files, from the file metadata
+	if out_format == 'parquet': return pyarrow.parquet.ParquetFile(out_filename).metadata.num_rows
+	elif out_format == 'feather':
+		with pyarrow.ipc.open_file(out_filename) as columnar_file: return sum(columnar_file.get_batch(batch_pos).num_rows for batch_pos in range(columnar_file.num_record_batches))
+
+	# Return the exported rows, without the header. Sequences are quoted as they span lines
+	with open(out_filename, newline = '') as out_file: return sum(1 for _ in csv.reader(out_file, delimiter = '\t')) - 1
+
+def main():
+
+	# Assign the benchmark arguments
+	benchmark_args = benchmarkParser()
+
+	# Check for previous output
+	if os.path.isfile(benchmark_args.out_json) and not benchmark_args.overwrite:
+		raise Exception(f'Found benchmark results: {benchmark_args.out_json}. Please rename using --out-json or use --overwrite')
+
+	# Start the log
+	startLogger(benchmark_args.out_log)
+	logArgs(benchmark_args)
+
+	# Assign the working directory
+	if benchmark_args.out_dir:
+		if os.path.isdir(benchmark_args.out_dir):
+			if benchmark_args.overwrite: shutil.rmtree(benchmark_args.out_dir)
+			else: raise Exception(f'{benchmark_args.out_dir} already exists. Please alter --out-dir or use --overwrite')
+		os.makedirs(benchmark_args.out_dir)
+		work_dir = benchmark_args.out_dir
+	else: work_dir = tempfile.mkdtemp()
+
+	# Assign the sql section of each backend
+	backend_sql = {'sqlite': None}
+	if benchmark_args.postgresql_yaml:
+		with open(benchmark_args.postgresql_yaml) as postgresql_file: backend_sql['postgresql'] = yaml.load(postgresql_file, Loader = yaml.FullLoader)['sql']
+
+	# Assign the tables joined for the selections
+	join_tables = ['collection', 'storage', 'sequencing']
+
+	# Create a list to store the results
+	benchmark_results = []
+
+	# Loop the backends and row counts
+	for backend, sql_dict in backend_sql.items():
+		for row_count in benchmark_args.rows:
+
+			# Assign the basic result information
+			backend_result = {'backend': backend, 'rows': row_count}
+
+			# Create the config and tables, skipping the backend if not possible
+			try:
+				if backend == 'sqlite': sql_dict = {'type': 'sqlite', 'filename': os.path.abspath(os.path.join(work_dir, f'benchmark_{row_count}.sqlite'))}
+				elif sql_dict.get('type') != backend: raise Exception(f'Database type is not {backend}: {sql_dict.get("type")}')
+				config_filename = writeBenchmarkConfig(benchmark_args.config_file, sql_dict, os.path.join(work_dir, f'benchmark_{backend}_{row_count}.yml'))
+				config_data = ConfigDB.readConfig(config_filename)
+				createBenchmarkTables(config_data, benchmark_args.overwrite)
+			except Exception as backend_error:
+				logging.warning(f'Skipping {backend}: {backend_error}')
+				benchmark_results.append(dict(backend_result, status = 'skipped', error = str(backend_error)))
+				continue
+
+			# Simulate the data
+			simulation_job = SyntheticDatabase(rows = row_count, seq_len = benchmark_args.seq_len, seed = benchmark_args.seed)
+			table_dataframes = {'collection': simulation_job.collectionDataFrame(),
+								'boxes': simulation_job.boxesDataFrame(),
+								'plates': simulation_job.platesDataFrame(),
+								'storage': simulation_job.storageDataFrame(),
+								'sequencing': simulation_job.sequencingDataFrame()}
+
+			# Assign the operations, in order. The bulk inserts populate the tables
+			benchmark_operations = []
+			row_insert_dataframe = SyntheticDatabase(rows = min(row_count, benchmark_args.row_insert_rows), prefix = 'ROW', seed = benchmark_args.seed).collectionDataFrame()
+			benchmark_operations.append(('row_insert', 'collection', rowInsertBenchmark, (config_filename, 'collection', row_insert_dataframe)))
+			for table, table_dataframe in table_dataframes.items():
+				benchmark_operations.append(('bulk_insert', table, bulkInsertBenchmark, (config_filename, table, table_dataframe)))
+			benchmark_operations.append(('insert_ignore', 'collection', insertIgnoreBenchmark, (config_filename, 'collection', table_dataframes['collection'], 'unique_id')))
+			plate_update_dataframe = table_dataframes['plates'].assign(box = table_dataframes['plates']['box'].values[::-1])
+			benchmark_operations.append(('update', 'plates', updateBenchmark, (config_filename, 'plates', plate_update_dataframe, 'plate')))
+			select_ids = list(table_dataframes['collection']['unique_id'].sample(n = max(1, row_count // 100), random_state = benchmark_args.seed))
+			benchmark_operations.append(('select_in', ', '.join(join_tables), selectBenchmark, (config_filename, join_tables, {'collection': {'unique_id': select_ids}}, 'IN')))
+			benchmark_operations.append(('select_like', ', '.join(join_tables), selectBenchmark, (config_filename, join_tables, {'sequencing': {'species': 'Lasioglossum%'}}, 'LIKE')))
+			export_filename = os.path.join(work_dir, f'benchmark_{backend}_{row_count}_export.{benchmark_args.export_format}')
+			benchmark_operations.append(('export', ', '.join(join_tables), exportBenchmark, (config_filename, join_tables, export_filename, benchmark_args.export_format)))
+
+			# Loop the operations
+			for operation, table, benchmark_function, benchmark_function_args in benchmark_operations:
+
+				# Skip the operation, if not requested and not needed
+				if operation not in benchmark_args.operations and operation != 'bulk_insert': continue
+
+				logging.info(f'Starting {operation} benchmark: {backend}, {row_count} rows ({table})')
+
+				# Time the operation
+				timed_results = timeFunction(benchmark_function, *benchmark_function_args)
+				rows_processed = timed_results.pop('returned', None)
+				timed_results.pop('traceback', None)
+
+				# Store the results, if requested
+				if operation not in benchmark_args.operations: continue
+				operation_result = dict(backend_result, operation = operation, table = table, rows_processed = rows_processed, **timed_results)
+				if timed_results['status'] == 'ok':
+					operation_result['rows_per_second'] = rows_processed / timed_results['seconds'] if timed_results['seconds'] else None
+					logging.info(f'Finished {operation} benchmark: {timed_results["seconds"]:.3f}s, {rows_processed} rows, {operation_result["peak_memory_mb"]:.1f} MB peak memory')
+				benchmark_results.append(operation_result)
+
+			# Remove the tables and exported files
+			if not benchmark_args.keep_output:
+				if backend == 'postgresql': dropBenchmarkTables(config_data)
+				else: os.remove(config_data.filename)
+				if os.path.isfile(export_filename): os.remove(export_filename)
+
+	# Write the results
+	benchmark_settings = {'schema': benchmark_args.config_file, 'backends': list(backend_sql), 'rows': benchmark_args.rows, 'row_insert_rows': benchmark_args.row_insert_rows,
+						  'seq_len': benchmark_args.seq_len, 'seed': benchmark_args.seed, 'operations': benchmark_args.operations, 'export_format': benchmark_args.export_format}
+	writeBenchmarkJSON(benchmark_args.out_json, benchmark_settings, benchmark_results)
+
+	# Remove the working directory
+	if not benchmark_args.keep_output and not benchmark_args.out_dir: shutil.rmtree(work_dir)
+
+if __name__== "__main__":
+	main()
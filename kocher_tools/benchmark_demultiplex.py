@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import shutil
+import logging
+import tempfile
+import pkg_resources
+
+from kocher_tools.multiplex import Multiplex
+from kocher_tools.deML import deML
+from kocher_tools.fastq_multx import fastqMultx
+from kocher_tools.synthetic_fastq import SyntheticFASTQs
+from kocher_tools.benchmark import timeFunction, writeBenchmarkJSON
+from kocher_tools.misc import confirmExecutable
+from kocher_tools.logger import startLogger, logArgs
+
+def benchmarkParser ():
+	'''
+	Demultiplex Benchmark Parser
+
+	Assign the parameters for the demultiplex benchmark
+
+	Parameters
+	----------
+	sys.argv : list
+		Parameters from command lind
+
+	Raises
+	------
+	IOError
+		If the specified files do not exist
+	'''
+
+	def parser_confirm_file ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	def metavarList (var_list):
+		'''Create a formmated metavar list for the help output'''
+		return '{' + ', '.join(var_list) + '}'
+
+	benchmark_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+
+	# Index arguments, either a paired index or i5/i7 maps
+	index_method = benchmark_parser.add_mutually_exclusive_group(required = True)
+	index_method.add_argument('--paired-map', help = 'Defines the filename of a paired index map', type = str, action = parser_confirm_file())
+	index_method.add_argument('--i5-map', help = 'Defines the filename of the i5 map', type = str, action = parser_confirm_file())
+	benchmark_parser.add_argument('--i7-map', help = 'Defines the filename of the i7 map (if not the default map)', type = str, action = parser_confirm_file())
+	benchmark_parser.add_argument('--index-format', help = 'Defines the format of the paired index', type = str, choices = ['tsv', 'excel'], default = 'excel')
+	benchmark_parser.add_argument('--excel-sheet', help = 'Defines the excel sheet to use. Default is the first sheet - i.e. 1', type = int, default = 1)
+
+	# Simulation arguments
+	benchmark_parser.add_argument('--reads', help = 'Defines the number of simulated reads. Multiple values run multiple benchmarks', type = int, nargs = '+', default = [100000])
+	benchmark_parser.add_argument('--well-skew', help = 'Defines the skew of reads among wells (0 = equal reads per well)', type = float, default = 0.0)
+	benchmark_parser.add_argument('--index-error-rate', help = 'Defines the per-base substitution rate of the index reads', type = float, default = 0.001)
+	quality_profiles = ('constant', 'declining', 'uniform')
+	benchmark_parser.add_argument('--quality-profile', metavar = metavarList(quality_profiles), help = 'Defines the quality profile of the simulated reads', type = str, choices = quality_profiles, default = 'declining')
+	benchmark_parser.add_argument('--read-length', help = 'Defines the length of the simulated R1/R2 reads', type = int, default = 150)
+	benchmark_parser.add_argument('--seed', help = 'Defines the random seed', type = int, default = 1)
+
+	# Benchmark arguments
+	method_types = ('fastq-multx', 'deML', 'multiplex')
+	benchmark_parser.add_argument('--methods', metavar = metavarList(method_types), help = 'Defines the demultiplex methods to benchmark', type = str, choices = method_types, nargs = '+', default = list(method_types))
+	benchmark_parser.add_argument('--repeats', help = 'Defines the number of times each benchmark is repeated', type = int, default = 1)
+
+	# Output arguments
+	benchmark_parser.add_argument('--out-dir', help = 'Defines the working directory. Default is a temporary directory', type = str)
+	benchmark_parser.add_argument('--out-json', help = 'Defines the filename of the benchmark results', type = str, default = 'demultiplex_benchmark.json')
+	benchmark_parser.add_argument('--out-log', help = 'Defines the filename of the log file', type = str, default = 'demultiplex_benchmark.log')
+	benchmark_parser.add_argument('--keep-output', help = 'Defines if the simulated and demultiplexed files should be kept', action = 'store_true')
+	benchmark_parser.add_argument('--overwrite', help = 'Defines if previous output should be overwritten', action = 'store_true')
+
+	# Return the arguments
+	return benchmark_parser.parse_args()
+
+def fastqMultxBenchmark (index_filename, out_dir, fastq_filenames):
+
+	# Demultiplex using fastq-multx, an excel index is always converted into the fastq-multx format
+	demultiplex_job = fastqMultx.withIndex(index_filename, 'excel', excel_sheet = 0, fastq_multx_summary_filename = os.path.join(out_dir, 'fastq_multx_summary.tsv'))
+	demultiplex_job.demultiplexFASTQs(out_dir = out_dir,
+									  i7_read_file = fastq_filenames['i7'],
+									  i5_read_file = fastq_filenames['i5'],
+									  r1_file = fastq_filenames['R1'],
+									  r2_file = fastq_filenames['R2'])
+
+def deMLBenchmark (index_filename, out_dir, fastq_filenames):
+
+	# Demultiplex using deML
+	demultiplex_job = deML.withIndex(index_filename, 'tsv', deML_summary_filename = os.path.join(out_dir, 'deML_summary.tsv'))
+	demultiplex_job.demultiplexFASTQs(out_dir = out_dir,
+									  i7_read_file = fastq_filenames['i7'],
+									  i5_read_file = fastq_filenames['i5'],
+									  r1_file = fastq_filenames['R1'],
+									  r2_file = fastq_filenames['R2'])
+
+def multiplexBenchmark (i5_map_filename, i7_map_filename, out_dir, fastq_filenames):
+
+	# Demultiplex the i5 plates, then the i7 wells, as in demultiplex_pipeline.py
+	demultiplex_job = Multiplex.fromFiles(i5_read_file = fastq_filenames['i5'],
+										  i7_read_file = fastq_filenames['i7'],
+										  r1_file = fastq_filenames['R1'],
+										  r2_file = fastq_filenames['R2'])
+	demultiplex_job.assignOutputPath(out_dir)
+	demultiplex_job.assignPlates(i5_map_filename)
+	demultiplex_job.deMultiplex(i5_map_filename)
+	demultiplex_job.removeUnmatched()
+	for plate in demultiplex_job:
+		plate.assignWells()
+		plate.deMultiplexPlate(i7_map_filename, plate_prefix = True)
+		plate.removeUnmatchedPlate()
+		plate.removePlate()
+
+def main():
+
+	# Assign the benchmark arguments
+	benchmark_args = benchmarkParser()
+
+	# Check for previous output
+	if os.path.isfile(benchmark_args.out_json) and not benchmark_args.overwrite:
+		raise Exception(f'Found benchmark results: {benchmark_args.out_json}. Please rename using --out-json or use --overwrite')
+
+	# Assign the i7 map path from the package
+	if benchmark_args.i5_map and not benchmark_args.i7_map:
+		i7_map_path = pkg_resources.resource_filename('kocher_tools', 'data/i7_map.txt')
+		if not os.path.exists(i7_map_path): raise IOError('Cannot assign i7 map from package')
+		benchmark_args.i7_map = i7_map_path
+
+	# Start the log
+	startLogger(benchmark_args.out_log)
+	logArgs(benchmark_args)
+
+	# Assign the working directory
+	if benchmark_args.out_dir:
+		if os.path.isdir(benchmark_args.out_dir):
+			if benchmark_args.overwrite: shutil.rmtree(benchmark_args.out_dir)
+			else: raise Exception(f'{benchmark_args.out_dir} already exists. Please alter --out-dir or use --overwrite')
+		os.makedirs(benchmark_args.out_dir)
+		work_dir = benchmark_args.out_dir
+	else: work_dir = tempfile.mkdtemp()
+
+	# Assign the simulation arguments
+	simulation_kwargs = {'well_skew': benchmark_args.well_skew,
+						 'index_error_rate': benchmark_args.index_error_rate,
+						 'quality_profile': benchmark_args.quality_profile,
+						 'read_len': benchmark_args.read_length,
+						 'seed': benchmark_args.seed}
+
+	# Assign the executable required by each method
+	method_executables = {'fastq-multx': 'fastq-multx', 'deML': 'deML', 'multiplex': 'fastq-multx'}
+
+	# Create a list to store the results
+	benchmark_results = []
+
+	# Loop the read counts
+	for read_count in benchmark_args.reads:
+
+		# Create the simulation job
+		if benchmark_args.paired_map:
+			simulation_job = SyntheticFASTQs.fromIndex(benchmark_args.paired_map, benchmark_args.index_format, excel_sheet = benchmark_args.excel_sheet - 1, read_count = read_count, **simulation_kwargs)
+		else:
+			simulation_job = SyntheticFASTQs.fromMaps(benchmark_args.i5_map, benchmark_args.i7_map, read_count = read_count, **simulation_kwargs)
+
+		# Simulate the reads
+		read_dir = os.path.join(work_dir, f'Reads_{read_count}')
+		fastq_filenames, _ = simulation_job.writeFASTQs(read_dir)
+
+		# Loop the methods
+		for method in benchmark_args.methods:
+
+			# Assign the basic result information
+			method_result = {'method': method, 'reads': read_count, 'samples': len(simulation_job.samples)}
+
+			# Skip the method, if not possible
+			skip_message = ''
+			if not confirmExecutable(method_executables[method]): skip_message = f'{method_executables[method]} not found'
+			elif method == 'multiplex' and not benchmark_args.i5_map: skip_message = 'Requires --i5-map'
+			if skip_message:
+				logging.warning(f'Skipping {method}: {skip_message}')
+				method_result.update({'status': 'skipped', 'error': skip_message})
+				benchmark_results.append(method_result)
+				continue
+
+			# Write the index for the paired methods
+			if method == 'fastq-multx': index_filename = simulation_job.writeIndex(os.path.join(read_dir, f'{method}_index.xlsx'), method = method, index_format = 'excel')
+			elif method == 'deML': index_filename = simulation_job.writeIndex(os.path.join(read_dir, f'{method}_index.tsv'), method = method)
+
+			# Loop the repeats
+			for repeat in range(1, benchmark_args.repeats + 1):
+
+				logging.info(f'Starting {method} benchmark: {read_count} reads (repeat {repeat})')
+
+				# Time the method within a new output directory
+				out_dir = os.path.join(work_dir, f'{method}_{read_count}_{repeat}')
+				if method == 'fastq-multx': timed_results = timeFunction(fastqMultxBenchmark, index_filename, out_dir, fastq_filenames)
+				elif method == 'deML': timed_results = timeFunction(deMLBenchmark, index_filename, out_dir, fastq_filenames)
+				elif method == 'multiplex': timed_results = timeFunction(multiplexBenchmark, benchmark_args.i5_map, benchmark_args.i7_map, out_dir, fastq_filenames)
+				timed_results.pop('returned', None)
+				timed_results.pop('traceback', None)
+
+				# Store the results
+				repeat_result = dict(method_result, repeat = repeat, **timed_results)
+				if timed_results['status'] == 'ok':
+					repeat_result['reads_per_second'] = read_count / timed_results['seconds']
+					logging.info(f'Finished {method} benchmark: {repeat_result["reads_per_second"]:.1f} reads/s, {repeat_result["peak_memory_mb"]:.1f} MB peak memory')
+				benchmark_results.append(repeat_result)
+
+				# Remove the demultiplexed output
+				if not benchmark_args.keep_output: shutil.rmtree(out_dir, ignore_errors = True)
+
+	# Write the results
+	benchmark_settings = dict(simulation_kwargs, reads = benchmark_args.reads, repeats = benchmark_args.repeats,
+							  index = benchmark_args.paired_map if benchmark_args.paired_map else [benchmark_args.i5_map, benchmark_args.i7_map])
+	writeBenchmarkJSON(benchmark_args.out_json, benchmark_settings, benchmark_results)
+
+	# Remove the simulated reads
+	if not benchmark_args.keep_output and not benchmark_args.out_dir: shutil.rmtree(work_dir)
+
+if __name__== "__main__":
+	main()
@@ -1,6 +1,8 @@
 import os
 import sys
+import csv
 import subprocess
+import tempfile
 import logging
 
 from kocher_tools.misc import confirmExecutable
@@ -77,20 +79,74 @@ def pipeBlast (blast_call_args, blast_output, header = None):
 	# Close the file
 	blast_output_file.close()
 
-def blastTopHits (query_file, blast_output, database_file, num_threads):
+def yieldBlast (blast_call_args, blast_output = None, header = None):
 
-	# Define the header list
-	header_list = ['Query ID', 'Query Length', 'Subject ID', 'Subject Length', 'Percent Identity', 'Alignment Length', 'Mismatches', 'Gaps', 
-	               'Query Alignment Start', 'Query Alignment End', 'Subject Alignment Start', 'Subject Alignment End', 'E-Value', 'Bitscore']
+	# Find the blast executable
+	blast_executable = confirmExecutable('blastn')
 
-	# Define the output format
-	output_format = '6 qseqid qlen sseqid slen pident length mismatch gapopen qstart qend sstart send evalue bitscore'
+	# Check if executable is installed
+	if not blast_executable:
+		raise IOError('blast not found. Please confirm the executable is installed')
+
+	# Create a temporary file for the stderr, to avoid blocking while stdout is read
+	blast_stderr_file = tempfile.TemporaryFile(mode = 'w+')
+
+	# blast subprocess call
+	blast_call = subprocess.Popen([blast_executable] + blast_call_args, stderr = blast_stderr_file, stdout = subprocess.PIPE, universal_newlines = True)
+
+	# Open the output file, if specified
+	blast_output_file = open(blast_output, 'w') if blast_output else None
+
+	# Check if a header was specified
+	if blast_output_file and header:
+		
+		# Write the head to the output file
+		blast_output_file.write(header + '\n')
+
+	# Yield the stdout as it is reported, line by line
+	for blast_line in blast_call.stdout:
+
+		# Copy the line to the output file, if specified
+		if blast_output_file: blast_output_file.write(blast_line)
+
+		yield blast_line
+
+	# Wait for blast to finish
+	blast_call.wait()
+
+	# Close the file
+	if blast_output_file: blast_output_file.close()
+
+	# Read the stderr
+	blast_stderr_file.seek(0)
+	blast_stderr = blast_stderr_file.read()
+	blast_stderr_file.close()
+
+	# Check the stderr for errors
+	checkBlastForErrors(blast_stderr)
+
+# Define the header list of the top hits output
+top_hits_header = ['Query ID', 'Query Length', 'Subject ID', 'Subject Length', 'Percent Identity', 'Alignment Length', 'Mismatches', 'Gaps', 
+                   'Query Alignment Start', 'Query Alignment End', 'Subject Alignment Start', 'Subject Alignment End', 'E-Value', 'Bitscore']
+
+# Define the output format of the top hits output
+top_hits_format = '6 qseqid qlen sseqid slen pident length mismatch gapopen qstart qend sstart send evalue bitscore'
+
+def blastTopHits (query_file, blast_output, database_file, num_threads):
 
 	# Create the blast argument list
-	blast_call_args = ['-query', query_file, '-db', database_file, '-max_target_seqs', '100', '-outfmt', output_format, '-num_threads', str(num_threads)]
+	blast_call_args = ['-query', query_file, '-db', database_file, '-max_target_seqs', '100', '-outfmt', top_hits_format, '-num_threads', str(num_threads)]
 
 	# Call BLAST
-	pipeBlast(blast_call_args, blast_output, header = '\t'.join(header_list))
+	pipeBlast(blast_call_args, blast_output, header = '\t'.join(top_hits_header))
+
+def yieldBlastTopHits (query_file, database_file, num_threads, blast_output = None):
+
+	# Create the blast argument list
+	blast_call_args = ['-query', query_file, '-db', database_file, '-max_target_seqs', '100', '-outfmt', top_hits_format, '-num_threads', str(num_threads)]
+
+	# Return the hits as they are reported, keyed by the header
+	return csv.DictReader(yieldBlast(blast_call_args, blast_output, header = '\t'.join(top_hits_header)), fieldnames = top_hits_header, delimiter = '\t')
 
 def primerBLAST (query_file, blast_output, database_file, num_threads):
 
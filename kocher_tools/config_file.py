@@ -5,9 +5,25 @@ import re
 from collections import OrderedDict, defaultdict
 from itertools import combinations
 
-from sqlalchemy import Table, Column, ForeignKey, CheckConstraint, MetaData, Integer, Numeric, String, Text, LargeBinary, Date, DateTime, Boolean
+from sqlalchemy import Table, Column, ForeignKey, CheckConstraint, Index, MetaData, Integer, Numeric, String, Text, LargeBinary, Date, DateTime, Boolean
 from sqlalchemy.sql import func
 
+def indexColumns (sql_tables):
+	'''
+		Index the columns of the tables by name
+
+		Returns
+		-------
+		dict
+			Column name: list of (table position, column, has foreign key)
+	'''
+
+	column_index = defaultdict(list)
+	for table_pos, sql_table in enumerate(sql_tables):
+		for sql_column in sql_table.columns:
+			column_index[sql_column.name].append((table_pos, sql_column, len(sql_column.foreign_keys) >= 1))
+	return dict(column_index)
+
 class ConfigDB (list):
 	def __init__ (self, yaml = ''):
 		self.yaml = yaml
@@ -21,10 +37,20 @@ class ConfigDB (list):
 		self.passwd = None
 		self.database = None
 		self.schema = None
+		self.batch_size = 10000
+		self.copy_threshold = 10000
+		self.pool_size = 5
+		self.pool_pre_ping = True
+		self.pool_recycle = 3600
+		self.cache_mb = 0
+		self.cache_ttl = 300
+		self.in_threshold = 1000
 		self.meta = None
 		self._sql_tables = {}
+		self._sql_summaries = {}
 		self._table_label_to_col = defaultdict(lambda: defaultdict(str))
 		self._table_col_to_label = defaultdict(lambda: defaultdict(str))
+		self._column_index = {}
 
 		# Assign the Backup properties
 		self.backup_dir = None
@@ -32,6 +58,9 @@ class ConfigDB (list):
 		self.max_days_old = None
 		self.max_files = None
 
+		# Assign the Upload properties
+		self.fasta_index_dir = None
+
 		# Assign using the Yaml file
 		self.assignFromYaml()
 
@@ -43,6 +72,14 @@ class ConfigDB (list):
 	def sql_tables (self):
 		return list(self._sql_tables.values())
 
+	@property
+	def summaries (self):
+		return list(self._sql_summaries)
+
+	@property
+	def sql_summaries (self):
+		return list(self._sql_summaries.values())
+
 	@property
 	def sql_address (self):
 		if not self.user or not self.passwd or not self.host or not self.database:
@@ -71,6 +108,10 @@ class ConfigDB (list):
 
 	def __getitem__(self, table_str):
 		return self._sql_tables[table_str]
+
+	@property
+	def column_index (self):
+		return self._column_index
 	
 	@classmethod
 	def readConfig (cls, yaml_filename):
@@ -87,6 +128,15 @@ class ConfigDB (list):
 			tables_to_return.append(self[table_str])
 		return tables_to_return
 
+	def getSQLSummaries (self, summary_strs):
+
+		# Confirm the summaries exists, and if so, return the SQL tables
+		summaries_to_return = []
+		for summary_str in summary_strs:
+			if summary_str not in self._sql_summaries: raise Exception('Summary (%s) not found' % summary_str)
+			summaries_to_return.append(self._sql_summaries[summary_str])
+		return summaries_to_return
+
 	@staticmethod
 	def getSQLColumn (table, column_str):
 
@@ -134,6 +184,14 @@ class ConfigDB (list):
 				if 'database' in config_yaml['sql']: self.database = config_yaml['sql']['database']
 				if 'schema' in config_yaml['sql']: self.schema = config_yaml['sql']['schema']
 				if config_yaml['sql']['passwd']: self.passwd = config_yaml['sql']['passwd']
+			if 'batch_size' in config_yaml['sql']: self.batch_size = int(config_yaml['sql']['batch_size'])
+			if 'copy_threshold' in config_yaml['sql']: self.copy_threshold = int(config_yaml['sql']['copy_threshold'])
+			if 'pool_size' in config_yaml['sql']: self.pool_size = int(config_yaml['sql']['pool_size'])
+			if 'pool_pre_ping' in config_yaml['sql']: self.pool_pre_ping = bool(config_yaml['sql']['pool_pre_ping'])
+			if 'pool_recycle' in config_yaml['sql']: self.pool_recycle = int(config_yaml['sql']['pool_recycle'])
+			if 'cache_mb' in config_yaml['sql']: self.cache_mb = float(config_yaml['sql']['cache_mb'])
+			if 'cache_ttl' in config_yaml['sql']: self.cache_ttl = float(config_yaml['sql']['cache_ttl'])
+			if 'in_threshold' in config_yaml['sql']: self.in_threshold = int(config_yaml['sql']['in_threshold'])
 
 			if 'backup' in config_yaml:
 				self.backup_dir = config_yaml['backup']['dir']
@@ -141,6 +199,10 @@ class ConfigDB (list):
 				if 'max_days_old' in config_yaml['backup']: self.max_days_old = int(config_yaml['backup']['max_days_old'])
 				if 'max_files' in config_yaml['backup']: self.max_files = int(config_yaml['backup']['max_files'])
 
+			# Assign the upload information, relative directories are within the config directory
+			if 'upload' in config_yaml:
+				if 'fasta_index_dir' in config_yaml['upload']: self.fasta_index_dir = os.path.join(self.yaml_dir, config_yaml['upload']['fasta_index_dir'])
+
 			# Create a metadata object
 			if self.schema: meta = MetaData(schema = self.schema)
 			else: meta = MetaData()
@@ -230,6 +292,10 @@ class ConfigDB (list):
 						if attribute_arg == 'unique':
 							col_kwarg_dict['unique'] = True
 
+						# Assign an index, if found
+						if attribute_arg == 'index':
+							col_kwarg_dict['index'] = bool(attribute_value)
+
 						# Assign as not null, if found
 						if attribute_arg == 'not_null':
 							col_kwarg_dict['nullable'] = not attribute_value
@@ -297,6 +363,40 @@ class ConfigDB (list):
 				# Assign the table class
 				self._sql_tables[table] = Table(table, meta, *table_attr_list)
 
+			# Assign the composite indexes, if found
+			if 'indexes' in config_yaml['database']:
+				for index_name, index_yaml in config_yaml['database']['indexes'].items():
+					if index_yaml['table'] not in self._sql_tables: raise Exception(f'Unable to assign index ({index_name}), table not found: {index_yaml["table"]}')
+					index_table = self._sql_tables[index_yaml['table']]
+					for index_column in index_yaml['columns']:
+						if index_column not in index_table.columns: raise Exception(f'Unable to assign index ({index_name}), column not found: {index_column}')
+					Index(index_name, *[index_table.columns[index_column] for index_column in index_yaml['columns']], unique = bool(index_yaml.get('unique', False)))
+
+			# Assign the summary tables, if found. Summaries are not indexed with the tables, as the columns would be ambiguous
+			if 'summaries' in config_yaml['database']:
+				for summary, summary_yaml in config_yaml['database']['summaries'].items():
+					if summary in self._sql_tables: raise Exception(f'Unable to assign summary ({summary}), table already exists: {summary}')
+					if summary_yaml['table'] not in self._sql_tables: raise Exception(f'Unable to assign summary ({summary}), table not found: {summary_yaml["table"]}')
+					source_table = self._sql_tables[summary_yaml['table']]
+
+					# Assign the columns to group by, the rows of each group are counted
+					group_columns = summary_yaml['group_by'] if isinstance(summary_yaml['group_by'], list) else [summary_yaml['group_by']]
+					for group_column in group_columns:
+						if group_column not in source_table.columns: raise Exception(f'Unable to assign summary ({summary}), column not found: {group_column}')
+						if group_column == 'row_count': raise Exception(f'Unable to assign summary ({summary}), row_count may not be grouped')
+
+					# Assign the summary table, storing the source table and group columns
+					summary_columns = [Column(group_column, source_table.columns[group_column].type) for group_column in group_columns]
+					summary_columns.append(Column('row_count', Integer, nullable = False))
+					summary_columns.append(Index(f'{summary}_group', *group_columns, unique = True))
+					self._sql_summaries[summary] = Table(summary, meta, *summary_columns, info = {'source': source_table, 'group_by': group_columns})
+
+					# Store the summary within the source table, to track modifications
+					source_table.info.setdefault('summaries', []).append(self._sql_summaries[summary])
+
+			# Index the columns by name
+			self._column_index = indexColumns(self.sql_tables)
+
 			self.meta = meta
 
 	def webYaml (self):
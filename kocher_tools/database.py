@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 #import sqlite3
 #import datetime
@@ -6,20 +7,35 @@ import sys
 #import copy
 import itertools
 import operator
+import io
 import csv
 import zipfile
 import tempfile
 import logging
+import threading
+import time
+import uuid
+import sqlite3
+
+from contextlib import contextmanager, nullcontext
+from collections import OrderedDict, Counter, defaultdict
 
 import pandas as pd
 
 from sqlalchemy import inspect
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.sql import select, insert
+from sqlalchemy import create_engine, MetaData, Table, event, and_, or_, not_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql import select, insert, bindparam, text, func, visitors
+from sqlalchemy.schema import Column, PrimaryKeyConstraint, UniqueConstraint
 from sqlalchemy.schema import CreateTable
 
 from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.postgresql import dialect as postgresql_dialect
+from sqlalchemy.dialects.sqlite import dialect as sqlite_dialect
+
+from kocher_tools.config_file import indexColumns
+from kocher_tools.output import checkArrow, arrowSchema, arrowRecordBatch, columnarWriter
 
 def createEngineFromFilename (sql_filename, echo = False):
 
@@ -34,10 +50,58 @@ def createEngineFromConfig (config_data, echo = False):
 	if config_data.type == 'sqlite': return create_engine("sqlite:///%s" % config_data.filename, echo = echo)
 	else: return create_engine("postgresql://%s" % config_data.sql_address, echo = echo)
 
+# Engines and sessionmakers shared within the process, keyed by the connection URL
+_sql_engine_registry = {}
+_sql_sessionmaker_registry = {}
+_sql_registry_lock = threading.Lock()
+
+def sqlURLFromConfig (config_data):
+
+	if config_data.type == 'sqlite': return "sqlite:///%s" % os.path.abspath(config_data.filename)
+	else: return "postgresql://%s" % config_data.sql_address
+
+def cachedEngineFromConfig (config_data, echo = False):
+	'''
+		Return the engine of the config, creating it if needed
+
+		Engines are stored by connection URL, so each database has a single
+		engine (and connection pool) within the process. The pool settings
+		are only used for PostgreSQL, as SQLite file connections are not
+		pooled.
+	'''
+
+	# Assign the key using the URL
+	sql_url = sqlURLFromConfig(config_data)
+	registry_key = (sql_url, echo)
+
+	with _sql_registry_lock:
+
+		# Create the engine, if not found
+		if registry_key not in _sql_engine_registry:
+			if config_data.type == 'sqlite': sql_engine = create_engine(sql_url, echo = echo)
+			else: sql_engine = create_engine(sql_url, echo = echo, pool_size = config_data.pool_size, pool_pre_ping = config_data.pool_pre_ping, pool_recycle = config_data.pool_recycle)
+			_sql_engine_registry[registry_key] = sql_engine
+			_sql_sessionmaker_registry[registry_key] = sessionmaker(bind = sql_engine)
+
+		return _sql_engine_registry[registry_key]
+
+def cachedSessionmakerFromConfig (config_data, echo = False):
+
+	# Assign the engine, which also creates the sessionmaker
+	cachedEngineFromConfig(config_data, echo)
+	return _sql_sessionmaker_registry[(sqlURLFromConfig(config_data), echo)]
+
+def disposeCachedEngines ():
+
+	# Close the pooled connections and empty the registry, e.g. before forking
+	with _sql_registry_lock:
+		for sql_engine in _sql_engine_registry.values(): sql_engine.dispose()
+		_sql_engine_registry.clear()
+		_sql_sessionmaker_registry.clear()
+
 def startSessionFromConfig (config_data, echo = False):
 
-	sql_engine = createEngineFromConfig(config_data, echo)
-	Session = sessionmaker(bind=sql_engine)
+	Session = cachedSessionmakerFromConfig(config_data, echo)
 	return Session()
 	
 def startSessionFromEngine (engine):
@@ -46,11 +110,428 @@ def startSessionFromEngine (engine):
 	Session = sessionmaker(bind=engine)
 	return Session()
 
+# Versions of each table, keyed by the connection URL and table. Updated when a session commits changes to the table
+_sql_table_versions = defaultdict(int)
+_sql_table_versions_lock = threading.Lock()
+
+def tableVersions (sql_url, table_names):
+
+	return tuple([_sql_table_versions[(sql_url, table_name)] for table_name in table_names])
+
+def markTableModified (sql_connection, table):
+
+	# Store the modified table (and summaries, updated by triggers) within the session, the version is updated on commit
+	sql_connection.info.setdefault('modified_tables', set()).add(str(table))
+	if isinstance(table, Table):
+		for sql_summary in table.info.get('summaries', []): sql_connection.info['modified_tables'].add(str(sql_summary))
+
+@event.listens_for(Session, 'after_commit')
+def _updateTableVersions (sql_connection):
+
+	# Update the versions of the tables modified by the session
+	modified_tables = sql_connection.info.pop('modified_tables', set())
+	if not modified_tables or sql_connection.bind is None: return
+	sql_url = str(sql_connection.bind.url)
+	with _sql_table_versions_lock:
+		for table_name in modified_tables: _sql_table_versions[(sql_url, table_name)] += 1
+
+@event.listens_for(Session, 'after_rollback')
+def _discardTableVersions (sql_connection):
+
+	# Discard the modified tables, as nothing was changed
+	sql_connection.info.pop('modified_tables', None)
+
+class SQLResultCache ():
+	'''
+		LRU cache of select results
+
+		Results are stored by the compiled SQL and bound parameters, along
+		with the versions of the tables within the select. A result is
+		only returned if none of the tables have been modified (and
+		committed) since, within the TTL. Writes from other processes are
+		not tracked, so the TTL limits how long a result may be out of date.
+	'''
+
+	def __init__ (self, max_memory_mb = 64, ttl = 300):
+		self.max_memory_mb = max_memory_mb
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._cache_memory = 0
+		self._cache_entries = OrderedDict()
+		self._cache_lock = threading.Lock()
+
+	def __len__ (self):
+		return len(self._cache_entries)
+
+	@staticmethod
+	def resultsMemory (results):
+
+		# Estimate the memory used by the results, in bytes
+		return sys.getsizeof(results) + sum([sys.getsizeof(row) + sum([sys.getsizeof(value) for value in row]) for row in results])
+
+	def get (self, cache_key, sql_url, table_names):
+
+		with self._cache_lock:
+
+			# Check if the results are stored
+			if cache_key not in self._cache_entries:
+				self.misses += 1
+				return None
+
+			# Remove the results if expired or a table was modified
+			table_versions, cached_time, results, results_memory = self._cache_entries[cache_key]
+			if time.monotonic() - cached_time > self.ttl or table_versions != tableVersions(sql_url, table_names):
+				self._removeEntry(cache_key)
+				self.misses += 1
+				return None
+
+			# Move the results to the end, as most recently used
+			self._cache_entries.move_to_end(cache_key)
+			self.hits += 1
+			return list(results)
+
+	def put (self, cache_key, sql_url, table_names, results):
+
+		# Do not store results larger than the cache
+		results_memory = self.resultsMemory(results)
+		if results_memory > self.max_memory_mb * 1024 * 1024: return
+
+		with self._cache_lock:
+
+			# Store the results with the table versions
+			if cache_key in self._cache_entries: self._removeEntry(cache_key)
+			self._cache_entries[cache_key] = (tableVersions(sql_url, table_names), time.monotonic(), list(results), results_memory)
+			self._cache_memory += results_memory
+
+			# Remove the least recently used results, if over the memory limit
+			while self._cache_memory > self.max_memory_mb * 1024 * 1024:
+				self._removeEntry(next(iter(self._cache_entries)))
+
+	def clear (self):
+
+		with self._cache_lock:
+			self._cache_entries.clear()
+			self._cache_memory = 0
+
+	def _removeEntry (self, cache_key):
+
+		self._cache_memory -= self._cache_entries.pop(cache_key)[3]
+
+# Result caches shared within the process, keyed by the connection URL
+_sql_result_cache_registry = {}
+
+def cachedResultCacheFromConfig (config_data):
+
+	# Return nothing if the cache is disabled
+	if not config_data.cache_mb: return None
+
+	with _sql_registry_lock:
+
+		# Create the cache, if not found
+		sql_url = sqlURLFromConfig(config_data)
+		if sql_url not in _sql_result_cache_registry: _sql_result_cache_registry[sql_url] = SQLResultCache(max_memory_mb = config_data.cache_mb, ttl = config_data.cache_ttl)
+		return _sql_result_cache_registry[sql_url]
+
+class SQLStatistics ():
+	'''
+		Statement statistics, recorded using the cursor events of engines
+
+		Statements are grouped by fingerprint (i.e. with the literals,
+		parameters, and value lists replaced) and record the count,
+		duration, rows, and a histogram of the parameter counts.
+		Statements slower than slow_seconds are logged.
+
+		Parameters
+		----------
+		slow_seconds : float, optional
+			Duration to log a statement as slow. None disables logging
+	'''
+
+	def __init__ (self, slow_seconds = 1.0):
+		self.slow_seconds = slow_seconds
+		self._statement_stats = {}
+		self._sql_engines = []
+		self._stats_lock = threading.Lock()
+
+	def __len__ (self):
+		return len(self._statement_stats)
+
+	@staticmethod
+	def fingerprint (statement):
+
+		# Replace the temporary table names, literals, and parameters
+		statement_fingerprint = re.sub(r'\s+', ' ', statement).strip()
+		statement_fingerprint = re.sub(r'temp_values_[0-9a-f]+', 'temp_values_?', statement_fingerprint)
+		statement_fingerprint = re.sub(r"'(?:[^']|'')*'", '?', statement_fingerprint)
+		statement_fingerprint = re.sub(r'%\(\w+\)s|(?<![\w:]):\w+|\$\d+', '?', statement_fingerprint)
+		statement_fingerprint = re.sub(r'(?<![\w.])-?\d+(?:\.\d+)?\b', '?', statement_fingerprint)
+
+		# Collapse the value lists, i.e. IN (?, ?) and VALUES (?, ?), (?, ?)
+		statement_fingerprint = re.sub(r'\(\?(?:, \?)+\)', '(?...)', statement_fingerprint)
+		statement_fingerprint = re.sub(r'(\((?:\?|\?\.\.\.)\))(?:, \((?:\?|\?\.\.\.)\))+', r'\1...', statement_fingerprint)
+		return statement_fingerprint
+
+	@staticmethod
+	def parameterBucket (parameter_count):
+
+		# Return the power of two range of the count
+		if parameter_count < 2: return str(parameter_count)
+		bucket_start = 1 << (parameter_count.bit_length() - 1)
+		return f'{bucket_start}-{(bucket_start << 1) - 1}'
+
+	def attach (self, sql_engine):
+
+		# Listen to the cursor events of the engine
+		if sql_engine in self._sql_engines: return
+		event.listen(sql_engine, 'before_cursor_execute', self._beforeCursorExecute)
+		event.listen(sql_engine, 'after_cursor_execute', self._afterCursorExecute)
+		self._sql_engines.append(sql_engine)
+
+	def detach (self):
+
+		# Remove the listeners from the engines
+		for sql_engine in self._sql_engines:
+			event.remove(sql_engine, 'before_cursor_execute', self._beforeCursorExecute)
+			event.remove(sql_engine, 'after_cursor_execute', self._afterCursorExecute)
+		self._sql_engines = []
+
+	def _beforeCursorExecute (self, conn, cursor, statement, parameters, context, executemany):
+
+		# Store the start time, statements may be nested
+		conn.info.setdefault('sql_statistics_start', []).append(time.perf_counter())
+
+	def _afterCursorExecute (self, conn, cursor, statement, parameters, context, executemany):
+
+		# Assign the duration and rows of the statement
+		statement_seconds = time.perf_counter() - conn.info['sql_statistics_start'].pop()
+		statement_rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+
+		# Assign the parameter count, i.e. the rows of executemany or the bind values
+		parameter_count = len(parameters) if parameters else 0
+
+		# Update the statistics of the fingerprint
+		statement_fingerprint = self.fingerprint(statement)
+		with self._stats_lock:
+			if statement_fingerprint not in self._statement_stats:
+				self._statement_stats[statement_fingerprint] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'executemany': executemany, 'parameters': Counter()}
+			statement_stats = self._statement_stats[statement_fingerprint]
+			statement_stats['count'] += 1
+			statement_stats['seconds'] += statement_seconds
+			statement_stats['max_seconds'] = max(statement_stats['max_seconds'], statement_seconds)
+			statement_stats['rows'] += statement_rows
+			statement_stats['parameters'][self.parameterBucket(parameter_count)] += 1
+
+		# Log the statement, if slow
+		if self.slow_seconds is not None and statement_seconds >= self.slow_seconds:
+			logging.warning(f'Slow statement ({statement_seconds:.3f}s, {parameter_count} parameters): {statement_fingerprint[:1000]}')
+
+	def summary (self, top_n = 10):
+
+		# Return the statements with the longest total duration
+		with self._stats_lock:
+			summary_rows = [{'statement': statement_fingerprint,
+							 'count': statement_stats['count'],
+							 'seconds': statement_stats['seconds'],
+							 'mean_seconds': statement_stats['seconds'] / statement_stats['count'],
+							 'max_seconds': statement_stats['max_seconds'],
+							 'rows': statement_stats['rows'],
+							 'executemany': statement_stats['executemany'],
+							 'parameters': ', '.join([f'{bucket}: {bucket_count}' for bucket, bucket_count in sorted(statement_stats['parameters'].items(), key = lambda bucket_item: int(bucket_item[0].split('-')[0]))])}
+							for statement_fingerprint, statement_stats in self._statement_stats.items()]
+		summary_dataframe = pd.DataFrame(summary_rows, columns = ['statement', 'count', 'seconds', 'mean_seconds', 'max_seconds', 'rows', 'executemany', 'parameters'])
+		summary_dataframe = summary_dataframe.sort_values('seconds', ascending = False)
+		if top_n: summary_dataframe = summary_dataframe.head(top_n)
+		return summary_dataframe.reset_index(drop = True)
+
+	def report (self, top_n = 10, out_file = sys.stderr, statement_width = 120):
+
+		# Assign the summary, shortening the statements
+		summary_dataframe = self.summary(top_n)
+		if summary_dataframe.empty: return
+		total_seconds = sum([statement_stats['seconds'] for statement_stats in self._statement_stats.values()])
+		total_count = sum([statement_stats['count'] for statement_stats in self._statement_stats.values()])
+
+		# Log and print the summary
+		logging.info(f'SQL statistics: {total_count} statements ({len(self)} distinct), {total_seconds:.3f}s')
+		for summary_row in summary_dataframe.itertuples(index = False):
+			logging.info(f'SQL statistics: {summary_row.seconds:.3f}s, {summary_row.count} executions, {summary_row.rows} rows, parameters ({summary_row.parameters}): {summary_row.statement}')
+		summary_dataframe['statement'] = summary_dataframe['statement'].str.slice(0, statement_width)
+		print(f'SQL statistics: {total_count} statements ({len(self)} distinct), {total_seconds:.3f}s. Top {len(summary_dataframe)} by duration:', file = out_file)
+		print(summary_dataframe.to_string(index = False, float_format = lambda float_value: f'{float_value:.4f}'), file = out_file)
+
+def startSQLStatisticsFromConfig (config_data, slow_seconds = 1.0):
+
+	# Record the statistics of the cached engine, used by the sessions of the config
+	sql_statistics = SQLStatistics(slow_seconds = slow_seconds)
+	sql_statistics.attach(cachedEngineFromConfig(config_data))
+	return sql_statistics
+
 def createAllFromConfig (config_data, engine):
 
 	# Create the tables
 	config_data.meta.create_all(engine)
 
+	# Create the triggers of the summaries, and summarize any existing rows
+	if config_data.sql_summaries:
+		sql_connection = startSessionFromEngine(engine)
+		createSummaryTriggers(config_data.sql_summaries, sql_connection)
+		rebuildSummaries(config_data.sql_summaries, sql_connection)
+		sql_connection.commit()
+		sql_connection.close()
+
+def summaryTriggerStatements (sql_summary, dialect):
+	'''
+		Return the statements that create the triggers of a summary
+
+		The triggers add (or subtract) the rows inserted, deleted, or
+		updated within the source table from the row_count of each group.
+		SQLite uses row triggers, while PostgreSQL uses statement triggers
+		with transition tables (PostgreSQL 10+), as bulk loads would
+		otherwise update the summary once per row. Groups are matched
+		using NULL-safe comparisons.
+
+		Parameters
+		----------
+		sql_summary : Table
+			Summary table, as assigned by ConfigDB
+		dialect : Dialect
+			Dialect of the database
+
+		Returns
+		-------
+		list
+			SQL statements, including those that drop previous triggers
+	'''
+
+	# Assign the quoted names of the tables, columns, and triggers
+	sql_preparer = dialect.identifier_preparer
+	def triggerName (trigger_event): return sql_preparer.quote(f'{sql_summary.name}_{trigger_event}')
+	summary_name = sql_preparer.format_table(sql_summary)
+	source_name = sql_preparer.format_table(sql_summary.info['source'])
+	group_columns = [sql_preparer.quote(group_column) for group_column in sql_summary.info['group_by']]
+	group_str = ', '.join(group_columns)
+
+	if dialect.name == 'sqlite':
+
+		# Assign the statements that update the group of a row, rows are matched with IS as groups may be NULL
+		def matchGroup (row_name): return ' AND '.join([f'{group_column} IS {row_name}.{group_column}' for group_column in group_columns])
+		def addRow (row_name):
+			return f'''UPDATE {summary_name} SET row_count = row_count + 1 WHERE {matchGroup(row_name)};
+	INSERT INTO {summary_name} ({group_str}, row_count) SELECT {', '.join([f'{row_name}.{group_column}' for group_column in group_columns])}, 1 WHERE NOT EXISTS (SELECT 1 FROM {summary_name} WHERE {matchGroup(row_name)});'''
+		def removeRow (row_name):
+			return f'''UPDATE {summary_name} SET row_count = row_count - 1 WHERE {matchGroup(row_name)};
+	DELETE FROM {summary_name} WHERE {matchGroup(row_name)} AND row_count <= 0;'''
+
+		# Return the row triggers, updates only change the summary if a group column is updated
+		return [f'DROP TRIGGER IF EXISTS {triggerName("insert")}',
+				f'DROP TRIGGER IF EXISTS {triggerName("delete")}',
+				f'DROP TRIGGER IF EXISTS {triggerName("update")}',
+				f'CREATE TRIGGER {triggerName("insert")} AFTER INSERT ON {source_name} BEGIN\n\t{addRow("NEW")}\nEND',
+				f'CREATE TRIGGER {triggerName("delete")} AFTER DELETE ON {source_name} BEGIN\n\t{removeRow("OLD")}\nEND',
+				f'CREATE TRIGGER {triggerName("update")} AFTER UPDATE OF {group_str} ON {source_name} BEGIN\n\t{removeRow("OLD")}\n\t{addRow("NEW")}\nEND']
+
+	elif dialect.name == 'postgresql':
+
+		# Assign the statements that apply the counts of the transition table to the summary
+		match_group = ' AND '.join([f'summary_rows.{group_column} IS NOT DISTINCT FROM changed_rows.{group_column}' for group_column in group_columns])
+		def countRows (rows_name): return f'(SELECT {group_str}, COUNT(*) AS row_count FROM {rows_name} GROUP BY {group_str}) AS changed_rows'
+		function_name = sql_preparer.quote(f'{sql_summary.name}_maintain')
+		if sql_summary.schema: function_name = f'{sql_preparer.quote_schema(sql_summary.schema)}.{function_name}'
+		summary_function = f'''CREATE OR REPLACE FUNCTION {function_name}() RETURNS trigger LANGUAGE plpgsql AS $summary$
+BEGIN
+	IF TG_OP IN ('DELETE', 'UPDATE') THEN
+		UPDATE {summary_name} AS summary_rows SET row_count = summary_rows.row_count - changed_rows.row_count FROM {countRows('old_rows')} WHERE {match_group};
+		DELETE FROM {summary_name} WHERE row_count <= 0;
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		UPDATE {summary_name} AS summary_rows SET row_count = summary_rows.row_count + changed_rows.row_count FROM {countRows('new_rows')} WHERE {match_group};
+		INSERT INTO {summary_name} ({group_str}, row_count) SELECT {', '.join([f'changed_rows.{group_column}' for group_column in group_columns])}, changed_rows.row_count FROM {countRows('new_rows')} WHERE NOT EXISTS (SELECT 1 FROM {summary_name} AS summary_rows WHERE {match_group});
+	END IF;
+	RETURN NULL;
+END;
+$summary$'''
+
+		# Return the statement triggers, transition tables require a trigger for each event
+		return [summary_function,
+				f'DROP TRIGGER IF EXISTS {triggerName("insert")} ON {source_name}',
+				f'DROP TRIGGER IF EXISTS {triggerName("delete")} ON {source_name}',
+				f'DROP TRIGGER IF EXISTS {triggerName("update")} ON {source_name}',
+				f'CREATE TRIGGER {triggerName("insert")} AFTER INSERT ON {source_name} REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE {function_name}()',
+				f'CREATE TRIGGER {triggerName("delete")} AFTER DELETE ON {source_name} REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE {function_name}()',
+				f'CREATE TRIGGER {triggerName("update")} AFTER UPDATE ON {source_name} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE {function_name}()']
+
+	else: raise Exception(f'Summaries not supported for database type: {dialect.name}')
+
+def createSummaryTriggers (sql_summaries, sql_connection):
+
+	# Create (or replace) the triggers of each summary
+	for sql_summary in sql_summaries:
+		for trigger_statement in summaryTriggerStatements(sql_summary, sql_connection.bind.dialect):
+			sql_connection.execute(text(trigger_statement))
+		logging.info(f'Created summary triggers: {sql_summary.name}')
+
+def rebuildSummaries (sql_summaries, sql_connection):
+
+	# Replace the rows of each summary, by counting the rows of each group within the source table
+	summary_rows = {}
+	for sql_summary in sql_summaries:
+		source_columns = [sql_summary.info['source'].columns[group_column] for group_column in sql_summary.info['group_by']]
+		sql_connection.execute(sql_summary.delete())
+		sql_connection.execute(sql_summary.insert().from_select(sql_summary.info['group_by'] + ['row_count'], select(source_columns + [func.count().label('row_count')]).group_by(*source_columns)))
+		markTableModified(sql_connection, sql_summary)
+
+		# Report the rows of the summary
+		summary_rows[sql_summary.name] = sql_connection.execute(select([func.count()]).select_from(sql_summary)).scalar()
+		logging.info(f'Rebuilt summary ({sql_summary.name}): {summary_rows[sql_summary.name]} rows')
+
+	return summary_rows
+
+def rebuildSummariesFromConfig (config_data, summaries = None):
+	'''
+		Rebuild the summaries from the source tables
+
+		Creates the summary tables and triggers if not found, then
+		replaces the rows of each summary within a single transaction.
+
+		Parameters
+		----------
+		config_data : ConfigDB
+			Database config
+		summaries : list, optional
+			Names of the summaries to rebuild. Rebuilds all if not given
+
+		Returns
+		-------
+		dict
+			Summary name: rows within the summary
+	'''
+
+	# Assign the summaries
+	sql_summaries = config_data.getSQLSummaries(summaries) if summaries else config_data.sql_summaries
+	if not sql_summaries: raise Exception(f'No summaries found within: {config_data.yaml}')
+
+	# Confirm the source tables exist, then create the summary tables if not found
+	sql_engine = cachedEngineFromConfig(config_data)
+	for sql_summary in sql_summaries:
+		source_table = sql_summary.info['source']
+		if not sql_engine.has_table(source_table.name, schema = source_table.schema): raise Exception(f'Unable to rebuild summary ({sql_summary.name}), table not found: {source_table.name}')
+	config_data.meta.create_all(sql_engine, tables = sql_summaries)
+
+	# Replace the triggers and rows of the summaries
+	sql_connection = startSessionFromConfig(config_data)
+	try:
+		createSummaryTriggers(sql_summaries, sql_connection)
+		summary_rows = rebuildSummaries(sql_summaries, sql_connection)
+		sql_connection.commit()
+	except:
+		sql_connection.rollback()
+		raise
+	finally:
+		sql_connection.close()
+
+	return summary_rows
+
 def printCreateSQL (sql_tables):
 
 	# Loop tables and print SQL statments
@@ -66,6 +547,14 @@ def foreignKeyPairs (sql_tables):
 				for foreign_key in column.foreign_keys:
 					yield foreign_key.column, column
 
+def indexedColumns (sql_table):
+
+	# Assign the columns that lead an index, primary key, or unique constraint
+	indexed_columns = set([list(sql_index.columns)[0].name for sql_index in sql_table.indexes])
+	indexed_columns.update([list(sql_constraint.columns)[0].name for sql_constraint in sql_table.constraints if isinstance(sql_constraint, (PrimaryKeyConstraint, UniqueConstraint)) and len(sql_constraint.columns) > 0])
+	indexed_columns.update([column.name for column in sql_table.columns if column.unique])
+	return indexed_columns
+
 def prepDataFrameUsingConfig (config_data, table, dataframe):
 
 	# Confirm the table is within the config file
@@ -93,8 +582,11 @@ def prepDataFrameUsingConfig (config_data, table, dataframe):
 	return dataframe
 
 class SQLSelect ():
-	def __init__ (self, sql_select_tables = [], sql_select_columns = [], sql_where = [], sql_tables = [], tables_in_select = [], sql_connection = None):
+	def __init__ (self, sql_select_tables = [], sql_select_columns = [], sql_where = [], sql_tables = [], tables_in_select = [], sql_connection = None, sql_cache = None, sql_column_index = None, in_threshold = 1000):
 		self.select_results = None
+		self._in_threshold = in_threshold
+		self._sql_cache = sql_cache
+		self._sql_column_index = sql_column_index if sql_column_index is not None else indexColumns(sql_tables)
 		self._sql_select_tables = sql_select_tables
 		self._sql_select_columns = sql_select_columns
 		self._sql_where = sql_where
@@ -112,19 +604,151 @@ class SQLSelect ():
 
 		return [sql_table for table_bool, sql_table in zip(self._tables_in_select, self._sql_tables) if table_bool]
 
-	def select (self):
+	def whereStatement (self):
+
+		# Assign the where clauses, joining the tables using their foreign keys. The joins are not stored, so the statement may be built repeatedly
+		where_clauses = [self._sql_where.where_statement] if self._sql_where else []
 		if self._total_tables_in_select > 1:
-			for parent_key, foreign_key in foreignKeyPairs(self._sql_tables_in_select):
-				if not self._sql_where:
-					self._sql_where = SQLWhere.fromQuery(self._sql_tables)
-				self._sql_where.addEQColWhere(parent_key, foreign_key)
-		self.select_results = list(self._sql_connection.execute(select(self.removeRepeatsInSelect(self._sql_select_tables, self._sql_select_columns)).where(self._sql_where.where_statement)))
+			where_clauses.extend([parent_key == foreign_key for parent_key, foreign_key in foreignKeyPairs(self._sql_tables_in_select)])
+		if not where_clauses: return None
+		return and_(*where_clauses)
+
+	def selectStatement (self):
+		where_statement = self.whereStatement()
+		if where_statement is None: return select(self.removeRepeatsInSelect(self._sql_select_tables, self._sql_select_columns))
+		return select(self.removeRepeatsInSelect(self._sql_select_tables, self._sql_select_columns)).where(where_statement)
+
+	def valuesTables (self):
+
+		# Return the context of the temporary value tables of the where, if any
+		if not self._sql_where: return nullcontext()
+		return self._sql_where.valuesTables()
+
+	def executeSelect (self, sql_statement):
+
+		# Execute the select, with the temporary value tables of the where
+		with self.valuesTables(): return list(self._sql_connection.execute(sql_statement))
+
+	def select (self):
+		sql_statement = self.selectStatement()
+
+		# Select without the cache, if not assigned
+		if self._sql_cache is None:
+			self.select_results = self.executeSelect(sql_statement)
+			return
+
+		# Assign the cache key using the compiled statement and parameters
+		sql_url = str(self._sql_connection.bind.url)
+		sql_compiled = sql_statement.compile(dialect = self._sql_connection.bind.dialect)
+		sql_text = str(sql_compiled)
+
+		# Replace the temporary value tables (named by uuid) with their position and values
+		values_tables = self._sql_where._values_tables if self._sql_where else {}
+		for table_pos, values_table in enumerate(values_tables):
+			sql_text = sql_text.replace(values_table.name, f'temp_values_{table_pos}')
+		cache_key = (sql_url, sql_text, repr(sorted(sql_compiled.params.items())), tuple([tuple(col_values) for col_values in values_tables.values()]))
+		table_names = sorted(set([str(sql_table) for sql_table in sql_statement.froms]) - set([values_table.name for values_table in values_tables]))
+
+		# Skip the cache if the tables have uncommitted changes within the session
+		if set(table_names) & self._sql_connection.info.get('modified_tables', set()):
+			self.select_results = self.executeSelect(sql_statement)
+			return
+
+		# Select using the cache, if possible
+		self.select_results = self._sql_cache.get(cache_key, sql_url, table_names)
+		if self.select_results is None:
+			self.select_results = self.executeSelect(sql_statement)
+			self._sql_cache.put(cache_key, sql_url, table_names, self.select_results)
+
+	def selectChunks (self, chunk_size = 10000):
+		'''
+			Yield the selected rows in chunks
+
+			Uses a server-side cursor (if supported by the database) so only
+			a single chunk of rows is held in memory.
+		'''
+
+		with self.valuesTables():
+
+			# Execute the select with a server-side cursor
+			select_results = self._sql_connection.execute(self.selectStatement().execution_options(stream_results = True))
+
+			# Yield the rows in chunks, closing the cursor when done
+			try:
+				while True:
+					select_chunk = select_results.fetchmany(chunk_size)
+					if not select_chunk: break
+					yield select_chunk
+			finally:
+				select_results.close()
+
+	def explain (self):
+
+		# Compile the select for the database
+		sql_compiled = self.selectStatement().compile(dialect = self._sql_connection.bind.dialect)
+		if sql_compiled.positional: sql_params = tuple([sql_compiled.params[param_name] for param_name in sql_compiled.positiontup])
+		else: sql_params = sql_compiled.params
+
+		# Assign the explain command of the database
+		if self._sql_connection.bind.dialect.name == 'sqlite': explain_command = 'EXPLAIN QUERY PLAN'
+		else: explain_command = 'EXPLAIN'
+
+		# Explain the select using the DBAPI cursor, as the statement is already compiled
+		with self.valuesTables():
+			explain_cursor = self._sql_connection.connection().connection.cursor()
+			try:
+				explain_cursor.execute(f'{explain_command} {sql_compiled}', sql_params)
+				explain_rows = explain_cursor.fetchall()
+			finally:
+				explain_cursor.close()
+
+		# Return the plan as a list of lines, the detail is the last column in each database
+		return [str(explain_row[-1]) for explain_row in explain_rows]
+
+	def missingIndexes (self, query_plan = None):
+		'''
+			Report the columns without an index that are used to filter or
+			join a table read by a full scan (or an automatic index)
+
+			Returns
+			-------
+			dict
+				Table name: list of column names
+		'''
+
+		# Explain the select, if needed
+		if query_plan is None: query_plan = self.explain()
+
+		# Assign the tables read by a full scan
+		scanned_tables = set()
+		for plan_line in query_plan:
+			for sql_table in self._sql_tables:
+				table_regex = re.escape(sql_table.name)
+				if re.search(rf'\bSCAN (TABLE )?{table_regex}\b|AUTOMATIC (COVERING |PARTIAL )*INDEX ON {table_regex}\b|Seq Scan on (\S+\.)?{table_regex}\b', plan_line):
+					scanned_tables.add(sql_table.name)
+
+		# Assign the columns used by the where statement (including the joins), if any
+		where_statement = self.whereStatement()
+		if where_statement is None: return {}
+		missing_indexes = defaultdict(list)
+		for where_element in visitors.iterate(where_statement, {}):
+			if not isinstance(where_element, Column) or where_element.table.name not in scanned_tables: continue
+			if where_element.name in indexedColumns(where_element.table) or where_element.name in missing_indexes[where_element.table.name]: continue
+			missing_indexes[where_element.table.name].append(where_element.name)
+
+		return {table_name:column_names for table_name, column_names in missing_indexes.items() if column_names}
 
 	def toDataFrame (self):
 
 		# Return as dataframe
 		return(pd.DataFrame([dict(_r) for _r in self.select_results]))
 
+	def toDataFrameChunks (self, chunk_size = 10000):
+
+		# Yield the selected rows as dataframes
+		for select_chunk in self.selectChunks(chunk_size):
+			yield pd.DataFrame.from_records(select_chunk, columns = select_chunk[0].keys())
+
 	def toFile (self, out_filename, sep, warn_if_nothing = True):
 
 		# Check if any data was returned, if not return nothing
@@ -144,6 +768,70 @@ class SQLSelect ():
 		# Update log
 		logging.info('Retrieved results written to file (%s)' % out_filename)
 
+	def toFileChunks (self, out_filename, sep, chunk_size = 10000, warn_if_nothing = True):
+
+		# Check if any data was returned, if not return nothing
+		select_chunks = self.selectChunks(chunk_size)
+		select_chunk = next(select_chunks, None)
+		if not select_chunk:
+			if warn_if_nothing: logging.warning(f'Nothing to return. File ({out_filename}) not created')
+			else: logging.info(f'Nothing to return.')
+			return
+
+		# Create the output file, writing each chunk as it is selected
+		with open(out_filename, 'w') as entries_file:
+			entries_writer = csv.writer(entries_file, delimiter = sep)
+			entries_writer.writerow(select_chunk[0].keys())
+			entries_writer.writerows(select_chunk)
+			for select_chunk in select_chunks:
+				entries_writer.writerows(select_chunk)
+
+		# Update log
+		logging.info('Retrieved results written to file (%s)' % out_filename)
+
+	def toColumnarFile (self, out_filename, out_format = 'parquet', chunk_size = 10000, warn_if_nothing = True):
+		'''
+			Write the selected rows to a columnar file, in chunks
+
+			Each chunk is written as a record batch, typed using the
+			selected columns (i.e. dates, booleans, and numerics are not
+			converted to strings). Requires pyarrow.
+
+			Parameters
+			----------
+			out_filename : str
+				Filename of the output
+			out_format : str, optional
+				Columnar format: parquet or feather
+			chunk_size : int, optional
+				Rows within each record batch
+		'''
+
+		# Confirm the format, and that pyarrow is installed
+		checkArrow(out_format)
+
+		# Check if any data was returned, if not return nothing
+		select_chunks = self.selectChunks(chunk_size)
+		select_chunk = next(select_chunks, None)
+		if not select_chunk:
+			if warn_if_nothing: logging.warning(f'Nothing to return. File ({out_filename}) not created')
+			else: logging.info(f'Nothing to return.')
+			return
+
+		# Assign the schema, using the names of the results and the types of the selected columns
+		sql_columns = list(select(self.removeRepeatsInSelect(self._sql_select_tables, self._sql_select_columns)).columns)
+		if len(sql_columns) != len(select_chunk[0].keys()): raise Exception(f'Unable to assign the types of the selected columns: {", ".join(select_chunk[0].keys())}')
+		arrow_schema = arrowSchema(select_chunk[0].keys(), [sql_column.type for sql_column in sql_columns])
+
+		# Create the output file, writing each chunk as it is selected
+		with columnarWriter(out_filename, out_format, arrow_schema) as columnar_writer:
+			columnar_writer.write_batch(arrowRecordBatch(select_chunk, arrow_schema))
+			for select_chunk in select_chunks:
+				columnar_writer.write_batch(arrowRecordBatch(select_chunk, arrow_schema))
+
+		# Update log
+		logging.info('Retrieved results written to file (%s)' % out_filename)
+
 	def toScreen (self, sep, warn_if_nothing = True):
 
 		# Check if any data was returned, if not return nothing
@@ -172,7 +860,10 @@ class SQLSelect ():
 				   sql_where = [], 
 				   sql_tables = config_data.sql_tables, 
 				   tables_in_select = [False] * len(config_data.sql_tables), 
-				   sql_connection = sql_connection)
+				   sql_connection = sql_connection,
+				   sql_cache = cachedResultCacheFromConfig(config_data),
+				   sql_column_index = config_data.column_index,
+				   in_threshold = config_data.in_threshold)
 
 	def addTableToSelect (self, table):
 
@@ -196,10 +887,9 @@ class SQLSelect ():
 	def addColumnToSelect (self, column):
 
 		# Add the column, update the tables in use
-		for table_pos, sql_table in enumerate(self._sql_tables):
-			for sql_column in sql_table.columns:
-				if column == sql_column:
-					self._tables_in_select[table_pos] = True
+		for table_pos, sql_column, _ in self._sql_column_index.get(column.name, []):
+			if column is sql_column:
+				self._tables_in_select[table_pos] = True
 		if column in self._sql_select_columns: raise Exception('Column (%s) already assigned' % column)
 		self._sql_select_columns.append(column)
 
@@ -207,12 +897,7 @@ class SQLSelect ():
 
 		# Add the columns, update the tables in use
 		for column in columns:
-			for table_pos, sql_table in enumerate(self._sql_tables):
-				for sql_column in sql_table.columns:
-					if column == sql_column:
-						self._tables_in_select[table_pos] = True
-			if column in self._sql_select_columns: raise Exception('Column (%s) already assigned' % column)
-			self._sql_select_columns.append(column)
+			self.addColumnToSelect(column)
 
 	def addDictWhere (self, where_dict, include = None, cmp_type = None, dict_type = None):
 
@@ -222,7 +907,7 @@ class SQLSelect ():
 
 		# Add the where statement from a dict, update the tables in use
 		if not self._sql_where:
-			self._sql_where = SQLWhere.fromQuery(self._sql_tables)
+			self._sql_where = SQLWhere.fromQuery(self._sql_tables, self._sql_column_index, self._sql_connection, self._in_threshold)
 		if dict_type == 'Column': self._sql_where.addColDictWhere(where_dict, include = include, cmp_type = cmp_type)
 		elif dict_type == 'Table': self._sql_where.addTableDictWhere(where_dict, include = include, cmp_type = cmp_type)
 		for table_pos in self._sql_where._tables_used:
@@ -258,13 +943,18 @@ class SQLSelect ():
 		return updated_tables + updated_columns
 
 class SQLUpdate ():
-	def __init__ (self, sql_update = None, sql_values = {}, sql_where = [], sql_tables = [], tables_in_update = [], sql_connection = None):
+	def __init__ (self, sql_update = None, sql_values = {}, sql_where = [], sql_tables = [], tables_in_update = [], sql_connection = None, sql_bulk_key = None, sql_bulk_values = [], sql_batch_size = 10000, sql_column_index = None, in_threshold = 1000):
 		self._sql_update = sql_update
+		self._in_threshold = in_threshold
+		self._sql_column_index = sql_column_index if sql_column_index is not None else indexColumns(sql_tables)
 		self._sql_values = sql_values
 		self._sql_where = sql_where
 		self._sql_tables = sql_tables
 		self._tables_in_update = tables_in_update 
 		self._sql_connection = sql_connection
+		self._sql_bulk_key = sql_bulk_key
+		self._sql_bulk_values = sql_bulk_values
+		self._sql_batch_size = sql_batch_size
 
 	@property
 	def _total_tables_in_update (self):
@@ -277,16 +967,38 @@ class SQLUpdate ():
 	def update (self):
 
 		# Update the values
+		markTableModified(self._sql_connection, self._sql_update)
 		if self._sql_where:
 			if self._total_tables_in_update > 1:
 				for parent_key, foreign_key in foreignKeyPairs(self._sql_tables_in_update):
 					if not self._sql_where:
-						self._sql_where = SQLWhere.fromQuery(self._sql_tables)
+						self._sql_where = SQLWhere.fromQuery(self._sql_tables, self._sql_column_index, self._sql_connection, self._in_threshold)
 					self._sql_where.addEQColWhere(parent_key, foreign_key)
-			self._sql_connection.execute(self._sql_update.update().values(**self._sql_values).where(self._sql_where.where_statement))
+			with self._sql_where.valuesTables():
+				self._sql_connection.execute(self._sql_update.update().values(**self._sql_values).where(self._sql_where.where_statement))
 		else:
 			self._sql_connection.execute(self._sql_update.update().values(**self._sql_values))
 
+	def bulkUpdate (self):
+
+		# Assign the columns to update, and confirm there are values to update
+		value_cols = [col_name for col_name in self._sql_bulk_values[0] if col_name != self._sql_bulk_key] if self._sql_bulk_values else []
+		if not value_cols: return
+
+		# Create a single statement, binding the key and values of each row
+		markTableModified(self._sql_connection, self._sql_update)
+		sql_statement = self._sql_update.update().where(self._sql_update.columns[self._sql_bulk_key] == bindparam(f'key_{self._sql_bulk_key}'))
+		sql_statement = sql_statement.values({col_name:bindparam(f'value_{col_name}') for col_name in value_cols})
+
+		# Update the batches using executemany with the statement
+		for batch_start in range(0, len(self._sql_bulk_values), self._sql_batch_size):
+			sql_batch = []
+			for sql_values in self._sql_bulk_values[batch_start:batch_start + self._sql_batch_size]:
+				sql_bind_values = {f'value_{col_name}':sql_values[col_name] for col_name in value_cols}
+				sql_bind_values[f'key_{self._sql_bulk_key}'] = sql_values[self._sql_bulk_key]
+				sql_batch.append(sql_bind_values)
+			self._sql_connection.execute(sql_statement, sql_batch)
+
 	@classmethod
 	def fromConfig (cls, config_data, sql_connection):
 
@@ -296,7 +1008,12 @@ class SQLUpdate ():
 				   sql_where = [], 
 				   sql_tables = config_data.sql_tables, 
 				   tables_in_update = [False] * len(config_data.sql_tables), 
-				   sql_connection = sql_connection)
+				   sql_connection = sql_connection,
+				   sql_bulk_key = None,
+				   sql_bulk_values = [],
+				   sql_batch_size = config_data.batch_size,
+				   sql_column_index = config_data.column_index,
+				   in_threshold = config_data.in_threshold)
 
 	def addTableToUpdate(self, table):
 
@@ -313,6 +1030,16 @@ class SQLUpdate ():
 		sql_values = SQLValues.fromColDictValues(self._sql_update, col_dict)
 		self._sql_values = sql_values
 
+	def addDataFrameValues (self, dataframe, key_col):
+
+		# Confirm the columns once, as each row shares the columns of the dataframe
+		SQLValues.fromColDictValues(self._sql_update, {col_name:None for col_name in dataframe.columns})
+		if key_col not in dataframe.columns: raise Exception(f'Unable to assign key column ({key_col})')
+
+		# Add the rows to update, matched using the key column
+		self._sql_bulk_key = key_col
+		self._sql_bulk_values = dataframe.to_dict('records')
+
 	'''
 	def addDictWhere(self, where_dict, include = None, type = None, table_dict = False):
 
@@ -334,7 +1061,7 @@ class SQLUpdate ():
 
 		# Add the where statement from a dict, update the tables in use
 		if not self._sql_where:
-			self._sql_where = SQLWhere.fromQuery(self._sql_tables)
+			self._sql_where = SQLWhere.fromQuery(self._sql_tables, self._sql_column_index, self._sql_connection, self._in_threshold)
 		if dict_type == 'Column': self._sql_where.addColDictWhere(where_dict, include = include, cmp_type = cmp_type)
 		elif dict_type == 'Table': self._sql_where.addTableDictWhere(where_dict, include = include, cmp_type = cmp_type)
 		for table_pos in self._sql_where._tables_used:
@@ -342,7 +1069,7 @@ class SQLUpdate ():
 				self._tables_in_update[table_pos] = True
 
 class SQLInsert ():
-	def __init__ (self, sql_insert = None, sql_values = [], sql_tables = [], tables_in_insert = [], sql_ignore_constraint = '', sql_update_constraint = '', sql_connection = None, sql_type = ''):
+	def __init__ (self, sql_insert = None, sql_values = [], sql_tables = [], tables_in_insert = [], sql_ignore_constraint = '', sql_update_constraint = '', sql_connection = None, sql_type = '', sql_batch_size = 10000):
 		self._sql_insert = sql_insert
 		self._sql_values = sql_values
 		self._sql_tables = sql_tables
@@ -350,18 +1077,105 @@ class SQLInsert ():
 		self._sql_ignore_constraint = sql_ignore_constraint
 		self._sql_connection = sql_connection
 		self._sql_type = sql_type
+		self._sql_batch_size = sql_batch_size
+
+	@property
+	def _sql_batches (self):
+
+		# Yield the values in batches, confirming the columns once per batch
+		for batch_start in range(0, len(self._sql_values), self._sql_batch_size):
+			sql_batch = self._sql_values[batch_start:batch_start + self._sql_batch_size]
+			batch_cols = sql_batch[0].keys()
+			for col_name in batch_cols:
+				if col_name not in self._sql_insert.columns: raise Exception('Unable to assign column: %s' % col_name)
+			if any(sql_values.keys() != batch_cols for sql_values in sql_batch): raise Exception('Values of a batch must have the same columns')
+			yield sql_batch
 
 	def insert (self):
 
+		markTableModified(self._sql_connection, self._sql_insert)
 		self._sql_connection.execute(insert(self._sql_insert).values(self._sql_values))
 
 	def insertIgnore (self):
 
+		markTableModified(self._sql_connection, self._sql_insert)
 		if self._sql_type == 'postgresql': 
 			self._sql_connection.execute(postgresql_insert(self._sql_insert).values(self._sql_values).on_conflict_do_nothing(constraint = self._sql_ignore_constraint))
 		else: 
 			self._sql_connection.execute(insert(self._sql_insert).values(self._sql_values).prefix_with('OR IGNORE'))
 
+	def bulkStatement (self, ignore = False):
+
+		# Return the statement used for each batch, without values
+		if not ignore: return insert(self._sql_insert)
+		elif self._sql_type == 'postgresql': return postgresql_insert(self._sql_insert).on_conflict_do_nothing(constraint = self._sql_ignore_constraint)
+		else: return insert(self._sql_insert).prefix_with('OR IGNORE')
+
+	def bulkInsert (self):
+
+		# Insert the batches using executemany with a single statement
+		markTableModified(self._sql_connection, self._sql_insert)
+		sql_statement = self.bulkStatement()
+		for sql_batch in self._sql_batches:
+			self._sql_connection.execute(sql_statement, sql_batch)
+
+	def bulkInsertIgnore (self):
+
+		# Insert the batches using executemany with a single statement, ignoring conflicts
+		markTableModified(self._sql_connection, self._sql_insert)
+		sql_statement = self.bulkStatement(ignore = True)
+		for sql_batch in self._sql_batches:
+			self._sql_connection.execute(sql_statement, sql_batch)
+
+	def upsertStatement (self, insert_cols, conflict_cols, update_cols):
+
+		# Return the statement for postgresql, using the dialect insert
+		if self._sql_type == 'postgresql':
+			sql_statement = postgresql_insert(self._sql_insert)
+			if not update_cols: return sql_statement.on_conflict_do_nothing(index_elements = conflict_cols)
+			return sql_statement.on_conflict_do_update(index_elements = conflict_cols, set_ = {col_name:sql_statement.excluded[col_name] for col_name in update_cols})
+
+		# Confirm sqlite supports upsert, i.e. 3.24 or later
+		if sqlite3.sqlite_version_info < (3, 24, 0): raise Exception(f'Upsert requires SQLite 3.24 or later, found: {sqlite3.sqlite_version}')
+
+		# Return the statement for sqlite, as text with the column types for the binds
+		identifier_preparer = sqlite_dialect().identifier_preparer
+		insert_str = ', '.join([identifier_preparer.quote(col_name) for col_name in insert_cols])
+		values_str = ', '.join([f':{col_name}' for col_name in insert_cols])
+		conflict_str = ', '.join([identifier_preparer.quote(col_name) for col_name in conflict_cols])
+		if update_cols: update_str = 'UPDATE SET ' + ', '.join([f'{identifier_preparer.quote(col_name)} = excluded.{identifier_preparer.quote(col_name)}' for col_name in update_cols])
+		else: update_str = 'NOTHING'
+		sql_statement = text(f'INSERT INTO {identifier_preparer.format_table(self._sql_insert)} ({insert_str}) VALUES ({values_str}) ON CONFLICT ({conflict_str}) DO {update_str}')
+		return sql_statement.bindparams(*[bindparam(col_name, type_ = self._sql_insert.columns[col_name].type) for col_name in insert_cols])
+
+	def upsert (self, conflict_cols, update_cols = None):
+		'''
+			Insert the values in batches, updating rows that conflict
+
+			Parameters
+			----------
+			conflict_cols : list
+				Columns of a unique constraint (or primary key) used
+				to detect conflicts
+			update_cols : list, optional
+				Columns updated on conflict. Default: all inserted
+				columns not within conflict_cols
+		'''
+
+		# Confirm the columns
+		for col_name in list(conflict_cols) + list(update_cols if update_cols else []):
+			if col_name not in self._sql_insert.columns: raise Exception(f'Unable to assign column ({col_name})')
+
+		# Upsert the batches using executemany, creating the statement once per column set
+		markTableModified(self._sql_connection, self._sql_insert)
+		sql_statements = {}
+		for sql_batch in self._sql_batches:
+			insert_cols = tuple(sql_batch[0].keys())
+			if insert_cols not in sql_statements:
+				batch_update_cols = update_cols if update_cols is not None else [col_name for col_name in insert_cols if col_name not in conflict_cols]
+				sql_statements[insert_cols] = self.upsertStatement(insert_cols, conflict_cols, batch_update_cols)
+			self._sql_connection.execute(sql_statements[insert_cols], sql_batch)
+
 	@classmethod
 	def fromConfig (cls, config_data, sql_connection):
 
@@ -371,7 +1185,8 @@ class SQLInsert ():
 				   sql_tables = config_data.sql_tables, 
 				   tables_in_insert = [False] * len(config_data.sql_tables),
 				   sql_connection = sql_connection,
-				   sql_type = config_data.type)
+				   sql_type = config_data.type,
+				   sql_batch_size = config_data.batch_size)
 
 	def addIgnore (self, col_name):
 
@@ -414,12 +1229,139 @@ class SQLInsert ():
 
 	def addDataFrameValues (self, dataframe):
 
-		# Convert the dataframe
-		col_dict_list = dataframe.to_dict('records')
+		# Confirm the columns once, as each row shares the columns of the dataframe
+		SQLValues.fromColDictValues(self._sql_insert, {col_name:None for col_name in dataframe.columns})
 
 		# Add the values
-		self.addListValues(col_dict_list)
+		self._sql_values.extend(dataframe.to_dict('records'))
 		
+class BulkLoader ():
+	def __init__ (self, sql_tables = [], sql_connection = None, sql_type = '', sql_batch_size = 10000, copy_threshold = 10000):
+		self._sql_tables = sql_tables
+		self._sql_connection = sql_connection
+		self._sql_type = sql_type
+		self._sql_batch_size = sql_batch_size
+		self._copy_threshold = copy_threshold
+
+	@contextmanager
+	def fastLoad (self):
+
+		# No fast-load options by default
+		yield self
+
+	def load (self, table, dataframe):
+
+		# Insert the dataframe using executemany batches
+		sql_insert = SQLInsert(sql_values = [], 
+							   sql_tables = self._sql_tables, 
+							   tables_in_insert = [False] * len(self._sql_tables),
+							   sql_connection = self._sql_connection,
+							   sql_type = self._sql_type,
+							   sql_batch_size = self._sql_batch_size)
+		sql_insert.addTableToInsert(table)
+		sql_insert.addDataFrameValues(dataframe)
+		sql_insert.bulkInsert()
+
+	@classmethod
+	def fromConfig (cls, config_data, sql_connection):
+
+		# Assign the loader class using the database type
+		if config_data.type == 'sqlite': loader_class = SQLiteBulkLoader
+		elif config_data.type == 'postgresql': loader_class = PostgreSQLBulkLoader
+		else: loader_class = cls
+
+		# Create a BulkLoader object from the config file and sql_connection
+		return loader_class(sql_tables = config_data.sql_tables,
+							sql_connection = sql_connection,
+							sql_type = config_data.type,
+							sql_batch_size = config_data.batch_size,
+							copy_threshold = config_data.copy_threshold)
+
+class SQLiteBulkLoader (BulkLoader):
+
+	@contextmanager
+	def fastLoad (self):
+		'''
+			Fast-load context for SQLite
+
+			Keeps the rollback journal in memory and skips syncing to disk
+			until the context ends. SQLite file connections are not pooled
+			(i.e. each transaction uses a new connection), so the pragmas
+			are assigned to each connection checked out within the context.
+			SQLite cannot change these pragmas within a transaction, so the
+			context should enclose the whole transaction.
+		'''
+
+		def assignPragmas (dbapi_connection, connection_record, connection_proxy):
+			dbapi_connection.execute('PRAGMA journal_mode = MEMORY')
+			dbapi_connection.execute('PRAGMA synchronous = OFF')
+
+		# Store the current pragmas
+		journal_mode = self._sql_connection.execute('PRAGMA journal_mode').scalar()
+		synchronous = self._sql_connection.execute('PRAGMA synchronous').scalar()
+
+		# Assign the fast-load pragmas to the current connection, and any connection checked out within the context
+		sql_engine = self._sql_connection.get_bind()
+		event.listen(sql_engine, 'checkout', assignPragmas)
+		self._sql_connection.execute('PRAGMA journal_mode = MEMORY')
+		self._sql_connection.execute('PRAGMA synchronous = OFF')
+
+		try: yield self
+
+		# Restore the previous pragmas, used by connections that are kept open (e.g. in-memory databases). Not possible if the transaction was left open (i.e. an error before the rollback)
+		finally:
+			event.remove(sql_engine, 'checkout', assignPragmas)
+			if not self._sql_connection.connection().connection.in_transaction:
+				self._sql_connection.execute(f'PRAGMA journal_mode = {journal_mode}')
+				self._sql_connection.execute(f'PRAGMA synchronous = {synchronous}')
+
+class PostgreSQLBulkLoader (BulkLoader):
+
+	def copyStatement (self, table, columns):
+
+		# Assign the quoted table (with schema, if assigned) and columns
+		identifier_preparer = postgresql_dialect().identifier_preparer
+		copy_columns = ', '.join([identifier_preparer.quote(str(column)) for column in columns])
+		return f"COPY {identifier_preparer.format_table(table)} ({copy_columns}) FROM STDIN WITH (FORMAT csv)"
+
+	@staticmethod
+	def csvField (value):
+
+		# Leave NULL unquoted and empty (the CSV default), quoting strings to keep empty strings (and \N) apart
+		if value is None: return ''
+		if isinstance(value, str): return '"' + value.replace('"', '""') + '"'
+		return str(value)
+
+	def copyBuffers (self, dataframe):
+
+		# Yield the dataframe as CSV batches
+		for batch_start in range(0, len(dataframe), self._sql_batch_size):
+			csv_batch = dataframe.iloc[batch_start:batch_start + self._sql_batch_size]
+			csv_batch = csv_batch.astype(object).where(csv_batch.notna(), None)
+			csv_buffer = io.StringIO()
+			for csv_row in csv_batch.itertuples(index = False, name = None):
+				csv_buffer.write(','.join([self.csvField(value) for value in csv_row]) + '\n')
+			csv_buffer.seek(0)
+			yield csv_buffer
+
+	def load (self, table, dataframe):
+
+		# Use executemany batches below the threshold
+		if len(dataframe) < self._copy_threshold: return super().load(table, dataframe)
+
+		# Confirm the columns
+		SQLValues.fromColDictValues(table, {col_name:None for col_name in dataframe.columns})
+
+		# Stream the batches using COPY, within the transaction of the session
+		markTableModified(self._sql_connection, table)
+		copy_statement = self.copyStatement(table, dataframe.columns)
+		copy_cursor = self._sql_connection.connection().connection.cursor()
+		try:
+			for csv_buffer in self.copyBuffers(dataframe):
+				copy_cursor.copy_expert(copy_statement, csv_buffer)
+		finally:
+			copy_cursor.close()
+
 class SQLValues (dict):
 	def __init__(self, *arg, **kw):
 		super(SQLValues, self).__init__(*arg, **kw)
@@ -429,22 +1371,24 @@ class SQLValues (dict):
 
 		# Add the column-based dict values
 		for col_name, col_value in col_dict.items():
-			try: 
-				getattr(sql_table.columns, col_name)
-			except: raise Exception('Unable to assign value: %s: %s' % (col_name, col_value))
+			if col_name not in sql_table.columns: raise Exception('Unable to assign value: %s: %s' % (col_name, col_value))
 		# Create a SQLValues object
 		return cls(col_dict)
 
 class SQLWhere ():
-	def __init__ (self, sql_tables = [], tables_in_where = []):
+	def __init__ (self, sql_tables = [], tables_in_where = [], sql_column_index = None, sql_connection = None, in_threshold = 1000):
 		self._sql_where = []
 		self._tables_in_where = tables_in_where
 		self._sql_tables = sql_tables
+		self._sql_column_index = sql_column_index if sql_column_index is not None else indexColumns(sql_tables)
+		self._sql_connection = sql_connection
+		self._in_threshold = in_threshold
+		self._values_tables = {}
 
 	@property
 	def where_statement(self):
 		if len(self._sql_where) == 1: return self._sql_where[0]
-		else: return operator.and_(*self._sql_where)
+		else: return and_(*self._sql_where)
 
 	@property
 	def _tables_used (self):
@@ -520,8 +1464,96 @@ class SQLWhere ():
 				where_passed = True
 			except: pass
 			if not where_passed: raise Exception('Unable to assign where: %s: %s' % (col_name, col_values))
-			if include: self._sql_where.append(where_arg.in_(col_values))
-			else: self._sql_where.append(where_arg.notin_(col_values))
+			self._sql_where.append(self.inWhere(where_arg, col_values, include))
+
+	def inWhere (self, where_arg, col_values, include):
+		'''
+			Return an IN (or NOT IN) statement for the values
+
+			Above the threshold, the values are loaded into a temporary
+			table and compared using a subquery. Otherwise, or if the
+			temporary table cannot be created, the values are split into
+			IN statements of up to the threshold.
+		'''
+
+		# Compare the values directly, if below the threshold
+		col_values = list(col_values)
+		if len(col_values) <= self._in_threshold:
+			if include: return where_arg.in_(col_values)
+			else: return where_arg.notin_(col_values)
+
+		# Compare using a temporary table of the values, if possible
+		if self._sql_connection is not None:
+			try:
+				values_table = self.createValuesTable(where_arg, col_values)
+				if include: return where_arg.in_(select([values_table.columns.value]))
+				else: return where_arg.notin_(select([values_table.columns.value]))
+			except SQLAlchemyError as values_table_error:
+				logging.warning(f'Unable to create temporary table, using chunked IN statements: {values_table_error}')
+
+		# Compare using chunks of the values
+		in_chunks = [where_arg.in_(col_values[chunk_start:chunk_start + self._in_threshold]) for chunk_start in range(0, len(col_values), self._in_threshold)]
+		if include: return or_(*in_chunks)
+		else: return not_(or_(*in_chunks))
+
+	def createValuesTable (self, where_arg, col_values):
+
+		# Create a temporary table for the values, PostgreSQL drops the table on commit
+		values_table = Table(f'temp_values_{uuid.uuid4().hex}', MetaData(), Column('value', where_arg.type), prefixes = ['TEMPORARY'], postgresql_on_commit = 'DROP')
+		col_values = list(dict.fromkeys(col_values))
+		self.populateValuesTable(values_table, col_values)
+
+		# Store the values, to create the table again if dropped
+		self._values_tables[values_table] = col_values
+		return values_table
+
+	def populateValuesTable (self, values_table, col_values):
+
+		# Use the connection of the session, as the table is only visible to the connection
+		sql_connection = self._sql_connection.connection()
+
+		# Create and populate the table, within a savepoint for PostgreSQL to keep the transaction usable on failure
+		if sql_connection.dialect.name == 'postgresql':
+			with sql_connection.begin_nested():
+				values_table.create(sql_connection)
+				sql_connection.execute(values_table.insert(), [{'value': col_value} for col_value in col_values])
+		else:
+			values_table.create(sql_connection)
+			sql_connection.execute(values_table.insert(), [{'value': col_value} for col_value in col_values])
+
+	@contextmanager
+	def valuesTables (self):
+		'''
+			Context to execute a statement using the where
+
+			Creates the temporary value tables that no longer exist (i.e.
+			dropped on commit, or by a previous statement). SQLite tables
+			are dropped when the context ends, as SQLite only drops
+			temporary tables when the connection is closed.
+		'''
+
+		# Create the tables, if needed
+		if not self._values_tables:
+			yield self
+			return
+		sql_connection = self._sql_connection.connection()
+		for values_table, col_values in self._values_tables.items():
+			if not sql_connection.dialect.has_table(sql_connection, values_table.name): self.populateValuesTable(values_table, col_values)
+
+		try: yield self
+
+		# Drop the SQLite tables
+		finally:
+			if sql_connection.dialect.name == 'sqlite':
+				for values_table in self._values_tables: values_table.drop(sql_connection, checkfirst = True)
+
+	def assignColumn (self, col_name, col_value):
+
+		# Assign the column using the index, ignoring foreign keys
+		column_entries = [(table_pos, sql_column) for table_pos, sql_column, has_foreign_key in self._sql_column_index.get(col_name, []) if not has_foreign_key]
+		if not column_entries: raise Exception('Unable to assign where: %s: %s' % (col_name, col_value))
+		if len(column_entries) > 1: raise Exception('Unable to assign where: %s is ambiguous, found in tables: %s. Please specify the table' % (col_name, ', '.join([str(sql_column.table) for _, sql_column in column_entries])))
+		return column_entries[0]
 
 	def addColDictWhere (self, col_dict, include, cmp_type):
 
@@ -534,16 +1566,7 @@ class SQLWhere ():
 
 		# Add the column-based dict where
 		for col_name, col_value in col_dict.items():
-			where_pos, where_arg = None, None
-			for table_pos, sql_table in enumerate(self._sql_tables):
-				try:
-					test_arg = getattr(sql_table.columns, col_name)
-					if len(test_arg.foreign_keys) >= 1:
-						continue
-					where_arg = test_arg
-					where_pos = table_pos
-				except: pass
-			if where_pos == None: raise Exception('Unable to assign where: %s: %s' % (col_name, col_value))
+			where_pos, where_arg = self.assignColumn(col_name, col_value)
 			if not self._tables_in_where[where_pos]: self._tables_in_where[where_pos] = True
 			if include: self._sql_where.append(where_arg == col_value)
 			else: self._sql_where.append(where_arg != col_value)
@@ -552,16 +1575,7 @@ class SQLWhere ():
 
 		# Add the column-based dict where
 		for col_name, col_value in col_dict.items():
-			where_pos, where_arg = None, None
-			for table_pos, sql_table in enumerate(self._sql_tables):
-				try:
-					test_arg = getattr(sql_table.columns, col_name)
-					if len(test_arg.foreign_keys) >= 1:
-						continue
-					where_arg = test_arg
-					where_pos = table_pos
-				except: pass
-			if where_pos == None: raise Exception('Unable to assign where: %s: %s' % (col_name, col_value))
+			where_pos, where_arg = self.assignColumn(col_name, col_value)
 			if not self._tables_in_where[where_pos]: self._tables_in_where[where_pos] = True
 			if include: self._sql_where.append(where_arg.like(col_value))
 			else: self._sql_where.append(where_arg.notilike(col_value))
@@ -571,20 +1585,9 @@ class SQLWhere ():
 		# Add the column-based dict where
 		for col_name, col_values in col_dict.items():
 			if not isinstance(col_values, list): Exception('Column values are not list')
-			where_pos, where_arg = None, None
-			for table_pos, sql_table in enumerate(self._sql_tables):
-				try:
-					test_arg = getattr(sql_table.columns, col_name)
-					if len(test_arg.foreign_keys) >= 1:
-						continue
-					where_arg = test_arg
-					where_pos = table_pos
-				except: pass
-
-			if where_pos == None: raise Exception('Unable to assign where: %s: %s' % (col_name, col_values))
+			where_pos, where_arg = self.assignColumn(col_name, col_values)
 			if not self._tables_in_where[where_pos]: self._tables_in_where[where_pos] = True
-			if include: self._sql_where.append(where_arg.in_(col_values))
-			else: self._sql_where.append(where_arg.notin_(col_values))
+			self._sql_where.append(self.inWhere(where_arg, col_values, include))
 			
 	def addEQColWhere (self, col1, col2):
 
@@ -596,17 +1599,24 @@ class SQLWhere ():
 			logging.warning('Where (%s) already assigned' % str(new_where))
 
 	@classmethod
-	def fromConfig (cls, config_data):
+	def fromConfig (cls, config_data, sql_connection = None):
 
-		# Create a SQLWhere object
-		return cls(sql_tables = config_data.sql_tables, tables_in_where = [False] * len(config_data.sql_tables))
+		# Create a SQLWhere object from the config file and sql_connection
+		return cls(sql_tables = config_data.sql_tables, 
+				   tables_in_where = [False] * len(config_data.sql_tables), 
+				   sql_column_index = config_data.column_index, 
+				   sql_connection = sql_connection,
+				   in_threshold = config_data.in_threshold)
 
 	@classmethod
-	def fromQuery (cls, sql_tables):
+	def fromQuery (cls, sql_tables, sql_column_index = None, sql_connection = None, in_threshold = 1000):
 
 		# Create a SQLWhere object
 		return cls(sql_tables = sql_tables, 
-				   tables_in_where = [False] * len(sql_tables))
+				   tables_in_where = [False] * len(sql_tables),
+				   sql_column_index = sql_column_index,
+				   sql_connection = sql_connection,
+				   in_threshold = in_threshold)
 
 '''
 def currentTime(timezone = 'US/Eastern'):
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import logging
+
+from collections import defaultdict
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from kocher_tools.logger import *
+
+def explainParser ():
+	'''
+	Argument parser for explaining database selections
+
+	Raises
+	------
+	IOError
+		If the specified files do not exist
+	'''
+
+	def confirmFile ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	def selectionDict ():
+		'''Custom action to add items to a dict'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value_list, option_string=None):
+				if not getattr(args, self.dest): setattr(args, self.dest, defaultdict(list))
+				getattr(args, self.dest)[value_list[0]].append(value_list[1])
+		return customAction
+
+	explain_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+
+	# Selection arguments
+	explain_parser.add_argument('--table', help = 'Table(s) to select', type = str, nargs = '+', required = True)
+	explain_parser.add_argument('--include', metavar = ('column', 'value'), help = 'Column/value pair to filter the selection', type = str, nargs = 2, action = selectionDict())
+	explain_parser.add_argument('--like', metavar = ('column', 'value'), help = 'Column/pattern pair to filter the selection', type = str, nargs = 2, action = selectionDict())
+
+	# Output arguments
+	explain_parser.add_argument('--out-log', help = 'Filename of the log file', type = str, default = 'explain_database.log')
+	explain_parser.add_argument('--log-stdout', help = 'Direct logging to stdout', action = 'store_true')
+
+	# Database arguments
+	explain_parser.add_argument('--yaml', dest = 'config_file', help = 'Database YAML config file', type = str, required = True, action = confirmFile())
+
+	return explain_parser.parse_args()
+
+def main():
+
+	# Assign arguments
+	explain_args = explainParser()
+
+	# Start a log for this run
+	if explain_args.log_stdout: startLogger()
+	else: startLogger(log_filename = explain_args.out_log)
+	logArgs(explain_args)
+
+	# Open the config and start the SQL session
+	config_data = ConfigDB.readConfig(explain_args.config_file)
+	sql_connection = startSessionFromConfig(config_data)
+
+	# Create the selection, as used by the other commands
+	sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+	for table in explain_args.table:
+		if table not in config_data.tables: raise Exception(f'Unable to assign table: {table}')
+		sql_select.addTableToSelect(config_data[table])
+	if explain_args.include:
+		for column, values in explain_args.include.items():
+			if len(values) == 1: sql_select.addDictWhere({column: values[0]}, include = True, cmp_type = 'EQ', dict_type = 'Column')
+			else: sql_select.addDictWhere({column: values}, include = True, cmp_type = 'IN', dict_type = 'Column')
+	if explain_args.like:
+		for column, values in explain_args.like.items():
+			for value in values: sql_select.addDictWhere({column: value}, include = True, cmp_type = 'LIKE', dict_type = 'Column')
+
+	# Explain the selection
+	query_plan = sql_select.explain()
+	missing_indexes = sql_select.missingIndexes(query_plan)
+	sql_connection.close()
+
+	# Report the query plan
+	print('Query plan:')
+	for plan_line in query_plan: print(f'\t{plan_line}')
+	logging.info(f'Query plan: {query_plan}')
+
+	# Report the missing indexes
+	if not missing_indexes:
+		print('No missing indexes found')
+		logging.info('No missing indexes found')
+		return
+	print('Missing indexes (add "index: True" to the column within the YAML):')
+	for table, columns in missing_indexes.items():
+		for column in columns:
+			print(f'\t{table}: {column}')
+			logging.warning(f'Missing index: {table}.{column}')
+
+if __name__== "__main__":
+	main()
@@ -0,0 +1,178 @@
+import os
+import mmap
+import logging
+
+import pandas as pd
+
+class FASTAIndex ():
+	'''
+		Byte offset index of a FASTA file
+
+		The offsets of each record are stored within a sidecar file (by
+		default: the FASTA filename with .offsets), which is used while
+		the size and modification time of the FASTA file are unchanged.
+		Records are sliced from a memory-mapped FASTA file, without
+		parsing the records.
+
+		Parameters
+		----------
+		fasta_filename : str or file-like
+			Filename of the FASTA file, or a binary stream (e.g. from
+			zipfile.ZipFile.open). Streams are read into memory and
+			are not cached
+		index_filename : str, optional
+			Filename of the sidecar index
+		cache_index : bool, optional
+			Defines if the sidecar index should be written
+	'''
+
+	def __init__ (self, fasta_filename, index_filename = None, cache_index = True):
+		self._fasta_file = None
+		self._fasta_mmap = None
+		self._offsets = None
+
+		# Read the stream, if given
+		if not isinstance(fasta_filename, str):
+			self.fasta_filename = getattr(fasta_filename, 'name', str(fasta_filename))
+			self.index_filename = None
+			self._fasta_mmap = fasta_filename.read()
+			self._buildIndex()
+			return
+
+		self.fasta_filename = fasta_filename
+		self.index_filename = index_filename if index_filename else f'{fasta_filename}.offsets'
+
+		# Read the sidecar index, or build the index if not found or out of date
+		if not self._readIndex():
+			self._buildIndex()
+			if cache_index: self._writeIndex()
+
+	def __enter__ (self):
+		return self
+
+	def __exit__ (self, exc_type, exc_value, traceback):
+		self.close()
+
+	def __len__ (self):
+		return len(self._offsets)
+
+	def __contains__ (self, record_id):
+		return record_id in self._offsets.index
+
+	def __getitem__ (self, record_id):
+		return self.records([record_id], line_width = None)[0]
+
+	@property
+	def _fasta_signature (self):
+
+		# Assign the size and modification time, used to confirm the sidecar index
+		fasta_stat = os.stat(self.fasta_filename)
+		return f'{fasta_stat.st_size}\t{fasta_stat.st_mtime_ns}'
+
+	@property
+	def _fasta_bytes (self):
+
+		# Memory-map the FASTA file, if needed
+		if self._fasta_mmap is None:
+			self._fasta_file = open(self.fasta_filename, 'rb')
+			if os.path.getsize(self.fasta_filename) == 0: self._fasta_mmap = b''
+			else: self._fasta_mmap = mmap.mmap(self._fasta_file.fileno(), 0, access = mmap.ACCESS_READ)
+		return self._fasta_mmap
+
+	def _buildIndex (self):
+
+		# Assign the start of each record, i.e. a '>' at the start of a line
+		fasta_bytes = self._fasta_bytes
+		record_starts = [0] if fasta_bytes[:1] == b'>' else []
+		record_start = fasta_bytes.find(b'\n>')
+		while record_start != -1:
+			record_starts.append(record_start + 1)
+			record_start = fasta_bytes.find(b'\n>', record_start + 1)
+
+		# Assign the ID (the header up to the first whitespace) and offsets of each record
+		record_ids = []
+		for record_start in record_starts:
+			header_end = fasta_bytes.find(b'\n', record_start)
+			if header_end == -1: header_end = len(fasta_bytes)
+			record_header = fasta_bytes[record_start + 1:header_end].split()
+			record_ids.append(record_header[0].decode() if record_header else '')
+		record_ends = record_starts[1:] + [len(fasta_bytes)]
+
+		# Store the offsets by ID
+		self._offsets = pd.DataFrame({'start': record_starts, 'end': record_ends}, index = pd.Index(record_ids, name = 'id'), dtype = 'int64')
+
+		# Confirm the IDs are unique
+		if self._offsets.index.has_duplicates: raise Exception(f'Duplicate IDs found in {self.fasta_filename}: {", ".join(self._offsets.index[self._offsets.index.duplicated()].unique()[:10])}')
+
+		logging.info(f'Indexed {len(self._offsets)} records: {self.fasta_filename}')
+
+	def _readIndex (self):
+
+		# Check if the sidecar index exists
+		if not os.path.isfile(self.index_filename): return False
+
+		# Check if the sidecar index was created from the current FASTA file
+		with open(self.index_filename) as index_file:
+			if index_file.readline().rstrip('\n') != f'#{self._fasta_signature}': return False
+
+		# Read the offsets
+		self._offsets = pd.read_csv(self.index_filename, sep = '\t', skiprows = 1, header = None, names = ['id', 'start', 'end'], index_col = 'id', dtype = {'id': str, 'start': 'int64', 'end': 'int64'}, na_filter = False)
+		return True
+
+	def _writeIndex (self):
+
+		# Write the sidecar index, the index is kept in memory if not possible
+		try:
+			with open(self.index_filename, 'w') as index_file:
+				index_file.write(f'#{self._fasta_signature}\n')
+				self._offsets.to_csv(index_file, sep = '\t', header = False)
+		except OSError as index_error:
+			logging.warning(f'Unable to write FASTA index ({self.index_filename}): {index_error}')
+
+	@staticmethod
+	def formatRecord (record_text, line_width = 60):
+
+		# Return the record, with the sequence wrapped (as written by Biopython)
+		record_lines = record_text.splitlines()
+		record_seq = ''.join([record_line.strip() for record_line in record_lines[1:]])
+		record_seq_lines = [record_seq[seq_start:seq_start + line_width] for seq_start in range(0, len(record_seq), line_width)]
+		return '\n'.join([record_lines[0].rstrip()] + record_seq_lines) + '\n'
+
+	def records (self, record_ids, line_width = 60):
+		'''
+			Return the records of the IDs, in order
+
+			Parameters
+			----------
+			record_ids : list-like
+				IDs of the records, e.g. a pandas column
+			line_width : int, optional
+				Sequence line width. None returns the records as found
+				within the FASTA file
+
+			Returns
+			-------
+			list
+				Records as FASTA text
+		'''
+
+		# Assign the offsets of all the IDs, and report any missing IDs together
+		record_offsets = self._offsets.reindex(pd.Index(record_ids))
+		missing_ids = record_offsets.index[record_offsets['start'].isna()].unique()
+		if len(missing_ids) > 0: raise Exception(f'Unable to assign {len(missing_ids)} sequence(s) from {self.fasta_filename}: {", ".join(map(str, missing_ids[:10]))}')
+
+		# Slice the records from the FASTA file
+		fasta_bytes = self._fasta_bytes
+		record_texts = [fasta_bytes[record_start:record_end].decode() for record_start, record_end in zip(record_offsets['start'].astype('int64'), record_offsets['end'].astype('int64'))]
+		if line_width is None: return record_texts
+		return [self.formatRecord(record_text, line_width) for record_text in record_texts]
+
+	def close (self):
+
+		# Streams are held in memory, nothing to close
+		if self.index_filename is None: return
+
+		# Close the memory-map and FASTA file, if open
+		if isinstance(self._fasta_mmap, mmap.mmap): self._fasta_mmap.close()
+		if self._fasta_file is not None: self._fasta_file.close()
+		self._fasta_mmap, self._fasta_file = None, None
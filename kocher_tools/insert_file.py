@@ -3,7 +3,7 @@ import os
 import sys
 import argparse
 import json
-import shutil
+import zipfile
 import logging
 
 from Bio import SeqIO
@@ -60,6 +60,7 @@ def uploadSampleParser ():
 	upload_parser.add_argument('--schema', metavar = metavarList(schema_list), help = 'Schema (for upload)', choices = schema_list, required = True)
 	upload_parser.add_argument('--uploader', help = 'Name of the uploader', type = str, nargs = '+')
 	upload_parser.add_argument('--error-if-found', dest = 'ignore_previously_entered', help = 'Do not ignore previously entered data' , action = 'store_false')
+	upload_parser.add_argument('--update-if-found', dest = 'update_previously_entered', help = 'Update previously entered data (collection only)' , action = 'store_true')
 
 	input_method = upload_parser.add_mutually_exclusive_group(required = True)
 	input_method.add_argument('--input-zip-file', help = 'Input ZIP Archive', type = str, action = confirmFile())
@@ -70,6 +71,11 @@ def uploadSampleParser ():
 	upload_parser.add_argument('--out-log', help = 'Filename of the log file', type = str, default = 'upload_samples.log')
 	upload_parser.add_argument('--log-stdout', help = 'Direct logging to stdout', action = 'store_true')
 
+	# SQL statistics arguments
+	upload_parser.add_argument('--sql-stats', help = 'Report the SQL statement statistics', action = 'store_true')
+	upload_parser.add_argument('--slow-query-seconds', help = 'Log SQL statements slower than the given seconds', type = float, default = 1.0)
+	upload_parser.add_argument('--sql-stats-top', help = 'Number of SQL statements to report, by total duration', type = int, default = 10)
+
 	# Database arguments
 	upload_parser.add_argument('--yaml', dest = 'config_file', help = 'Database YAML config file', type = str, required = True, action = confirmFile())
 
@@ -93,6 +99,9 @@ def main():
 	else: startLogger(log_filename = upload_args.out_log)
 	logArgs(upload_args)
 
+	# Record the SQL statement statistics, if requested
+	sql_statistics = startSQLStatisticsFromConfig(config_data, upload_args.slow_query_seconds) if upload_args.sql_stats else None
+
 	# Create a list to store input file
 	input_files = []
 
@@ -105,18 +114,13 @@ def main():
 	# Check if a zip archive has been specified
 	elif upload_args.input_zip_file:
 
-		# Create a temporary directory
-		zip_input_dir = tempfile.mkdtemp()
-
-		# Extract zip archive into the temporary directory
-		with zipfile.ZipFile(upload_args.input_zip_file, 'r') as zip_ref:
-			zip_ref.extractall(zip_input_dir)
-
-		# Assign the file(s) within the temporary directory
-		for root, dirs, files in os.walk(zip_input_dir): 
-			for file in files:
-				input_files.append(os.path.join(root, file))
+		# Open the zip archive, the members are streamed without extraction
+		zip_archive = zipfile.ZipFile(upload_args.input_zip_file, 'r')
 
+		# Assign the file(s) within the archive, the file types are assigned by content
+		for zip_member in zip_archive.infolist():
+			if zip_member.is_dir(): continue
+			input_files.append(zip_archive.open(zip_member))
 
 	# Check if a collection file has been specified
 	if upload_args.schema == 'collection':
@@ -125,7 +129,7 @@ def main():
 		if len(input_files) > 1: raise Exception (f'Type (collection) only supports a single input file')
 
 		# Insert the file
-		insertCollectionFileUsingConfig(config_data, upload_args.schema, input_files[0], upload_args.uploader, upload_args.ignore_previously_entered)
+		insertCollectionFileUsingConfig(config_data, upload_args.schema, input_files[0], upload_args.uploader, upload_args.ignore_previously_entered, upload_args.update_previously_entered)
 
 	# Check if a storage file has been specified
 	elif upload_args.schema == 'storage':
@@ -145,8 +149,13 @@ def main():
 		# Insert the sequencing files
 		insertBarcodeFilesUsingConfig(config_data, upload_args.schema, input_files)
 
-	# Delete the zip contents temp dir, if created
-	if upload_args.input_zip_file: shutil.rmtree(zip_input_dir)
+	# Close the zip archive, if opened
+	if upload_args.input_zip_file:
+		for input_file in input_files: input_file.close()
+		zip_archive.close()
+
+	# Report the SQL statement statistics
+	if sql_statistics: sql_statistics.report(upload_args.sql_stats_top)
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
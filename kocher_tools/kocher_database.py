@@ -1,17 +1,21 @@
 import os
 import json
+import hashlib
+import time
 import logging
+import multiprocessing
 
 import pandas as pd
 import numpy as np
 
 from dateutil import parser
-from Bio import SeqIO
 
+from kocher_tools.config_file import ConfigDB
 from kocher_tools.database import *
-from kocher_tools.assignment import readInputFile
+from kocher_tools.assignment import readInputFile, sniffInputFile, openInputFile, inputFilename
+from kocher_tools.fasta_index import FASTAIndex
 
-def insertCollectionFileUsingConfig (config_data, schema, filepath, uploader, ignore_previously_entered):
+def prepCollectionFileUsingConfig (config_data, schema, filepath, uploader):
 
 	def check_date (data, date = False):
 		try:
@@ -21,139 +25,161 @@ def insertCollectionFileUsingConfig (config_data, schema, filepath, uploader, ig
 		except:
 			return ''
 
+	# Read in the file as a pandas dataframe and convert labels, if needed
+	input_dataframe = readInputFile(filepath)
+
+	colleciton_label_dict = {'Barcode': 'Unique ID',
+							 'Date': 'Date Collected',
+							 'Time': 'Time Entered',
+							 'Has Pollen': 'Has Pollen?',
+							 'Preservation Method': 'Sample Preservation Method',
+							 'Head in PFA?': 'Head Preserved',
+							 'From Nest': 'From Nest?',
+							 'Field_ID': 'Species Guess'}
+	input_dataframe = input_dataframe.rename(columns=colleciton_label_dict)
+
+	# Prep the dataframe
+	input_dataframe = prepDataFrameUsingConfig(config_data, schema, input_dataframe)
+	input_dataframe['collection_file'] = os.path.basename(inputFilename(filepath))
+	if uploader: input_dataframe['collected_by'] = ' '.join(uploader)
+
+	# Check for the unique ID column
+	#if 'unique_id' not in input_dataframe.columns: raise Exception(f'Unable to assign IDs, cannot locate the assignment column')
+
+	# Update the dates
+	input_dataframe['date_collected'] = input_dataframe['date_collected'].apply(check_date, date = True)
+	input_dataframe['date_collected'] = pd.to_datetime(input_dataframe['date_collected']).dt.date
+
+	# Clean up the data, with dates
+	return input_dataframe.replace({np.nan: None})
+
+def loadCollectionDataFrameUsingConfig (config_data, sql_connection, bulk_loader, schema, input_dataframe, ignore_previously_entered, update_previously_entered = False):
+
+	# Assign the table
+	sql_table_assign = config_data[schema]
+
+	# Update previously entered data, inserting or updating each sample in a single pass
+	if update_previously_entered:
+		sql_upsert = SQLInsert.fromConfig(config_data, sql_connection)
+		sql_upsert.addTableToInsert(sql_table_assign)
+		sql_upsert.addDataFrameValues(input_dataframe)
+		sql_upsert.upsert(['unique_id'])
+		return len(input_dataframe)
+
+	# Ignore - i.e. don't raise an exception - if previously entered data is found
+	if ignore_previously_entered:
+
+		# Check for previously entered data, and filter out
+		sql_column_assign = config_data.getSQLColumn(sql_table_assign.columns, 'unique_id')
+		sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+		sql_select.addColumnToSelect(sql_column_assign)
+		sql_select.addDictWhere({str(sql_table_assign):{'unique_id':input_dataframe['unique_id'].values}}, include = True, cmp_type = 'IN', dict_type = 'Table')
+		sql_select.select()
+		select_dataframe = sql_select.toDataFrame()
+		if not select_dataframe.empty: input_dataframe = input_dataframe[~input_dataframe['unique_id'].isin(select_dataframe['unique_id'].values)]
+
+		# Check if all the data was removed
+		if input_dataframe.empty: 
+			logging.warning(f'No new collection samples.')
+			return 0
+
+		# Check if any data was removed
+		if not select_dataframe.empty:
+			logging.warning(f'{select_dataframe.shape[0]} collection samples already in database.')
+
+	# Insert the dataframe into the database
+	bulk_loader.load(sql_table_assign, input_dataframe)
+	return len(input_dataframe)
+
+def insertCollectionFileUsingConfig (config_data, schema, filepath, uploader, ignore_previously_entered, update_previously_entered = False):
+
 	# Start the SQL session
 	sql_connection = startSessionFromConfig(config_data)
 
-	try:
-
-		# Read in the file as a pandas dataframe and convert labels, if needed
-		input_dataframe = readInputFile(filepath)
+	# Assign the bulk loader, using the fast-load options of the database for the transaction
+	bulk_loader = BulkLoader.fromConfig(config_data, sql_connection)
+	with bulk_loader.fastLoad():
 
-		colleciton_label_dict = {'Barcode': 'Unique ID',
-								 'Date': 'Date Collected',
-								 'Time': 'Time Entered',
-								 'Has Pollen': 'Has Pollen?',
-								 'Preservation Method': 'Sample Preservation Method',
-								 'Head in PFA?': 'Head Preserved',
-								 'From Nest': 'From Nest?',
-								 'Field_ID': 'Species Guess'}
-		input_dataframe = input_dataframe.rename(columns=colleciton_label_dict)
-
-		# Prep the dataframe
-		input_dataframe = prepDataFrameUsingConfig(config_data, schema, input_dataframe)
-		input_dataframe['collection_file'] = os.path.basename(filepath)
-		if uploader: input_dataframe['collected_by'] = ' '.join(uploader)
+		try:
 
-		# Check for the unique ID column
-		#if 'unique_id' not in input_dataframe.columns: raise Exception(f'Unable to assign IDs, cannot locate the assignment column')
+			# Prep the file, then insert
+			input_dataframe = prepCollectionFileUsingConfig(config_data, schema, filepath, uploader)
+			loadCollectionDataFrameUsingConfig(config_data, sql_connection, bulk_loader, schema, input_dataframe, ignore_previously_entered, update_previously_entered)
 
-		# Update the dates
-		input_dataframe['date_collected'] = input_dataframe['date_collected'].apply(check_date, date = True)
-		input_dataframe['date_collected'] = pd.to_datetime(input_dataframe['date_collected']).dt.date
+		except:
+			sql_connection.rollback()
+			raise
 
-		# Clean up the data, with dates
-		input_dataframe = input_dataframe.replace({np.nan: None})
+		else:
+			sql_connection.commit()
 
-		# Assign the table
-		sql_table_assign = config_data[schema]
-
-		# Ignore - i.e. don't raise an exception - if previously entered data is found
-		if ignore_previously_entered:
-
-			# Check for previously entered data, and filter out
-			sql_column_assign = config_data.getSQLColumn(sql_table_assign.columns, 'unique_id')
-			sql_select = SQLSelect.fromConfig(config_data, sql_connection)
-			sql_select.addColumnToSelect(sql_column_assign)
-			sql_select.addDictWhere({'unique_id':input_dataframe['unique_id'].values}, include = True, cmp_type = 'IN', dict_type = 'Column')
-			sql_select.select()
-			select_dataframe = sql_select.toDataFrame()
-			if not select_dataframe.empty: input_dataframe = input_dataframe[~input_dataframe['unique_id'].isin(select_dataframe['unique_id'].values)]
-
-			# Check if all the data was removed
-			if input_dataframe.empty: 
-				logging.warning(f'No new collection samples.')
-				sql_connection.close()
-				return
-
-			# Check if any data was removed
-			if not select_dataframe.empty:
-				logging.warning(f'{select_dataframe.shape[0]} collection samples already in database.')
-
-		# Insert the dataframe into the database
-		sql_table_assign = config_data[schema]
-		sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
-		sql_insert.addTableToInsert(sql_table_assign)
-		sql_insert.addDataFrameValues(input_dataframe)
-		sql_insert.insert()
+def fastaIndexFilenameUsingConfig (config_data, fasta_filepath):
 
-	except:
-		sql_connection.rollback()
-		raise
+	# Return None if the config has no index directory, or the FASTA file is a stream
+	if not config_data.fasta_index_dir or not isinstance(fasta_filepath, str): return None
 
-	else:
-		sql_connection.commit()
+	# Create the index directory, if needed
+	os.makedirs(config_data.fasta_index_dir, exist_ok = True)
 
-def insertBarcodeFilesUsingConfig (config_data, schema, filepaths):
+	# Assign the index filename, using a hash of the FASTA path to separate files with the same name
+	fasta_path_hash = hashlib.sha1(os.path.abspath(fasta_filepath).encode()).hexdigest()[:12]
+	return os.path.join(config_data.fasta_index_dir, f'{os.path.basename(fasta_filepath)}.{fasta_path_hash}.offsets')
 
-	def append_seq (query_id, seq_index):
-		return seq_index[query_id].format('fasta')
+def prepBarcodeFilesUsingConfig (config_data, schema, filepaths):
 
 	def join_list (value_list):
 		try: return ', '.join([value_str for value_str in value_list if value_str != 'BOLD:N/A'])
 		except: return ''
 
-	# Start the SQL session
-	sql_connection = startSessionFromConfig(config_data)
+	# Assign the expected filetypes
+	blast_filepath = None
+	fasta_filepath = None
+	failed_filepath = None
 
-	try:
-		# Assign the expected filetypes
-		blast_filepath = None
-		fasta_filepath = None
-		failed_filepath = None
-
-		# Loop the filepaths
-		for filepath in filepaths:
-
-			# Assign the blast file
-			if filepath.endswith('.out'):
-				if blast_filepath: raise Exception(f'BLAST file already assigned ({blast_filepath}), cannot assign: {filepath}')
-				blast_filepath = filepath
-
-			# Assign the fasta file
-			if filepath.endswith('.fasta') or filepath.endswith('.fa') or filepath.endswith('.fas'):
-				if fasta_filepath: raise Exception(f'FASTA file already assigned ({fasta_filepath}), cannot assign: {filepath}')
-				fasta_filepath = filepath
-
-			# Assign the failed file
-			if filepath.endswith('.json'):
-				if failed_filepath: raise Exception(f'Failed file already assigned ({failed_filepath}), cannot assign: {filepath}')
-				failed_filepath = filepath
-
-		# Confirm the insert is possible
-		if not blast_filepath or not fasta_filepath: raise Exception(f'Both a BLAST and FASTA file are required to operate')
-
-		# Assign the table
-		sql_table_assign = config_data[schema]
-
-		# Assign the sequencing columns
-		sequence_std_cols = ['sequence_id', 'seq_len', 'seq_percent_ident', 
-							 'seq_align_len', 'sequence', 'reads', 'sample_id', 
-							 'bold_id', 'species', 'sequence_status']
-		
-		# Assign the sequencing header data				 
-		sequence_label_dict = {'Query ID': 'sequence_id', 
-							   'Percent Identity': 'seq_percent_ident', 
-							   'Alignment Length': 'seq_align_len',
-							   'Query Length': 'seq_len'}
-
-		# Index the sequence file
-		sequence_index = SeqIO.index(fasta_filepath, 'fasta')
+	# Loop the filepaths (or streams), assigning each by content
+	for filepath in filepaths:
+		file_type = sniffInputFile(filepath)
+
+		# Assign the blast file
+		if file_type == 'table':
+			if blast_filepath: raise Exception(f'BLAST file already assigned ({inputFilename(blast_filepath)}), cannot assign: {inputFilename(filepath)}')
+			blast_filepath = filepath
+
+		# Assign the fasta file
+		elif file_type == 'fasta':
+			if fasta_filepath: raise Exception(f'FASTA file already assigned ({inputFilename(fasta_filepath)}), cannot assign: {inputFilename(filepath)}')
+			fasta_filepath = filepath
+
+		# Assign the failed file
+		elif file_type == 'json':
+			if failed_filepath: raise Exception(f'Failed file already assigned ({inputFilename(failed_filepath)}), cannot assign: {inputFilename(filepath)}')
+			failed_filepath = filepath
+
+		else: raise Exception(f'Unable to assign sequencing file: {inputFilename(filepath)}')
+
+	# Confirm the insert is possible
+	if not blast_filepath or not fasta_filepath: raise Exception(f'Both a BLAST and FASTA file are required to operate')
+
+	# Assign the sequencing columns
+	sequence_std_cols = ['sequence_id', 'seq_len', 'seq_percent_ident', 
+						 'seq_align_len', 'sequence', 'reads', 'sample_id', 
+						 'bold_id', 'species', 'sequence_status']
+
+	# Assign the sequencing header data				 
+	sequence_label_dict = {'Query ID': 'sequence_id', 
+						   'Percent Identity': 'seq_percent_ident', 
+						   'Alignment Length': 'seq_align_len',
+						   'Query Length': 'seq_len'}
+
+	# Index the sequence file. The offset index is only cached within the index directory of the config, to leave the input directory unchanged
+	index_filename = fastaIndexFilenameUsingConfig(config_data, fasta_filepath)
+	with FASTAIndex(fasta_filepath, index_filename = index_filename, cache_index = index_filename != None) as sequence_index:
 
 		# Read in the file as a pandas dataframe, prep for database
-		input_dataframe = pd.read_csv(blast_filepath, dtype = str, sep = '\t')
+		input_dataframe = readInputFile(blast_filepath)
 
 		# Clean up the BLAST dataframe
-		input_dataframe['sequence'] = input_dataframe['Query ID'].apply(append_seq, seq_index = sequence_index)
+		input_dataframe['sequence'] = sequence_index.records(input_dataframe['Query ID'])
 		input_dataframe[['Query ID', 'reads']] = input_dataframe['Query ID'].str.split(';size=', expand = True) 
 		input_dataframe['sample_id'] = input_dataframe['Query ID'].str.split('_', expand = True)[0]
 		input_dataframe[['bold_id', 'species']] = input_dataframe['Subject ID'].str.split('|', expand = True)[[0, 1]]
@@ -167,48 +193,155 @@ def insertBarcodeFilesUsingConfig (config_data, schema, filepaths):
 		sequence_non_std_cols = list(set(input_dataframe.columns) - set(sequence_std_cols))
 		input_dataframe = input_dataframe.drop(columns =  sequence_non_std_cols)
 
-		sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
-		sql_insert.addTableToInsert(sql_table_assign)
-		sql_insert.addDataFrameValues(input_dataframe)
-		sql_insert.insert()
-
-		# Open the failed file
-		with open(failed_filepath) as failed_file:
-
-			# Assign the sequencing header data				 
-			failed_label_dict = {'Query ID': 'sequence_id', 
-								 'Status': 'sequence_status',
-								 'Species': 'ambiguous_hits',
-								 'Bins': 'bold_bins'}
-
-			# Load the JSON into a dataframe
-			failed_data = json.load(failed_file)
-			failed_dataframe = pd.DataFrame(failed_data)
-			
-			# Join the lists, if found
-			failed_dataframe['Species'] = failed_dataframe['Species'].apply(join_list)
-			failed_dataframe['Bins'] = failed_dataframe['Bins'].apply(join_list)
-
-			# Clean up the dataframe
-			failed_dataframe['sequence'] = failed_dataframe['Query ID'].apply(append_seq, seq_index = sequence_index)
-			failed_dataframe[['Query ID', 'reads']] = failed_dataframe['Query ID'].str.split(';size=', expand = True)
-			failed_dataframe['sample_id'] = failed_dataframe['Query ID'].str.split('_', expand = True)[0] 
-			failed_dataframe = failed_dataframe.rename(columns = failed_label_dict)
-			failed_dataframe = failed_dataframe.replace({np.nan: None})
-			
-			sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
-			sql_insert.addTableToInsert(sql_table_assign)
-			sql_insert.addDataFrameValues(failed_dataframe)
-			sql_insert.insert()
-
-		sequence_index.close()
+		# Store the dataframe for the database
+		barcode_dataframes = [input_dataframe]
+
+		# Open the failed file, if assigned
+		if failed_filepath:
+			with openInputFile(failed_filepath) as failed_file:
+
+				# Assign the sequencing header data				 
+				failed_label_dict = {'Query ID': 'sequence_id', 
+									 'Status': 'sequence_status',
+									 'Species': 'ambiguous_hits',
+									 'Bins': 'bold_bins'}
+
+				# Load the JSON into a dataframe
+				failed_data = json.load(failed_file)
+				failed_dataframe = pd.DataFrame(failed_data)
+	
+				# Join the lists, if found
+				failed_dataframe['Species'] = failed_dataframe['Species'].apply(join_list)
+				failed_dataframe['Bins'] = failed_dataframe['Bins'].apply(join_list)
+
+				# Clean up the dataframe
+				failed_dataframe['sequence'] = sequence_index.records(failed_dataframe['Query ID'])
+				failed_dataframe[['Query ID', 'reads']] = failed_dataframe['Query ID'].str.split(';size=', expand = True)
+				failed_dataframe['sample_id'] = failed_dataframe['Query ID'].str.split('_', expand = True)[0] 
+				failed_dataframe = failed_dataframe.rename(columns = failed_label_dict)
+				failed_dataframe = failed_dataframe.replace({np.nan: None})
+	
+				# Store the failed dataframe for the database
+				barcode_dataframes.append(failed_dataframe)
+
+	return barcode_dataframes
+
+def loadBarcodeDataFramesUsingConfig (config_data, bulk_loader, schema, barcode_dataframes):
+
+	# Insert the dataframes into the database
+	for barcode_dataframe in barcode_dataframes: bulk_loader.load(config_data[schema], barcode_dataframe)
+	return sum([len(barcode_dataframe) for barcode_dataframe in barcode_dataframes])
 
-	except:
-		sql_connection.rollback()
-		raise
+def insertBarcodeFilesUsingConfig (config_data, schema, filepaths):
 
-	else:
-		sql_connection.commit()
+	# Start the SQL session
+	sql_connection = startSessionFromConfig(config_data)
+
+	# Assign the bulk loader, using the fast-load options of the database for the transaction
+	bulk_loader = BulkLoader.fromConfig(config_data, sql_connection)
+	with bulk_loader.fastLoad():
+
+		try:
+
+			# Prep the files, then insert
+			barcode_dataframes = prepBarcodeFilesUsingConfig(config_data, schema, filepaths)
+			loadBarcodeDataFramesUsingConfig(config_data, bulk_loader, schema, barcode_dataframes)
+
+		except:
+			sql_connection.rollback()
+			raise
+
+		else:
+			sql_connection.commit()
+
+def prepStorageFileUsingConfig (config_data, filepath, schema = 'storage', plates_schema = 'plates', boxes_schema = 'boxes'):
+
+	# Read in the file as a pandas dataframe, prep for database
+	input_dataframe = readInputFile(filepath)
+
+	# Create the storage dataframe and prepare
+	storage_dataframe = input_dataframe.copy()
+	storage_dataframe = prepDataFrameUsingConfig(config_data, schema, storage_dataframe)
+	storage_dataframe = storage_dataframe.replace({np.nan: None})
+
+	# Create the plates dataframe
+	plate_dataframe = storage_dataframe[['plate']].copy()
+	plate_dataframe = plate_dataframe.drop_duplicates()
+
+	# Store the dataframes for the database, in insert order
+	storage_dataframes = {'plates': plate_dataframe, 'boxes': None, 'plate_updates': None, 'box_updates': None, schema: storage_dataframe}
+
+	# Confirm the input has a Box column
+	if 'Box' in input_dataframe.columns:
+
+		# Create the boxes dataframe
+		box_dataframe = input_dataframe[['Box']].copy()
+		box_dataframe = prepDataFrameUsingConfig(config_data, boxes_schema, box_dataframe)
+		box_dataframe = box_dataframe.drop_duplicates()
+		box_dataframe = box_dataframe.replace({np.nan: None})
+		storage_dataframes['boxes'] = box_dataframe
+	
+		# Create a dataframe with just the plates and boxes
+		plate_update_dataframe = input_dataframe[['Plate', 'Box']].copy()
+		plate_update_dataframe = plate_update_dataframe.rename(columns = {'Plate':'plate', 'Box':'box'})
+		plate_update_dataframe = plate_update_dataframe.drop_duplicates()
+		plate_update_dataframe = plate_update_dataframe.replace({'': None})
+		plate_update_dataframe = plate_update_dataframe.dropna(axis = 'index')
+
+		# Check for possible assignment errors
+		if plate_update_dataframe['plate'].duplicated().any(): raise Exception('Plate found in more than one box')
+		storage_dataframes['plate_updates'] = plate_update_dataframe
+
+		# Create a boxes dataframe, for updating if possible
+		box_update_dataframe = input_dataframe.copy()
+		box_update_dataframe = prepDataFrameUsingConfig(config_data, boxes_schema, box_update_dataframe)
+		box_update_dataframe = box_dataframe.drop_duplicates()
+		box_update_dataframe = box_update_dataframe.replace({'': None})
+		box_update_dataframe = box_update_dataframe.dropna(axis = 'index')
+
+		# Check for possible assignment errors
+		if box_update_dataframe['box'].duplicated().any(): raise Exception('Box found in multiple locations')
+		storage_dataframes['box_updates'] = box_update_dataframe
+
+	return storage_dataframes
+
+def loadStorageDataFramesUsingConfig (config_data, sql_connection, storage_dataframes, schema = 'storage', plates_schema = 'plates', boxes_schema = 'boxes'):
+
+	# Insert the plates, if not already inserted
+	plate_insert = SQLInsert.fromConfig(config_data, sql_connection)
+	plate_insert.addTableToInsert(config_data[plates_schema])
+	plate_insert.addDataFrameValues(storage_dataframes['plates'])
+	plate_insert.addIgnore('plate')
+	plate_insert.bulkInsertIgnore()
+
+	# Insert the boxes, if not already inserted
+	if storage_dataframes['boxes'] is not None:
+		box_insert = SQLInsert.fromConfig(config_data, sql_connection)
+		box_insert.addTableToInsert(config_data[boxes_schema])
+		box_insert.addDataFrameValues(storage_dataframes['boxes'])
+		box_insert.addIgnore('box')
+		box_insert.bulkInsertIgnore()
+
+	# Update the plates using a single statement
+	if storage_dataframes['plate_updates'] is not None:
+		plate_update = SQLUpdate.fromConfig(config_data, sql_connection)
+		plate_update.addTableToUpdate(config_data[plates_schema])
+		plate_update.addDataFrameValues(storage_dataframes['plate_updates'], 'plate')
+		plate_update.bulkUpdate()
+
+	# Update the boxes using a single statement
+	if storage_dataframes['box_updates'] is not None:
+		box_update = SQLUpdate.fromConfig(config_data, sql_connection)
+		box_update.addTableToUpdate(config_data[boxes_schema])
+		box_update.addDataFrameValues(storage_dataframes['box_updates'], 'box')
+		box_update.bulkUpdate()
+
+	# Insert the storage
+	storage_insert = SQLInsert.fromConfig(config_data, sql_connection)
+	storage_insert.addTableToInsert(config_data[schema])
+	storage_insert.addDataFrameValues(storage_dataframes[schema])
+	storage_insert.bulkInsert()
+	return len(storage_dataframes[schema])
 
 def insertStorageFileUsingConfig (config_data, filepath, schema = 'storage', plates_schema = 'plates', boxes_schema = 'boxes'):
 
@@ -216,97 +349,144 @@ def insertStorageFileUsingConfig (config_data, filepath, schema = 'storage', pla
 	sql_connection = startSessionFromConfig(config_data)
 
 	try:
-		# Read in the file as a pandas dataframe, prep for database
-		input_dataframe = pd.read_csv(filepath, dtype = str, sep = '\t')
-
-		# Create the storage dataframe and prepare
-		storage_dataframe = input_dataframe.copy()
-		storage_dataframe = prepDataFrameUsingConfig(config_data, schema, storage_dataframe)
-		storage_dataframe = storage_dataframe.replace({np.nan: None})
-
-		# Insert the plates, if not already inserted
-		plate_dataframe = storage_dataframe[['plate']].copy()
-		plate_dataframe = plate_dataframe.drop_duplicates()
-		plate_insert = SQLInsert.fromConfig(config_data, sql_connection)
-		plate_insert.addTableToInsert(config_data['plates'])
-		plate_insert.addDataFrameValues(plate_dataframe)
-		plate_insert.addIgnore('plate')
-		plate_insert.insertIgnore()
-
-		# Confirm the input has a Box column
-		if 'Box' in input_dataframe.columns:
-
-			# Insert the boxes, if not already inserted
-			box_dataframe = input_dataframe[['Box']].copy()
-			box_dataframe = prepDataFrameUsingConfig(config_data, 'boxes', box_dataframe)
-			box_dataframe = box_dataframe.drop_duplicates()
-			box_dataframe = box_dataframe.replace({np.nan: None})
-			box_insert = SQLInsert.fromConfig(config_data, sql_connection)
-			box_insert.addTableToInsert(config_data['boxes'])
-			box_insert.addDataFrameValues(box_dataframe)
-			box_insert.addIgnore('box')
-			box_insert.insertIgnore()
-		
-			# Create a dataframe with just the plates and boxes
-			plate_update_dataframe = input_dataframe[['Plate', 'Box']].copy()
-			plate_update_dataframe = plate_update_dataframe.rename(columns = {'Plate':'plate', 'Box':'box'})
-			plate_update_dataframe = plate_update_dataframe.drop_duplicates()
-			plate_update_dataframe = plate_update_dataframe.replace({'': None})
-			plate_update_dataframe = plate_update_dataframe.dropna(axis = 'index')
-
-			# Check for possible assignment errors
-			if plate_update_dataframe['plate'].duplicated().any(): raise Exception('Plate found in more than one box')
-
-			# Convert the dataframe into a list of dicts
-			for update_dict in plate_update_dataframe.to_dict('records'):
-
-				# Create the where and value dicts
-				where_dict = {'plate': update_dict['plate']}
-				value_dict = {key:value for key, value in update_dict.items() if key != 'plate'}
-
-				# Confirm there are values to add
-				if not value_dict: continue 
-
-				plate_update = SQLUpdate.fromConfig(config_data, sql_connection)
-				plate_update.addTableToUpdate(config_data['plates'])
-				plate_update.addDictValues(value_dict)
-				plate_update.addDictWhere(where_dict, dict_type = 'Column', include = True, cmp_type = 'EQ')
-				plate_update.update()
-
-			# Insert a boxes dataframe, for updating if possible
-			box_update_dataframe = input_dataframe.copy()
-			box_update_dataframe = prepDataFrameUsingConfig(config_data, 'boxes', box_update_dataframe)
-			box_update_dataframe = box_dataframe.drop_duplicates()
-			box_update_dataframe = box_update_dataframe.replace({'': None})
-			box_update_dataframe = box_update_dataframe.dropna(axis = 'index')
-
-			# Check for possible assignment errors
-			if box_update_dataframe['box'].duplicated().any(): raise Exception('Box found in multiple locations')
-
-			# Convert the dataframe into a list of dicts
-			for update_dict in box_update_dataframe.to_dict('records'):
-
-				# Create the where and value dicts
-				where_dict = {'box': update_dict['box']}
-				value_dict = {key:value for key, value in update_dict.items() if key != 'box'}
-
-				# Confirm there are values to add
-				if not value_dict: continue 
-
-				box_update = SQLUpdate.fromConfig(config_data, sql_connection)
-				box_update.addTableToUpdate(config_data['boxes'])
-				box_update.addDictValues(value_dict)
-				box_update.addDictWhere(where_dict, dict_type = 'Column', include = True, cmp_type = 'EQ')
-				box_update.update()
-
-		storage_insert = SQLInsert.fromConfig(config_data, sql_connection)
-		storage_insert.addTableToInsert(config_data[schema])
-		storage_insert.addDataFrameValues(storage_dataframe)
-		storage_insert.insert()
+
+		# Prep the file, then insert
+		storage_dataframes = prepStorageFileUsingConfig(config_data, filepath, schema, plates_schema, boxes_schema)
+		loadStorageDataFramesUsingConfig(config_data, sql_connection, storage_dataframes, schema, plates_schema, boxes_schema)
 
 	except:
 		sql_connection.rollback()
 		raise
 
 	else:
-		sql_connection.commit()
\ No newline at end of file
+		sql_connection.commit()
+
+# Schemas in dependency order, plates and boxes are inserted within storage
+upload_schema_order = ['collection', 'storage', 'sequencing']
+
+def prepUploadFilesUsingConfig (config_data, schema, filepaths, uploader = None):
+
+	# Read the config, if given as a filename (i.e. within a process pool)
+	if isinstance(config_data, str): config_data = ConfigDB.readConfig(config_data)
+
+	# Parse and validate the file(s), returning any error to be reported
+	prep_start = time.perf_counter()
+	try:
+		if schema == 'collection': upload_data = prepCollectionFileUsingConfig(config_data, schema, filepaths[0], uploader)
+		elif schema == 'storage': upload_data = prepStorageFileUsingConfig(config_data, filepaths[0], schema)
+		elif schema == 'sequencing': upload_data = prepBarcodeFilesUsingConfig(config_data, schema, filepaths)
+		else: raise Exception(f'Unknown schema: {schema}')
+	except Exception as prep_error:
+		return {'status': 'failed', 'error': str(prep_error), 'data': None, 'prep_seconds': time.perf_counter() - prep_start}
+
+	return {'status': 'prepped', 'error': '', 'data': upload_data, 'prep_seconds': time.perf_counter() - prep_start}
+
+def insertFilesUsingConfig (config_data, upload_jobs, uploader = None, ignore_previously_entered = True, update_previously_entered = False, processes = 1):
+	'''
+		Insert multiple upload files into the database
+
+		The files are parsed and validated within a process pool, then
+		inserted using a single connection in dependency order (see
+		upload_schema_order). Each schema is committed as a single
+		transaction.
+
+		Parameters
+		----------
+		config_data : ConfigDB
+			Database config
+		upload_jobs : list
+			List of (schema, list of filepaths). Collection and storage
+			jobs require a single file, sequencing jobs require two or
+			three files
+		uploader : list, optional
+			Name of the uploader, for collection files
+		ignore_previously_entered : bool, optional
+			Defines if previously entered collection samples are ignored
+		update_previously_entered : bool, optional
+			Defines if previously entered collection samples are updated
+		processes : int, optional
+			Number of processes used to parse the files
+
+		Returns
+		-------
+		list
+			Report of each job, as dicts
+	'''
+
+	# Confirm the jobs
+	for schema, filepaths in upload_jobs:
+		if schema not in upload_schema_order: raise Exception(f'Unknown schema: {schema}')
+		if schema in ['collection', 'storage'] and len(filepaths) != 1: raise Exception(f'Type ({schema}) only supports a single input file: {filepaths}')
+		if schema == 'sequencing' and len(filepaths) not in [2, 3]: raise Exception(f'Type (sequencing) requires between two and three input files: {filepaths}')
+
+	# Sort the jobs into dependency order, keeping the order of the files within a schema
+	upload_jobs = sorted(upload_jobs, key = lambda upload_job: upload_schema_order.index(upload_job[0]))
+
+	# Parse and validate the files, using the config filename within the pool
+	logging.info(f'Preparing {len(upload_jobs)} upload(s) using {processes} processes')
+	if processes > 1 and len(upload_jobs) > 1:
+		with multiprocessing.Pool(min(processes, len(upload_jobs))) as prep_pool:
+			prep_results = prep_pool.starmap(prepUploadFilesUsingConfig, [(config_data.yaml, schema, filepaths, uploader) for schema, filepaths in upload_jobs])
+	else: prep_results = [prepUploadFilesUsingConfig(config_data, schema, filepaths, uploader) for schema, filepaths in upload_jobs]
+
+	# Create the report
+	upload_report = []
+	for (schema, filepaths), prep_result in zip(upload_jobs, prep_results):
+		upload_report.append({'schema': schema, 'files': ', '.join([os.path.basename(inputFilename(filepath)) for filepath in filepaths]), 'status': prep_result['status'], 'rows': 0,
+							  'prep_seconds': round(prep_result['prep_seconds'], 3), 'load_seconds': 0.0, 'error': prep_result['error']})
+
+	# Confirm all the files were prepped before inserting
+	failed_reports = [job_report for job_report in upload_report if job_report['status'] == 'failed']
+	if failed_reports:
+		logUploadReport(upload_report)
+		raise Exception(f'Unable to prep {len(failed_reports)} upload(s): ' + '; '.join([f'{job_report["files"]} ({job_report["error"]})' for job_report in failed_reports]))
+
+	# Start the SQL session, used by a single writer
+	sql_connection = startSessionFromConfig(config_data)
+
+	# Assign the bulk loader, using the fast-load options of the database for each transaction
+	bulk_loader = BulkLoader.fromConfig(config_data, sql_connection)
+
+	# Insert the schemas in order, each within a single transaction
+	for schema in upload_schema_order:
+		schema_jobs = [(job_report, prep_result) for job_report, prep_result in zip(upload_report, prep_results) if job_report['schema'] == schema]
+		if not schema_jobs: continue
+
+		# Load the schema within the fast-load context of its transaction
+		with bulk_loader.fastLoad():
+			try:
+				for job_report, prep_result in schema_jobs:
+					load_start = time.perf_counter()
+					if schema == 'collection': job_report['rows'] = loadCollectionDataFrameUsingConfig(config_data, sql_connection, bulk_loader, schema, prep_result['data'], ignore_previously_entered, update_previously_entered)
+					elif schema == 'storage': job_report['rows'] = loadStorageDataFramesUsingConfig(config_data, sql_connection, prep_result['data'], schema)
+					elif schema == 'sequencing': job_report['rows'] = loadBarcodeDataFramesUsingConfig(config_data, bulk_loader, schema, prep_result['data'])
+					job_report['load_seconds'] = round(time.perf_counter() - load_start, 3)
+					job_report['status'] = 'loaded'
+
+			except Exception as load_error:
+				sql_connection.rollback()
+
+				# Update the report, the failed job is the first job of the schema not loaded
+				failed_report = next(job_report for job_report, _ in schema_jobs if job_report['status'] == 'prepped')
+				failed_report['status'], failed_report['error'] = 'failed', str(load_error)
+				for job_report in upload_report:
+					if job_report['status'] == 'loaded': job_report['status'] = 'rolled back'
+					elif job_report['status'] == 'prepped': job_report['status'] = 'skipped'
+				logUploadReport(upload_report)
+				raise
+
+			else:
+				sql_connection.commit()
+				for job_report, _ in schema_jobs: job_report['status'] = 'committed'
+				logging.info(f'Committed {len(schema_jobs)} {schema} upload(s)')
+
+	logUploadReport(upload_report)
+	return upload_report
+
+def logUploadReport (upload_report):
+
+	# Log the status of each job
+	for job_report in upload_report:
+		report_str = f'{job_report["schema"]} ({job_report["files"]}): {job_report["status"]}, {job_report["rows"]} rows, {job_report["prep_seconds"]}s prep, {job_report["load_seconds"]}s load'
+		if job_report['error']: logging.error(f'{report_str}. {job_report["error"]}')
+		else: logging.info(report_str)
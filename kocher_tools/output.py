@@ -5,6 +5,19 @@ import logging
 
 from collections import OrderedDict 
 
+from sqlalchemy import Boolean, Integer, Numeric, Date, DateTime, LargeBinary
+
+# Optional, used to write columnar (Parquet/Feather) files
+try:
+	import pyarrow
+	import pyarrow.ipc
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+# Columnar output formats, Feather (V2) files are Arrow IPC files
+columnar_formats = ['parquet', 'feather']
+
 def unquoteFields (db_entries):
 
 	# Create list to hold unquoted data
@@ -72,3 +85,41 @@ def entriesToFile (db_entries, out_filename, sep):
 
 	# Update log
 	logging.info('Retrieved results written to file (%s)' % out_filename)
+
+def checkArrow (out_format):
+
+	# Confirm the format, and that pyarrow is installed
+	if out_format not in columnar_formats: raise Exception(f'Unknown columnar format: {out_format}')
+	if pyarrow is None: raise Exception(f'Unable to write {out_format} files, pyarrow not installed. Please install pyarrow (e.g. pip install kocher_tools[arrow])')
+
+def arrowType (sql_type):
+
+	# Return the Arrow type of the SQL type. Numeric is stored as float64, as the precision is not defined
+	if isinstance(sql_type, Boolean): return pyarrow.bool_()
+	elif isinstance(sql_type, Integer): return pyarrow.int64()
+	elif isinstance(sql_type, Numeric): return pyarrow.float64()
+	elif isinstance(sql_type, DateTime): return pyarrow.timestamp('us', tz = 'UTC') if sql_type.timezone else pyarrow.timestamp('us')
+	elif isinstance(sql_type, Date): return pyarrow.date32()
+	elif isinstance(sql_type, LargeBinary): return pyarrow.binary()
+	else: return pyarrow.string()
+
+def arrowSchema (column_names, sql_types):
+
+	# Return the schema of the columns, typed using the SQL types
+	return pyarrow.schema([(str(column).replace('"',''), arrowType(sql_type)) for column, sql_type in zip(column_names, sql_types)])
+
+def arrowRecordBatch (db_entries, arrow_schema):
+
+	# Convert the rows to columns, Numeric values (i.e. Decimal) are converted to floats
+	arrow_arrays = []
+	for arrow_field, column_values in zip(arrow_schema, zip(*db_entries)):
+		if pyarrow.types.is_floating(arrow_field.type): column_values = [float(value) if value is not None else None for value in column_values]
+		arrow_arrays.append(pyarrow.array(column_values, type = arrow_field.type))
+	return pyarrow.RecordBatch.from_arrays(arrow_arrays, schema = arrow_schema)
+
+def columnarWriter (out_filename, out_format, arrow_schema):
+
+	# Return the writer of the format, both write record batches
+	checkArrow(out_format)
+	if out_format == 'parquet': return pyarrow.parquet.ParquetWriter(out_filename, arrow_schema)
+	else: return pyarrow.ipc.new_file(out_filename, arrow_schema, options = pyarrow.ipc.IpcWriteOptions(compression = 'lz4'))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import logging
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from kocher_tools.logger import *
+
+def rebuildParser ():
+	'''
+	Argument parser for rebuilding summary tables
+
+	Raises
+	------
+	IOError
+		If the specified files do not exist
+	'''
+
+	def confirmFile ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	rebuild_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+
+	# Summary arguments
+	rebuild_parser.add_argument('--summaries', help = 'Summaries to rebuild. Rebuilds all summaries if not given', type = str, nargs = '+')
+
+	# Output arguments
+	rebuild_parser.add_argument('--out-log', help = 'Filename of the log file', type = str, default = 'rebuild_summaries.log')
+	rebuild_parser.add_argument('--log-stdout', help = 'Direct logging to stdout', action = 'store_true')
+
+	# Database arguments
+	rebuild_parser.add_argument('--yaml', dest = 'config_file', help = 'Database YAML config file', type = str, required = True, action = confirmFile())
+
+	return rebuild_parser.parse_args()
+
+def main():
+
+	# Assign arguments
+	rebuild_args = rebuildParser()
+
+	# Start a log for this run
+	if rebuild_args.log_stdout: startLogger()
+	else: startLogger(log_filename = rebuild_args.out_log)
+	logArgs(rebuild_args)
+
+	# Open the config and rebuild the summaries, replacing the triggers
+	config_data = ConfigDB.readConfig(rebuild_args.config_file)
+	summary_rows = rebuildSummariesFromConfig(config_data, rebuild_args.summaries)
+
+	# Report the rows of each summary
+	for summary, rows in summary_rows.items(): print(f'Rebuilt {summary}: {rows} rows')
+
+if __name__== "__main__":
+	main()
@@ -0,0 +1,115 @@
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+
+class SyntheticDatabase ():
+	def __init__ (self, rows = 10000, seq_len = 150, prefix = 'SYN', seed = None, **kwargs):
+
+		# Assign the simulation arguments, each sample is stored in a well of a 96-well plate
+		self.rows = rows
+		self.seq_len = seq_len
+		self.prefix = prefix
+		self.seed = seed
+		self._wells = [f'{row}{col}' for row in 'ABCDEFGH' for col in range(1, 13)]
+		self._plates_per_box = 10
+		self._bases = np.frombuffer(b'ACGT', dtype = np.uint8)
+
+		# Assign the values sampled for each column
+		self.site_codes = ['RIM', 'WIM', 'BLK', 'PNT', 'MRS', 'FLD']
+		self.species = ['Lasioglossum oenotherae', 'Lasioglossum zephyrus', 'Ceratina mikmaqi', 'Ceratina strenua',
+						'Augochlorella aurata', 'Halictus ligatus', 'Bombus impatiens', 'Andrena carlini']
+
+		# Check the arguments
+		if self.rows < 1: raise Exception(f'Unable to simulate {self.rows} rows')
+		if self.seq_len < 1: raise Exception(f'Unable to simulate sequences of length {self.seq_len}')
+
+		# Create the random number generator
+		self._rng = np.random.default_rng(self.seed)
+
+	@property
+	def unique_ids (self):
+		return pd.Series([f'{self.prefix}-{sample_pos:07d}' for sample_pos in range(self.rows)], dtype = object)
+
+	@property
+	def plate_count (self):
+		return -(-self.rows // len(self._wells))
+
+	@property
+	def plates (self):
+		return pd.Series([f'{self.prefix}-P{plate_pos:05d}' for plate_pos in range(self.plate_count)], dtype = object)
+
+	@property
+	def boxes (self):
+		return pd.Series([f'{self.prefix}-B{box_pos:04d}' for box_pos in range(-(-self.plate_count // self._plates_per_box))], dtype = object)
+
+	@property
+	def sample_ids (self):
+
+		# Assign the storage ID of each sample, using the plate and well
+		return pd.Series([f'{self.prefix}-P{sample_pos // len(self._wells):05d}-{self._wells[sample_pos % len(self._wells)]}' for sample_pos in range(self.rows)], dtype = object)
+
+	def collectionDataFrame (self):
+
+		# Assign the collection dates, within a single season
+		season_start = datetime.date(2019, 5, 1)
+		collection_days = self._rng.integers(0, 150, size = self.rows)
+
+		collection_dataframe = pd.DataFrame({'unique_id': self.unique_ids,
+											 'site_code': self._rng.choice(self.site_codes, size = self.rows),
+											 'collected_by': 'Synthetic',
+											 'date_collected': [season_start + datetime.timedelta(days = int(collection_day)) for collection_day in collection_days],
+											 'time_entered': '12:00:00 PM',
+											 'sex': self._rng.choice(['Female', 'Male'], size = self.rows),
+											 'life_stage': 'Adult',
+											 'has_pollen': self._rng.choice(['Yes', 'No'], size = self.rows),
+											 'species_guess': self._rng.choice(self.species, size = self.rows),
+											 'collection_file': f'{self.prefix}_collection.tsv'})
+
+		logging.info(f'Simulated {len(collection_dataframe)} collection rows')
+		return collection_dataframe
+
+	def boxesDataFrame (self):
+
+		# Assign the boxes, stored within a single freezer
+		return pd.DataFrame({'box': self.boxes, 'rack': 'R1', 'freezer': 'F1'})
+
+	def platesDataFrame (self):
+
+		# Assign the plates, filling each box in order
+		plate_boxes = self.boxes.values[np.arange(self.plate_count) // self._plates_per_box]
+		return pd.DataFrame({'plate': self.plates, 'box': plate_boxes})
+
+	def storageDataFrame (self):
+
+		# Assign a well to each sample, filling each plate in order
+		sample_positions = np.arange(self.rows)
+		storage_dataframe = pd.DataFrame({'sample_id': self.sample_ids,
+										  'unique_id': self.unique_ids,
+										  'plate': self.plates.values[sample_positions // len(self._wells)],
+										  'well': np.array(self._wells, dtype = object)[sample_positions % len(self._wells)],
+										  'storage_file': f'{self.prefix}_storage.tsv'})
+
+		logging.info(f'Simulated {len(storage_dataframe)} storage rows')
+		return storage_dataframe
+
+	def sequencingDataFrame (self):
+
+		# Assign the sequences as FASTA records
+		sample_ids = self.sample_ids
+		seq_bytes = self._bases[self._rng.integers(0, 4, size = (self.rows, self.seq_len), dtype = np.uint8)]
+		sequences = [f'>{sample_id}_1\n{seq_bytes[sample_pos].tobytes().decode()}\n' for sample_pos, sample_id in enumerate(sample_ids)]
+
+		sequencing_dataframe = pd.DataFrame({'sequence_id': sample_ids + '_1',
+											 'sample_id': sample_ids,
+											 'sequence_status': 'Species Identified',
+											 'species': self._rng.choice(self.species, size = self.rows),
+											 'reads': self._rng.integers(10, 1000, size = self.rows).astype(str),
+											 'seq_percent_ident': '100.000',
+											 'seq_align_len': str(self.seq_len),
+											 'seq_len': str(self.seq_len),
+											 'sequence': sequences})
+
+		logging.info(f'Simulated {len(sequencing_dataframe)} sequencing rows')
+		return sequencing_dataframe
@@ -0,0 +1,217 @@
+import os
+import gzip
+import logging
+
+import numpy as np
+import pandas as pd
+
+class SyntheticFASTQs ():
+	def __init__ (self, samples = [], read_count = 100000, well_skew = 0.0, index_error_rate = 0.0, quality_profile = 'declining',
+					    read_len = 150, chunk_size = 100000, seed = None, **kwargs):
+
+		# Assign the samples, stored as (name, i7 barcode, i5 barcode)
+		self.samples = samples
+
+		# Assign the simulation arguments
+		self.read_count = read_count
+		self.well_skew = well_skew
+		self.index_error_rate = index_error_rate
+		self.quality_profile = quality_profile
+		self.read_len = read_len
+		self.seed = seed
+		self._chunk_size = chunk_size
+		self._bases = np.frombuffer(b'ACGT', dtype = np.uint8)
+		self._base_to_pos = {base:pos for pos, base in enumerate('ACGT')}
+
+		# Check the arguments
+		if not self.samples: raise Exception('No samples assigned for simulation')
+		if self.read_count < 1: raise Exception(f'Unable to simulate {self.read_count} reads')
+		if self.well_skew < 0: raise Exception(f'Well skew must be zero or positive: {self.well_skew}')
+		if self.index_error_rate < 0 or self.index_error_rate > 1: raise Exception(f'Index error rate must be between 0 and 1: {self.index_error_rate}')
+		if self.quality_profile not in self.quality_profiles: raise Exception(f'Unknown quality profile: {self.quality_profile}')
+		for sample_name, i7_barcode, i5_barcode in self.samples:
+			if set(i7_barcode + i5_barcode) - set('ACGT'): raise Exception(f'Unable to simulate barcodes for {sample_name}: {i7_barcode}, {i5_barcode}')
+
+	@property
+	def quality_profiles (self):
+		return ['constant', 'declining', 'uniform']
+
+	@property
+	def sample_weights (self):
+
+		# Weight the samples using a Zipf-like skew, a skew of 0 returns equal weights
+		sample_weights = 1.0 / np.power(np.arange(1, len(self.samples) + 1, dtype = float), self.well_skew)
+		return sample_weights / sample_weights.sum()
+
+	@classmethod
+	def fromIndex (cls, index, index_format, excel_sheet = 0, **kwargs):
+
+		# Open index file, if possible
+		if index_format == 'excel': index_dataframe = pd.read_excel(index, sheet_name = excel_sheet, engine = 'openpyxl', dtype = str)
+		elif index_format == 'tsv': index_dataframe = pd.read_csv(index, sep = '\t', dtype = str)
+		else: raise Exception(f'Unknown index format: {index_format}')
+		index_dataframe = index_dataframe.dropna(how = 'all')
+
+		# Assign the header column names
+		well_col, i7_col, i5_col = None, None, None
+		for index_col in index_dataframe.columns:
+			if 'sample' in str(index_col).lower() or 'well' in str(index_col).lower() or 'name' in str(index_col).lower():
+				if well_col: raise Exception(f'Well column assignment error: {index}')
+				well_col = index_col
+			elif 'i7' in str(index_col).lower() or 'index1' in str(index_col).lower():
+				if i7_col: raise Exception(f'i7 column assignment error: {index}')
+				i7_col = index_col
+			elif 'i5' in str(index_col).lower() or 'index2' in str(index_col).lower():
+				if i5_col: raise Exception(f'i5 column assignment error: {index}')
+				i5_col = index_col
+
+		# Confirm all the headers were found
+		if not well_col or not i7_col or not i5_col: raise Exception(f'Unable to assign the index header: {index}')
+
+		# Assign the samples, removing any whitespace
+		samples = []
+		for well, i7_barcode, i5_barcode in index_dataframe[[well_col, i7_col, i5_col]].itertuples(index = False):
+			samples.append((well.replace(' ', ''), i7_barcode.replace(' ', '').upper(), i5_barcode.replace(' ', '').upper()))
+
+		logging.info(f'Assigned {len(samples)} samples from index: {index}')
+
+		return cls(samples = samples, **kwargs)
+
+	@classmethod
+	def fromMaps (cls, i5_map_filename, i7_map_filename, **kwargs):
+
+		# Read the i5 map, stored as: plate, barcode, and locus (if given)
+		i5_map = []
+		with open(i5_map_filename) as i5_map_file:
+			for i5_map_line in i5_map_file:
+				if not i5_map_line.strip(): continue
+				try: i5_plate, i5_barcode, i5_locus = i5_map_line.split()
+				except:
+					i5_plate, i5_barcode = i5_map_line.split()
+					i5_locus = ''
+				locus_str = f'_{i5_locus}' if i5_locus else ''
+				i5_map.append((f'{i5_plate}{locus_str}', i5_barcode.upper()))
+
+		# Read the i7 map, stored as: well and barcode
+		i7_map = []
+		with open(i7_map_filename) as i7_map_file:
+			for i7_map_line in i7_map_file:
+				if not i7_map_line.strip(): continue
+				i7_well, i7_barcode = i7_map_line.split()
+				i7_map.append((i7_well, i7_barcode.upper()))
+
+		# Assign every plate/well combination as a sample
+		samples = []
+		for i5_plate, i5_barcode in i5_map:
+			for i7_well, i7_barcode in i7_map:
+				samples.append((f'{i5_plate}_{i7_well}', i7_barcode, i5_barcode))
+
+		logging.info(f'Assigned {len(samples)} samples from maps: {i5_map_filename}, {i7_map_filename}')
+
+		return cls(samples = samples, **kwargs)
+
+	def writeIndex (self, index_filename, method = 'fastq-multx', index_format = 'tsv'):
+
+		# Assign the index dataframe
+		index_dataframe = pd.DataFrame(self.samples, columns = ['Name', 'i7', 'i5'])
+
+		# Assign the columns expected by each method
+		if method == 'fastq-multx': index_dataframe = index_dataframe[['Name', 'i7', 'i5']]
+		elif method == 'deML': index_dataframe = index_dataframe.rename(columns = {'i7':'#Index1', 'i5':'Index2'})[['#Index1', 'Index2', 'Name']]
+		else: raise Exception(f'Unknown index method: {method}')
+
+		# Write the index
+		if index_format == 'tsv': index_dataframe.to_csv(index_filename, sep = '\t', index = False)
+		elif index_format == 'excel': index_dataframe.rename(columns = {'Name':'Sample'}).to_excel(index_filename, index = False, engine = 'openpyxl')
+		else: raise Exception(f'Unknown index format: {index_format}')
+
+		return index_filename
+
+	def writeFASTQs (self, out_dir, out_prefix = 'Synthetic'):
+
+		# Create the output directory, if needed
+		if not os.path.exists(out_dir): os.makedirs(out_dir)
+
+		# Assign the output filenames, using the Illumina read order
+		fastq_filenames = {'R1': os.path.join(out_dir, f'{out_prefix}_R1.fastq.gz'),
+						   'i7': os.path.join(out_dir, f'{out_prefix}_i7.fastq.gz'),
+						   'i5': os.path.join(out_dir, f'{out_prefix}_i5.fastq.gz'),
+						   'R2': os.path.join(out_dir, f'{out_prefix}_R2.fastq.gz')}
+		read_numbers = {'R1': 1, 'i7': 2, 'i5': 3, 'R2': 4}
+
+		# Create the random number generator
+		rng = np.random.default_rng(self.seed)
+
+		# Convert the barcodes into base positions
+		i7_barcodes = self._barcodeArray([i7_barcode for _, i7_barcode, _ in self.samples])
+		i5_barcodes = self._barcodeArray([i5_barcode for _, _, i5_barcode in self.samples])
+
+		# Open the output files, gzip level 1 to keep the generator quick
+		fastq_files = {read_type:gzip.open(fastq_filename, 'wb', compresslevel = 1) for read_type, fastq_filename in fastq_filenames.items()}
+
+		# Create a count array of the reads assigned to each sample
+		sample_counts = np.zeros(len(self.samples), dtype = int)
+
+		# Simulate the reads in chunks
+		for chunk_start in range(0, self.read_count, self._chunk_size):
+			chunk_size = min(self._chunk_size, self.read_count - chunk_start)
+
+			# Assign the reads to samples
+			chunk_samples = rng.choice(len(self.samples), size = chunk_size, p = self.sample_weights)
+			sample_counts += np.bincount(chunk_samples, minlength = len(self.samples))
+
+			# Assign the sequences of each read
+			chunk_seqs = {'R1': rng.integers(0, 4, size = (chunk_size, self.read_len), dtype = np.uint8),
+						  'i7': self._addIndexErrors(i7_barcodes[chunk_samples], rng),
+						  'i5': self._addIndexErrors(i5_barcodes[chunk_samples], rng),
+						  'R2': rng.integers(0, 4, size = (chunk_size, self.read_len), dtype = np.uint8)}
+
+			# Write the reads
+			for read_type, read_seqs in chunk_seqs.items():
+				seq_bytes = self._bases[read_seqs]
+				qual_bytes = self._qualityArray(read_seqs.shape, rng)
+				fastq_records = []
+				for read_pos in range(chunk_size):
+					fastq_records.append(b'@SYN:1:%d %d:N:0:\n%s\n+\n%s\n' % (chunk_start + read_pos + 1, read_numbers[read_type], seq_bytes[read_pos].tobytes(), qual_bytes[read_pos].tobytes()))
+				fastq_files[read_type].write(b''.join(fastq_records))
+
+		# Close the output files
+		for fastq_file in fastq_files.values(): fastq_file.close()
+
+		logging.info(f'Simulated {self.read_count} reads across {len(self.samples)} samples')
+
+		# Return the filenames and the reads assigned to each sample
+		return fastq_filenames, {sample[0]:int(sample_count) for sample, sample_count in zip(self.samples, sample_counts)}
+
+	def _barcodeArray (self, barcodes):
+
+		# Confirm the barcodes have a single length
+		barcode_lens = set(map(len, barcodes))
+		if len(barcode_lens) != 1: raise Exception(f'Barcodes of multiple lengths found: {sorted(barcode_lens)}')
+
+		# Return the barcodes as an array of base positions
+		return np.array([[self._base_to_pos[base] for base in barcode] for barcode in barcodes], dtype = np.uint8)
+
+	def _addIndexErrors (self, index_seqs, rng):
+
+		# Return the sequences if no errors are expected
+		if not self.index_error_rate: return index_seqs
+
+		# Substitute bases at the error rate, always to a different base
+		error_mask = rng.random(index_seqs.shape) < self.index_error_rate
+		error_seqs = (index_seqs + rng.integers(1, 4, size = index_seqs.shape, dtype = np.uint8)) % 4
+		return np.where(error_mask, error_seqs, index_seqs).astype(np.uint8)
+
+	def _qualityArray (self, shape, rng):
+
+		# Assign phred scores using the quality profile
+		if self.quality_profile == 'constant':
+			phred_scores = np.full(shape, 40)
+		elif self.quality_profile == 'declining':
+			phred_means = np.linspace(38, 20, num = shape[1])
+			phred_scores = np.rint(rng.normal(phred_means, 3, size = shape))
+		elif self.quality_profile == 'uniform':
+			phred_scores = rng.integers(2, 42, size = shape)
+
+		# Return the scores as phred+33 characters
+		return (np.clip(phred_scores, 2, 41) + 33).astype(np.uint8)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import logging
+import multiprocessing
+
+import pandas as pd
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from kocher_tools.logger import *
+from kocher_tools.kocher_database import *
+
+def uploadFilesParser ():
+	'''
+	Argument parser for uploading multiple files
+
+	Raises
+	------
+	IOError
+		If the input, or other specified files do not exist
+	'''
+
+	def confirmFile ():
+		'''Custom action to confirm file exists'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, value, option_string=None):
+				if not os.path.isfile(value):
+					raise IOError('%s not found' % value)
+				setattr(args, self.dest, value)
+		return customAction
+
+	def confirmFileList ():
+		'''Custom action to confirm file exists in list'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, values, option_string=None):
+				# Loop the list
+				for value in values:
+					# Check if the file exists
+					if not os.path.isfile(value):
+						raise IOError('%s not found' % value)
+				if not getattr(args, self.dest):
+					setattr(args, self.dest, values)
+				else:
+					getattr(args, self.dest).extend(values)
+		return customAction
+
+	def confirmFileGroup ():
+		'''Custom action to confirm file exists, storing each group of files'''
+		class customAction(argparse.Action):
+			def __call__(self, parser, args, values, option_string=None):
+				# Loop the list
+				for value in values:
+					# Check if the file exists
+					if not os.path.isfile(value):
+						raise IOError('%s not found' % value)
+				if not getattr(args, self.dest):
+					setattr(args, self.dest, [values])
+				else:
+					getattr(args, self.dest).append(values)
+		return customAction
+
+	upload_parser = argparse.ArgumentParser(formatter_class = argparse.ArgumentDefaultsHelpFormatter)
+
+	# Input arguments
+	upload_parser.add_argument('--collection-files', help = 'Collection input files', type = str, nargs = '+', action = confirmFileList())
+	upload_parser.add_argument('--storage-files', help = 'Storage input files', type = str, nargs = '+', action = confirmFileList())
+	upload_parser.add_argument('--sequencing-files', help = 'Sequencing input files of a single run. May be used multiple times', type = str, nargs = '+', action = confirmFileGroup())
+	upload_parser.add_argument('--uploader', help = 'Name of the uploader', type = str, nargs = '+')
+	upload_parser.add_argument('--error-if-found', dest = 'ignore_previously_entered', help = 'Do not ignore previously entered data' , action = 'store_false')
+	upload_parser.add_argument('--update-if-found', dest = 'update_previously_entered', help = 'Update previously entered data (collection only)' , action = 'store_true')
+	upload_parser.add_argument('--processes', help = 'Number of processes used to parse the files', type = int, default = multiprocessing.cpu_count())
+
+	# Output arguments
+	upload_parser.add_argument('--out-report', help = 'Filename of the upload report (TSV)', type = str)
+	upload_parser.add_argument('--out-log', help = 'Filename of the log file', type = str, default = 'upload_files.log')
+	upload_parser.add_argument('--log-stdout', help = 'Direct logging to stdout', action = 'store_true')
+
+	# SQL statistics arguments
+	upload_parser.add_argument('--sql-stats', help = 'Report the SQL statement statistics', action = 'store_true')
+	upload_parser.add_argument('--slow-query-seconds', help = 'Log SQL statements slower than the given seconds', type = float, default = 1.0)
+	upload_parser.add_argument('--sql-stats-top', help = 'Number of SQL statements to report, by total duration', type = int, default = 10)
+
+	# Database arguments
+	upload_parser.add_argument('--yaml', dest = 'config_file', help = 'Database YAML config file', type = str, required = True, action = confirmFile())
+
+	upload_args = upload_parser.parse_args()
+
+	# Confirm files were given
+	if not upload_args.collection_files and not upload_args.storage_files and not upload_args.sequencing_files:
+		upload_parser.error('No input files specified')
+
+	return upload_args
+
+def main():
+
+	# Assign arguments
+	upload_args = uploadFilesParser()
+
+	# Open the config
+	config_data = ConfigDB.readConfig(upload_args.config_file)
+
+	# Start a log for this run
+	if upload_args.log_stdout: startLogger()
+	else: startLogger(log_filename = upload_args.out_log)
+	logArgs(upload_args)
+
+	# Record the SQL statement statistics, if requested
+	sql_statistics = startSQLStatisticsFromConfig(config_data, upload_args.slow_query_seconds) if upload_args.sql_stats else None
+
+	# Assign the upload jobs, sorted into dependency order when inserted
+	upload_jobs = []
+	if upload_args.collection_files: upload_jobs.extend([('collection', [collection_file]) for collection_file in upload_args.collection_files])
+	if upload_args.storage_files: upload_jobs.extend([('storage', [storage_file]) for storage_file in upload_args.storage_files])
+	if upload_args.sequencing_files: upload_jobs.extend([('sequencing', sequencing_files) for sequencing_files in upload_args.sequencing_files])
+
+	# Insert the files
+	upload_report = insertFilesUsingConfig(config_data, upload_jobs, uploader = upload_args.uploader,
+										   ignore_previously_entered = upload_args.ignore_previously_entered, update_previously_entered = upload_args.update_previously_entered,
+										   processes = upload_args.processes)
+
+	# Report the uploads
+	report_dataframe = pd.DataFrame(upload_report)
+	print(report_dataframe.drop(columns = ['error']).to_string(index = False))
+	print(f'Uploaded {report_dataframe["rows"].sum()} rows from {len(report_dataframe)} upload(s)')
+	if upload_args.out_report: report_dataframe.to_csv(upload_args.out_report, sep = '\t', index = False)
+
+	# Report the SQL statement statistics
+	if sql_statistics: sql_statistics.report(upload_args.sql_stats_top)
+
+if __name__ == "__main__":
+	main()
@@ -14,6 +14,10 @@ requirements = ['pyyaml',
                 'openpyxl',
                 'tox']
 
+# Optional non-standard python libraries, e.g. pip install kocher_tools[arrow]
+optional_requirements = {'arrow': ['pyarrow'],
+                         'postgresql': ['psycopg2']}
+
 # Executable scripts in the package
 tool_scripts = ['kocher_tools/barcode_pipeline.py',
                 'kocher_tools/barcode_filter.py',
@@ -23,8 +27,13 @@ tool_scripts = ['kocher_tools/barcode_pipeline.py',
                 'kocher_tools/calc_pca.py',
                 'kocher_tools/demultiplex_paired_barcodes.py',
                 'kocher_tools/demultiplex_pipeline.py',
+                'kocher_tools/benchmark_demultiplex.py',
+                'kocher_tools/benchmark_database.py',
                 'kocher_tools/create_database.py',
+                'kocher_tools/explain_database.py',
+                'kocher_tools/rebuild_summaries.py',
                 'kocher_tools/insert_file.py',
+                'kocher_tools/upload_files.py',
                 'kocher_tools/gff_position_stats.py',
                 'kocher_tools/gff_chrom_stats.py',
                 'kocher_tools/gff_add_features.py',
@@ -47,5 +56,6 @@ setup(name=kocher_tools.__title__,
       packages=['kocher_tools'],
       package_data={'kocher_tools': ['data/*.txt']},
       install_requires=requirements,
+      extras_require=optional_requirements,
       scripts=tool_scripts,
       python_requires=">=3.6")
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+import shutil
+import tempfile
+
+import pandas as pd
+
+from kocher_tools.assignment import sniffInputFile, sniffDelimiter, readInputFile
+
+# Run tests for assignment.py
+class test_assignment (unittest.TestCase):
+
+	@classmethod
+	def setUpClass (cls):
+
+		# Create a temporary directory
+		cls.test_dir = tempfile.mkdtemp()
+
+		# Assign the script directory
+		cls.script_dir = os.path.dirname(os.path.realpath(__file__))
+
+		# Assign the expected output directory
+		cls.expected_dir = 'test_files'
+
+		# Assign the expected path
+		cls.expected_path = os.path.join(cls.script_dir, cls.expected_dir)
+
+		# Assign the collection file, then create csv and excel copies
+		cls.tsv_filename = os.path.join(cls.expected_path, 'test_collection_01_input.tsv')
+		cls.tsv_dataframe = pd.read_csv(cls.tsv_filename, dtype = str, sep = '\t')
+		cls.csv_filename = os.path.join(cls.test_dir, 'test_collection_01_input.csv')
+		cls.tsv_dataframe.to_csv(cls.csv_filename, index = False)
+		cls.excel_filename = os.path.join(cls.test_dir, 'test_collection_01_input.xlsx')
+		cls.tsv_dataframe.to_excel(cls.excel_filename, index = False, engine = 'openpyxl')
+
+	@classmethod
+	def tearDownClass (cls):
+
+		# Remove the test directory after the tests
+		shutil.rmtree(cls.test_dir)
+
+	# Check sniffInputFile and sniffDelimiter functions
+	def test_01_sniffInputFile (self):
+
+		# Confirm the formats are assigned by content
+		self.assertEqual(sniffInputFile(self.tsv_filename), 'table')
+		self.assertEqual(sniffInputFile(self.excel_filename), 'excel')
+		self.assertEqual(sniffInputFile(os.path.join(self.expected_path, 'test_barcode_01_input.fasta')), 'fasta')
+		self.assertEqual(sniffInputFile(os.path.join(self.expected_path, 'test_barcode_01_input.json')), 'json')
+
+		# Confirm the delimiters, using a stream for the csv file
+		self.assertEqual(sniffDelimiter(self.tsv_filename), '\t')
+		with open(self.csv_filename, 'rb') as csv_file:
+			self.assertEqual(sniffDelimiter(csv_file), ',')
+			self.assertEqual(csv_file.tell(), 0)
+
+	# Check readInputFile function
+	def test_02_readInputFile (self):
+
+		# Confirm each format returns the same dataframe
+		for input_filename in [self.tsv_filename, self.csv_filename, self.excel_filename]:
+			self.assertTrue(readInputFile(input_filename).equals(self.tsv_dataframe))
+
+		# Confirm other formats fail
+		with self.assertRaises(Exception):
+			readInputFile(os.path.join(self.expected_path, 'test_barcode_01_input.fasta'))
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)
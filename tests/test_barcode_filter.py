@@ -12,10 +12,13 @@ import multiprocessing
 import pkg_resources
 import subprocess
 import logging
+import csv
+import json
 
 from unittest.mock import patch
 
 from kocher_tools.barcode_filter import *
+from kocher_tools.barcode_pipeline import barcodePipelineParser
 from tests.functions import strFileComp, fileComp
 
 # Run tests for barcode_filter.py
@@ -42,6 +45,11 @@ class test_barcode_filter (unittest.TestCase):
 		# Remove the test directory after the tests
 		shutil.rmtree(cls.test_dir)
 
+	def tearDown (self):
+
+		# Restore logging, as disabled by the main tests
+		logging.disable(logging.NOTSET)
+
 	# Check barcode_filter yieldBestHits function
 	def test_01_yieldBestHits (self):
 
@@ -154,7 +162,7 @@ class test_barcode_filter (unittest.TestCase):
 
 		# Assign the barcode_filter args
 		barcode_args = [sys.argv[0], '--blast-file', test_blast_file, '--overwrite', '--abundance-cutoff', '0', 
-					   '--out-blast', test_filtered_file]
+					   '--out-blast', test_filtered_file, '--out-log', os.path.join(self.test_dir, 'barcode_filter.log')]
 
 		# Use mock to replace sys.argv for the test
 		with patch('sys.argv', barcode_args):
@@ -175,7 +183,7 @@ class test_barcode_filter (unittest.TestCase):
 
 		# Assign the barcode_filter args
 		barcode_args = [sys.argv[0],'--blast-file', test_blast_file, '--overwrite', '--abundance-cutoff', '4', 
-					   '--out-blast', test_filtered_passed_file, '--out-failed', test_filtered_failed_file]
+					   '--out-blast', test_filtered_passed_file, '--out-failed', test_filtered_failed_file, '--out-log', os.path.join(self.test_dir, 'barcode_filter.log')]
 
 		# Disable logs for the next test, as warning messages are expected to be logged
 		logging.disable(logging.CRITICAL)
@@ -190,5 +198,196 @@ class test_barcode_filter (unittest.TestCase):
 		self.assertTrue(fileComp(test_filtered_passed_file, expected_filtered_passed_file))
 		self.assertTrue(fileComp(test_filtered_failed_file, expected_filtered_failed_file))
 
+	# Check barcode_filter filterBlastHits function
+	def test_04_filterBlastHits (self):
+
+		# Assign the test blast file
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+
+		# Assign the expected failures file
+		expected_filtered_failed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_failures.json')
+
+		# Disable logs, as warning messages are expected to be logged
+		logging.disable(logging.CRITICAL)
+
+		# Open the BLAST input file
+		with open(test_blast_file) as blast_file:
+
+			# Filter the hits as they are read
+			filtered_hits = list(filterBlastHits(csv.DictReader(blast_file, delimiter = '\t'), abundance_cutoff = 4))
+
+		# Confirm each query either passed or failed
+		for current_query, passed_hits, failed_sample_dict in filtered_hits:
+			self.assertFalse(passed_hits and failed_sample_dict)
+
+		# Confirm the failures match the expected failures
+		with open(expected_filtered_failed_file) as expected_failed_file:
+			self.assertEqual([failed_sample_dict['Query ID'] for _, _, failed_sample_dict in filtered_hits if failed_sample_dict], 
+							 [failed_sample_dict['Query ID'] for failed_sample_dict in json.load(expected_failed_file)])
+
+		# Confirm the negative controls are removed
+		with open(test_blast_file) as blast_file:
+			control_hits = list(filterBlastHits(csv.DictReader(blast_file, delimiter = '\t'), negative_control_list = ['SD_04-A1'], abundance_cutoff = 0))
+		self.assertEqual(control_hits[0], ('SD_04-A1_1;size=6', [], None))
+
+	# Check barcode_filter main function using the pandas engine
+	def test_05_mainPandas (self):
+
+		# Assign the test blast file
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+
+		# Assign the expected filtered hits files
+		expected_filtered_passed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_passed.out')
+		expected_filtered_failed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_failures.json')
+
+		# Assign the test filtered hits files
+		test_filtered_passed_file = os.path.join(self.test_dir, 'test_BLAST_pandas_passed.out')
+		test_filtered_failed_file = os.path.join(self.test_dir, 'test_BLAST_pandas_failures.json')
+
+		# Assign the barcode_filter args, using small chunks to split queries between chunks
+		barcode_args = [sys.argv[0],'--blast-file', test_blast_file, '--overwrite', '--abundance-cutoff', '4', 
+					   '--out-blast', test_filtered_passed_file, '--out-failed', test_filtered_failed_file,
+					   '--engine', 'pandas', '--chunk-size', '7', '--out-log', os.path.join(self.test_dir, 'barcode_filter_pandas.log')]
+
+		# Disable logs, as warning messages are expected to be logged
+		logging.disable(logging.CRITICAL)
+
+		# Use mock to replace sys.argv for the test
+		with patch('sys.argv', barcode_args):
+
+			# Run the command
+			main()
+
+		# Confirm the test files have the correct contents
+		self.assertTrue(fileComp(test_filtered_passed_file, expected_filtered_passed_file))
+		self.assertTrue(fileComp(test_filtered_failed_file, expected_filtered_failed_file))
+
+	# Check barcode_filter yieldQuerySortedLines function
+	def test_06_yieldQuerySortedLines (self):
+
+		# Assign the test blast file
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+
+		# Read the test lines, then shuffle the hits
+		with open(test_blast_file) as blast_file:
+			test_header = blast_file.readline()
+			test_lines = blast_file.readlines()
+		random.Random(1).shuffle(test_lines)
+
+		# Assign the expected lines, sorting by query while keeping the order of each query
+		expected_lines = [test_header] + sorted(test_lines, key = lambda test_line: test_line.split('\t')[0])
+
+		# Sort the lines, using a budget small enough to require temporary files
+		sorted_lines = list(yieldQuerySortedLines(iter([test_header] + test_lines), memory_budget = 0.005, tmp_dir = self.test_dir))
+
+		# Confirm the lines were sorted
+		self.assertEqual(sorted_lines, expected_lines)
+
+		# Confirm the lines were sorted in memory
+		self.assertEqual(list(yieldQuerySortedLines(iter([test_header] + test_lines))), expected_lines)
+
+	# Check barcode_filter queryChunkOffsets function
+	def test_07_queryChunkOffsets (self):
+
+		# Assign the test blast file
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+
+		# Split the file into ranges
+		chunk_offsets = queryChunkOffsets(test_blast_file, 8)
+
+		# Confirm the ranges cover the file, without overlaps
+		self.assertTrue(len(chunk_offsets) > 1)
+		self.assertEqual(chunk_offsets[-1][1], os.path.getsize(test_blast_file))
+		for (_, previous_end), (chunk_start, _) in zip(chunk_offsets, chunk_offsets[1:]):
+			self.assertEqual(previous_end, chunk_start)
+
+		# Confirm each range starts at a new query
+		with open(test_blast_file, 'rb') as blast_file:
+			for chunk_start, _ in chunk_offsets[1:]:
+				blast_file.seek(chunk_start - 1)
+				self.assertEqual(blast_file.read(1), b'\n')
+				chunk_query = blast_file.readline().split(b'\t')[0]
+				blast_file.seek(0)
+				previous_query = blast_file.read(chunk_start).splitlines()[-1].split(b'\t')[0]
+				self.assertNotEqual(chunk_query, previous_query)
+
+	# Check barcode_filter main function using multiple processes
+	def test_08_mainThreads (self):
+
+		# Assign the test blast file
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+
+		# Assign the expected filtered hits files
+		expected_filtered_passed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_passed.out')
+		expected_filtered_failed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_failures.json')
+
+		# Assign the test filtered hits files
+		test_filtered_passed_file = os.path.join(self.test_dir, 'test_BLAST_threads_passed.out')
+		test_filtered_failed_file = os.path.join(self.test_dir, 'test_BLAST_threads_failures.json')
+
+		# Assign the barcode_filter args
+		barcode_args = [sys.argv[0],'--blast-file', test_blast_file, '--overwrite', '--abundance-cutoff', '4', 
+					   '--out-blast', test_filtered_passed_file, '--out-failed', test_filtered_failed_file,
+					   '--threads', '3', '--out-log', os.path.join(self.test_dir, 'barcode_filter_threads.log')]
+
+		# Disable logs, as warning messages are expected to be logged
+		logging.disable(logging.CRITICAL)
+
+		# Use mock to replace sys.argv for the test
+		with patch('sys.argv', barcode_args):
+
+			# Run the command
+			main()
+
+		# Confirm the test files have the correct contents
+		self.assertTrue(fileComp(test_filtered_passed_file, expected_filtered_passed_file))
+		self.assertTrue(fileComp(test_filtered_failed_file, expected_filtered_failed_file))
+
+	# Check filterBlastFile function, as used by barcode_pipeline.py
+	def test_09_filterBlastFile (self):
+
+		# Assign the test blast file, and the expected filtered hits files
+		test_blast_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+		expected_filtered_passed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_passed.out')
+		expected_filtered_failed_file = os.path.join(self.expected_path, 'test_barcode_BLAST_filtered_failures.json')
+
+		# Assign the test filtered hits files
+		test_filtered_passed_file = os.path.join(self.test_dir, 'test_BLAST_file_passed.out')
+		test_filtered_failed_file = os.path.join(self.test_dir, 'test_BLAST_file_failures.json')
+
+		# Filter the hits using the pandas engine
+		filterBlastFile(test_blast_file, test_filtered_passed_file, test_filtered_failed_file, engine = 'pandas', chunk_size = 7, abundance_cutoff = 4)
+
+		# Confirm the test files have the correct contents
+		self.assertTrue(fileComp(test_filtered_passed_file, expected_filtered_passed_file))
+		self.assertTrue(fileComp(test_filtered_failed_file, expected_filtered_failed_file))
+
+	# Check that barcode_pipeline.py shares the filter arguments
+	def test_10_barcodeFilterArguments (self):
+
+		# Assign the pipeline args, using every filter argument
+		input_file = os.path.join(self.expected_path, 'test_barcode_BLAST_unsorted.out')
+		pipeline_args = [sys.argv[0], '--i5-map', input_file, '--i5-read-file', input_file, '--i7-read-file', input_file, '--R1-read-file', input_file, '--R2-read-file', input_file, '--filter',
+						 '--negative-control', 'NC1', '--abundance-cutoff', '4', '--evalue-cutoff', '0.001', '--coverage-cutoff', '0.5', '--identity-cutoff', '0.5', 
+						 '--sort-best-hits-by', 'align_len', '--dont-merge-species', '--unsorted', '--memory-budget', '1', '--tmp-dir', self.test_dir, '--engine', 'pandas', '--chunk-size', '7']
+
+		# Use mock to replace sys.argv for the test
+		with patch('sys.argv', pipeline_args):
+
+			# Assign the pipeline arguments
+			filter_args = barcodePipelineParser()
+
+		# Confirm each filter argument of the parent parser was assigned
+		for filter_action in barcodeFilterArguments()._actions:
+			self.assertIn(filter_action.dest, vars(filter_args))
+		self.assertEqual((filter_args.unsorted, filter_args.memory_budget, filter_args.tmp_dir), (True, 1, self.test_dir))
+		self.assertEqual((filter_args.engine, filter_args.chunk_size), ('pandas', 7))
+
+		# Confirm the filter arguments are assigned
+		filter_kwargs = filterKwargsFromArgs(filter_args)
+		self.assertEqual(filter_kwargs['negative_control_list'], ['NC1'])
+		self.assertEqual(filter_kwargs['sort_best_hits_by'], ['align_len'])
+		self.assertTrue(filter_kwargs['dont_merge_species'])
+
 if __name__ == "__main__":
 	unittest.main(verbosity = 2)
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import sys
+import unittest
+
+from kocher_tools.benchmark import timeFunction
+
+def returnValue (value):
+	return value
+
+def exitProcess (exit_code):
+	os._exit(exit_code)
+
+# Run tests for benchmark.py
+class test_benchmark (unittest.TestCase):
+
+	# Check timeFunction function
+	def test_01_timeFunction (self):
+
+		# Check the value is returned with the time and memory
+		benchmark_results = timeFunction(returnValue, 5)
+		self.assertEqual(benchmark_results['status'], 'ok')
+		self.assertEqual(benchmark_results['returned'], 5)
+		self.assertGreater(benchmark_results['peak_memory_mb'], 0)
+
+		# Check that a process exiting without a result is failed, with the exit code
+		benchmark_results = timeFunction(exitProcess, 3, poll_seconds = 0.1)
+		self.assertEqual(benchmark_results['status'], 'failed')
+		self.assertEqual(benchmark_results['exitcode'], 3)
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)
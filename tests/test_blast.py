@@ -153,5 +153,26 @@ class test_blast (unittest.TestCase):
 		# Check the file has the correct contents
 		self.assertTrue(fileComp(test_blast_file, expected_blast_file))
 
+	# Check blast yieldBlastTopHits function
+	def test_05_yieldBlastTopHits (self):
+
+		# Assign the test input
+		test_common_file = os.path.join(self.expected_path, 'test_blast_common.fasta')
+
+		# Assign the test output
+		test_blast_file = os.path.join(self.test_dir, 'test_yield_BLAST.out')
+
+		# Assign the expected output
+		expected_blast_file = os.path.join(self.expected_path, 'test_blast_BLAST_header.out')
+
+		# Read the hits as they are reported
+		test_hits = list(yieldBlastTopHits(test_common_file, self.blast_database, multiprocessing.cpu_count(), blast_output = test_blast_file))
+
+		# Check the hits are keyed by the header
+		self.assertEqual(test_hits[0]['Subject ID'], 'TestSeq-1|TestSpecies-1|TestBin-1')
+
+		# Check the copied file has the correct contents
+		self.assertTrue(fileComp(test_blast_file, expected_blast_file))
+
 if __name__ == "__main__":
 	unittest.main(verbosity = 2)
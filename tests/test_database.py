@@ -0,0 +1,605 @@
+import os
+import sys
+import logging
+import sqlite3
+import unittest
+import shutil
+import tempfile
+import yaml
+
+import pandas as pd
+
+from sqlalchemy import Table, Column, MetaData, ForeignKey, Integer, String
+from sqlalchemy.dialects import postgresql
+
+try:
+	import pyarrow.feather
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from tests.functions import checkValue, updateConfigFilename
+
+# Run tests for database.py
+class test_database (unittest.TestCase):
+
+	@classmethod
+	def setUpClass (cls):
+
+		# Create a temporary directory
+		cls.test_dir = tempfile.mkdtemp()
+
+		# Assign the script directory
+		cls.script_dir = os.path.dirname(os.path.realpath(__file__))
+
+		# Assign the expected output directory
+		cls.expected_dir = 'test_files'
+
+		# Assign the expected path
+		cls.expected_path = os.path.join(cls.script_dir, cls.expected_dir)
+
+		# Create a copy of the yml file, then update the sqlite filename to the test dir
+		config_filename = os.path.join(cls.expected_path, 'testDB_large.yml')
+		cls.config_filename = os.path.join(cls.test_dir, 'testDB_large.yml')
+		shutil.copy(config_filename, cls.config_filename)
+		updateConfigFilename(cls.config_filename, os.path.join(cls.test_dir, 'testDB_large.sqlite'))
+
+		# Create the tables
+		cls.db_config_data = ConfigDB.readConfig(cls.config_filename)
+		sql_engine = createEngineFromConfig(cls.db_config_data)
+		createAllFromConfig(cls.db_config_data, sql_engine)
+		cls.database_filename = cls.db_config_data.filename
+
+	@classmethod
+	def tearDownClass (cls):
+
+		# Remove the test directory after the tests
+		shutil.rmtree(cls.test_dir)
+
+	# Check SQLInsert bulkInsert function
+	def test_01_bulkInsert (self):
+
+		# Assign the values, using more rows than a single batch
+		collection_dataframe = pd.DataFrame({'unique_id': ['Bulk-%s' % sample_pos for sample_pos in range(2500)], 'site_code': 'BLK'})
+
+		# Insert the values in batches
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_insert._sql_batch_size = 1000
+		sql_insert.addTableToInsert(self.db_config_data['collection'])
+		sql_insert.addDataFrameValues(collection_dataframe)
+		sql_insert.bulkInsert()
+		sql_connection.commit()
+		sql_connection.close()
+
+		# Check that the values were correctly inserted
+		self.assertTrue(checkValue(self.database_filename, 'collection', 'site_code', 'BLK', expected_count = 2500))
+		self.assertTrue(checkValue(self.database_filename, 'collection', 'unique_id', 'Bulk-2499'))
+
+		# Check that unknown columns are not inserted
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_insert.addTableToInsert(self.db_config_data['collection'])
+		self.assertRaises(Exception, sql_insert.addDataFrameValues, pd.DataFrame({'unknown_col': ['Bulk-0']}))
+
+		# Check that a batch with mixed columns is not inserted
+		sql_insert.addListValues([{'unique_id': 'Bulk-Mixed-1'}, {'unique_id': 'Bulk-Mixed-2', 'site_code': 'BLK'}])
+		self.assertRaises(Exception, sql_insert.bulkInsert)
+		sql_connection.close()
+
+	# Check SQLInsert bulkInsertIgnore function
+	def test_02_bulkInsertIgnore (self):
+
+		# Insert the plates twice, ignoring the previously inserted plates
+		for plate_list in [['Bulk-P1', 'Bulk-P2'], ['Bulk-P2', 'Bulk-P3']]:
+			sql_connection = startSessionFromConfig(self.db_config_data)
+			sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+			sql_insert.addTableToInsert(self.db_config_data['plates'])
+			sql_insert.addDataFrameValues(pd.DataFrame({'plate': plate_list}))
+			sql_insert.addIgnore('plate')
+			sql_insert.bulkInsertIgnore()
+			sql_connection.commit()
+			sql_connection.close()
+
+		# Check that the values were correctly inserted
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'plate', 'Bulk-P2', expected_count = 1))
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'plate', 'Bulk-P3', expected_count = 1))
+
+		# Check the postgresql statement ignores the unique constraint
+		sql_insert = SQLInsert(sql_insert = self.db_config_data['plates'], sql_values = [], sql_type = 'postgresql')
+		sql_insert.addIgnore('plate')
+		sql_statement = sql_insert.bulkStatement(ignore = True)
+		self.assertIn('ON CONFLICT ON CONSTRAINT plates_plate_key DO NOTHING', str(sql_statement.compile(dialect = postgresql.dialect())))
+
+	# Check SQLiteBulkLoader load and fastLoad functions
+	def test_03_SQLiteBulkLoader (self):
+
+		# Assign the values
+		collection_dataframe = pd.DataFrame({'unique_id': ['Loader-%s' % sample_pos for sample_pos in range(100)], 'site_code': 'LDR'})
+
+		# Load the values within the fast-load context
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		bulk_loader = BulkLoader.fromConfig(self.db_config_data, sql_connection)
+		self.assertIsInstance(bulk_loader, SQLiteBulkLoader)
+		with bulk_loader.fastLoad():
+			self.assertEqual(sql_connection.execute('PRAGMA synchronous').scalar(), 0)
+			self.assertEqual(sql_connection.execute('PRAGMA journal_mode').scalar(), 'memory')
+			bulk_loader.load(self.db_config_data['collection'], collection_dataframe.iloc[:50])
+			sql_connection.commit()
+
+			# Check that the pragmas are assigned to the connection of the next transaction
+			self.assertEqual(sql_connection.execute('PRAGMA synchronous').scalar(), 0)
+			self.assertEqual(sql_connection.execute('PRAGMA journal_mode').scalar(), 'memory')
+			bulk_loader.load(self.db_config_data['collection'], collection_dataframe.iloc[50:])
+			sql_connection.commit()
+
+		# Check that the pragmas are not assigned after the context
+		self.assertEqual(sql_connection.execute('PRAGMA synchronous').scalar(), 2)
+		self.assertEqual(sql_connection.execute('PRAGMA journal_mode').scalar(), 'delete')
+
+		# Check that an error within the transaction is raised, rather than an error restoring the pragmas
+		with self.assertRaisesRegex(Exception, 'UNIQUE constraint failed'):
+			with bulk_loader.fastLoad():
+				bulk_loader.load(self.db_config_data['collection'], collection_dataframe.iloc[:1])
+		sql_connection.rollback()
+		sql_connection.close()
+
+		# Check that the values were correctly inserted
+		self.assertTrue(checkValue(self.database_filename, 'collection', 'site_code', 'LDR', expected_count = 100))
+
+	# Check PostgreSQLBulkLoader copyStatement and copyBuffers functions
+	def test_04_PostgreSQLBulkLoader (self):
+
+		# Assign the loader, with small batches
+		bulk_loader = PostgreSQLBulkLoader(sql_batch_size = 1)
+
+		# Check the statement quotes the columns
+		copy_statement = bulk_loader.copyStatement(self.db_config_data['collection'], ['unique_id', 'site_code'])
+		self.assertEqual(copy_statement, "COPY collection (unique_id, site_code) FROM STDIN WITH (FORMAT csv)")
+
+		# Check the buffers keep empty strings, literal \\N values, and NULLs apart
+		copy_buffers = [csv_buffer.read() for csv_buffer in bulk_loader.copyBuffers(pd.DataFrame({'unique_id': ['A-1', 'A-2', 'A-3', 'A-4'], 'site_code': ['', None, 'A,"B"', '\\N'], 'sample_count': [1, 2, 3, 4]}))]
+		self.assertEqual(copy_buffers, ['"A-1","",1\n', '"A-2",,2\n', '"A-3","A,""B""",3\n', '"A-4","\\N",4\n'])
+
+	# Check PostgreSQLBulkLoader load function, using a stand-in database (e.g. user:passwd@localhost/test)
+	@unittest.skipUnless(os.environ.get('KOCHER_TEST_POSTGRESQL'), 'KOCHER_TEST_POSTGRESQL not assigned')
+	def test_05_PostgreSQLBulkLoaderCopy (self):
+
+		# Create a table for the test
+		sql_engine = createEngineFromAddress(os.environ['KOCHER_TEST_POSTGRESQL'])
+		test_table = Table('bulk_loader_test', MetaData(), Column('unique_id', String, unique = True), Column('site_code', String), Column('sample_count', Integer))
+		test_table.drop(sql_engine, checkfirst = True)
+		test_table.create(sql_engine)
+
+		try:
+
+			# Load the values, using COPY
+			sql_connection = startSessionFromEngine(sql_engine)
+			bulk_loader = PostgreSQLBulkLoader(sql_connection = sql_connection, sql_type = 'postgresql', sql_batch_size = 1000, copy_threshold = 10)
+			bulk_loader.load(test_table, pd.DataFrame({'unique_id': ['Copy-%s' % sample_pos for sample_pos in range(2500)], 'site_code': [None, ''] * 1250, 'sample_count': range(2500)}))
+			sql_connection.commit()
+
+			# Check that the values were correctly inserted
+			self.assertEqual(sql_connection.execute('SELECT COUNT(*) FROM bulk_loader_test WHERE site_code IS NULL').scalar(), 1250)
+			self.assertEqual(sql_connection.execute("SELECT SUM(sample_count) FROM bulk_loader_test WHERE site_code = ''").scalar(), sum(range(1, 2500, 2)))
+			sql_connection.close()
+
+		finally:
+			test_table.drop(sql_engine)
+
+	# Check SQLUpdate bulkUpdate function
+	def test_06_bulkUpdate (self):
+
+		# Insert the plates without boxes
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_insert.addTableToInsert(self.db_config_data['plates'])
+		sql_insert.addDataFrameValues(pd.DataFrame({'plate': ['Update-P1', 'Update-P2', 'Update-P3']}))
+		sql_insert.bulkInsert()
+
+		# Update the boxes of the plates, using more rows than a single batch
+		sql_update = SQLUpdate.fromConfig(self.db_config_data, sql_connection)
+		sql_update._sql_batch_size = 2
+		sql_update.addTableToUpdate(self.db_config_data['plates'])
+		sql_update.addDataFrameValues(pd.DataFrame({'plate': ['Update-P1', 'Update-P2', 'Update-P3'], 'box': ['Update-B1', 'Update-B1', 'Update-B2']}), 'plate')
+		sql_update.bulkUpdate()
+		sql_connection.commit()
+
+		# Check that the values were correctly updated
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'box', 'Update-B1', expected_count = 2))
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'box', 'Update-B2', expected_count = 1))
+
+		# Check that unknown key columns are not updated
+		sql_update = SQLUpdate.fromConfig(self.db_config_data, sql_connection)
+		sql_update.addTableToUpdate(self.db_config_data['plates'])
+		self.assertRaises(Exception, sql_update.addDataFrameValues, pd.DataFrame({'box': ['Update-B1']}), 'plate')
+		sql_connection.close()
+
+	# Check cachedEngineFromConfig and startSessionFromConfig functions
+	def test_07_cachedEngineFromConfig (self):
+
+		# Check that sessions share the engine of the config
+		sql_engine = cachedEngineFromConfig(self.db_config_data)
+		sql_connections = [startSessionFromConfig(self.db_config_data) for _ in range(2)]
+		self.assertIs(sql_connections[0].bind, sql_engine)
+		self.assertIs(sql_connections[1].bind, sql_engine)
+
+		# Close the sessions
+		for sql_connection in sql_connections:
+			sql_connection.close()
+
+		# Check that a config of the same database shares the engine
+		self.assertIs(cachedEngineFromConfig(ConfigDB.readConfig(self.config_filename)), sql_engine)
+
+		# Check that the engine is created again once disposed
+		disposeCachedEngines()
+		self.assertIsNot(cachedEngineFromConfig(self.db_config_data), sql_engine)
+
+	# Check SQLSelect toDataFrameChunks and toFileChunks functions
+	def test_08_selectChunks (self):
+
+		# Select the rows inserted by bulkInsert
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_select = SQLSelect.fromConfig(self.db_config_data, sql_connection)
+		sql_select.addTableToSelect(self.db_config_data['collection'])
+		sql_select.addDictWhere({'collection': {'site_code': 'BLK'}}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+
+		# Check the dataframes are returned in chunks
+		select_dataframes = list(sql_select.toDataFrameChunks(chunk_size = 1000))
+		self.assertEqual([len(select_dataframe) for select_dataframe in select_dataframes], [1000, 1000, 500])
+		self.assertEqual(set(pd.concat(select_dataframes)['unique_id']), set(['Bulk-%s' % sample_pos for sample_pos in range(2500)]))
+
+		# Check the file written in chunks matches the file written at once
+		chunks_filename = os.path.join(self.test_dir, 'select_chunks.tsv')
+		sql_select.toFileChunks(chunks_filename, '\t', chunk_size = 1000)
+		sql_select.select()
+		select_filename = os.path.join(self.test_dir, 'select.tsv')
+		sql_select.toFile(select_filename, '\t')
+		with open(chunks_filename) as chunks_file, open(select_filename) as select_file:
+			self.assertEqual(chunks_file.read(), select_file.read())
+
+		# Check that a file is not created if nothing was selected
+		sql_select = SQLSelect.fromConfig(self.db_config_data, sql_connection)
+		sql_select.addTableToSelect(self.db_config_data['collection'])
+		sql_select.addDictWhere({'collection': {'site_code': 'Unknown'}}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+		empty_filename = os.path.join(self.test_dir, 'select_empty.tsv')
+		sql_select.toFileChunks(empty_filename, '\t')
+		self.assertFalse(os.path.isfile(empty_filename))
+		sql_connection.close()
+
+		# Check that a joined select may be built repeatedly, without storing the joins
+		join_metadata = MetaData()
+		join_tables = [Table('join_plates', join_metadata, Column('plate', String, primary_key = True)),
+					   Table('join_storage', join_metadata, Column('sample_id', String, primary_key = True), Column('plate', String, ForeignKey('join_plates.plate')))]
+		sql_select = SQLSelect(sql_select_tables = [], sql_select_columns = [], sql_where = [], sql_tables = join_tables, tables_in_select = [False, False])
+		sql_select.addTableToSelect(join_tables[0])
+		sql_select.addTableToSelect(join_tables[1])
+		sql_select.addDictWhere({'join_storage': {'sample_id': 'Join-A1'}}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+		with self.assertNoLogs(level = 'WARNING'):
+			self.assertEqual(str(sql_select.selectStatement()), str(sql_select.selectStatement()))
+		self.assertEqual(len(sql_select._sql_where._sql_where), 1)
+		self.assertEqual(str(sql_select.selectStatement()).count('join_plates.plate = join_storage.plate'), 1)
+
+	# Check SQLSelect select function, using the result cache
+	def test_09_resultCache (self):
+
+		# Enable the cache
+		config_data = ConfigDB.readConfig(self.config_filename)
+		config_data.cache_mb = 1
+		sql_cache = cachedResultCacheFromConfig(config_data)
+
+		def selectPlates (sql_connection):
+			sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+			sql_select.addTableToSelect(config_data['plates'])
+			sql_select.addDictWhere({'plates': {'box': 'Cache-B1'}}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+			sql_select.select()
+			return sql_select.toDataFrame()
+
+		# Check that a repeated select is returned from the cache
+		sql_connection = startSessionFromConfig(config_data)
+		self.assertTrue(selectPlates(sql_connection).empty)
+		self.assertTrue(selectPlates(sql_connection).empty)
+		self.assertEqual((sql_cache.hits, sql_cache.misses), (1, 1))
+
+		# Check that uncommitted changes are not cached
+		sql_insert = SQLInsert.fromConfig(config_data, sql_connection)
+		sql_insert.addTableToInsert(config_data['plates'])
+		sql_insert.addDictValues({'plate': 'Cache-P1', 'box': 'Cache-B1'})
+		sql_insert.insert()
+		self.assertEqual(len(selectPlates(sql_connection)), 1)
+		self.assertEqual((sql_cache.hits, sql_cache.misses), (1, 1))
+
+		# Check that committed changes invalidate the cache
+		sql_connection.commit()
+		self.assertEqual(len(selectPlates(sql_connection)), 1)
+		self.assertEqual((sql_cache.hits, sql_cache.misses), (1, 2))
+		sql_connection.close()
+
+		def selectCollection (sql_connection):
+			sql_select = SQLSelect.fromConfig(config_data, sql_connection)
+			sql_select._in_threshold = 100
+			sql_select.addTableToSelect(config_data['collection'])
+			sql_select.addDictWhere({'collection': {'unique_id': ['Bulk-%s' % sample_pos for sample_pos in range(500)]}}, include = True, cmp_type = 'IN', dict_type = 'Table')
+			sql_select.select()
+			return sql_select.toDataFrame()
+
+		# Check that a repeated select using a temporary value table is returned from the cache
+		sql_connection = startSessionFromConfig(config_data)
+		self.assertEqual(len(selectCollection(sql_connection)), 500)
+		self.assertEqual(len(selectCollection(sql_connection)), 500)
+		self.assertEqual((sql_cache.hits, sql_cache.misses), (2, 3))
+		sql_connection.close()
+
+		# Check that results larger than the cache are not stored
+		sql_cache = SQLResultCache(max_memory_mb = 0.0001)
+		sql_cache.put('key', 'url', ['plates'], [('Cache-P%s' % plate_pos, ) for plate_pos in range(100)])
+		self.assertEqual(len(sql_cache), 0)
+
+	# Check the YAML indexes and SQLSelect missingIndexes function
+	def test_10_missingIndexes (self):
+
+		# Open the config
+		with open(self.config_filename) as config_file:
+			config_yaml = yaml.safe_load(config_file)
+
+		# Create a copy of the config with indexes, using a separate database
+		config_yaml['sql']['filename'] = os.path.join(self.test_dir, 'testDB_indexes.sqlite')
+		config_yaml['database']['indexes'] = {'storage_plate_well': {'table': 'storage', 'columns': ['plate', 'well']}}
+		config_yaml['database']['tables']['collection']['date_collected']['index'] = True
+		config_yaml['database']['tables']['sequencing']['sample_id']['index'] = True
+		index_config_filename = os.path.join(self.test_dir, 'testDB_indexes.yml')
+		with open(index_config_filename, 'w') as config_file:
+			yaml.safe_dump(config_yaml, config_file)
+		index_config_data = ConfigDB.readConfig(index_config_filename)
+		createAllFromConfig(index_config_data, createEngineFromConfig(index_config_data))
+
+		# Check that the column and composite indexes were created
+		sqlite_connection = sqlite3.connect(index_config_data.filename)
+		sqlite_indexes = [index_row[0] for index_row in sqlite_connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+		sqlite_connection.close()
+		self.assertIn('ix_sequencing_sample_id', sqlite_indexes)
+		self.assertIn('ix_collection_date_collected', sqlite_indexes)
+		self.assertIn('storage_plate_well', sqlite_indexes)
+
+		def explainStorage (where_dict):
+			sql_select = SQLSelect.fromConfig(index_config_data, sql_connection)
+			sql_select.addTableToSelect(index_config_data['storage'])
+			sql_select.addDictWhere({'storage': where_dict}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+			return sql_select.missingIndexes()
+
+		# Check that columns leading an index are not reported
+		sql_connection = startSessionFromConfig(index_config_data)
+		self.assertEqual(explainStorage({'plate': 'Explain-P1'}), {})
+		self.assertEqual(explainStorage({'sample_id': 'Explain-A1'}), {})
+
+		# Check that columns without an index are reported
+		self.assertEqual(explainStorage({'well': 'A1', 'sample_status': 'Used'}), {'storage': ['well', 'sample_status']})
+		sql_connection.close()
+
+	# Check the ConfigDB column index and SQLWhere assignColumn function
+	def test_11_columnIndex (self):
+
+		# Check the column index stores the position of each table
+		table_pos, sql_column, has_foreign_key = self.db_config_data.column_index['species'][0]
+		self.assertIs(self.db_config_data.sql_tables[table_pos], self.db_config_data['sequencing'])
+		self.assertIs(sql_column, self.db_config_data['sequencing'].columns['species'])
+		self.assertFalse(has_foreign_key)
+
+		# Check that columns are assigned using the index
+		sql_where = SQLWhere.fromConfig(self.db_config_data)
+		sql_where.addColDictWhere({'species': 'Apis mellifera'}, include = True, cmp_type = 'EQ')
+		self.assertEqual(sql_where._tables_used, [table_pos])
+
+		# Check that unknown and ambiguous columns are not assigned
+		self.assertRaisesRegex(Exception, 'Unable to assign where', sql_where.addColDictWhere, {'unknown_col': 'A1'}, include = True, cmp_type = 'EQ')
+		self.assertRaisesRegex(Exception, 'ambiguous', sql_where.addColDictWhere, {'plate': ['P1', 'P2']}, include = True, cmp_type = 'IN')
+
+	# Check SQLWhere inWhere function, using large IN statements
+	def test_12_inWhere (self):
+
+		# Assign the values, including those not in the database
+		unique_ids = ['Bulk-%s' % sample_pos for sample_pos in range(2500)] + ['Unknown-%s' % sample_pos for sample_pos in range(500)]
+
+		# Check that the values are compared using a temporary table
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_select = SQLSelect.fromConfig(self.db_config_data, sql_connection)
+		sql_select._in_threshold = 100
+		sql_select.addTableToSelect(self.db_config_data['collection'])
+		sql_select.addDictWhere({'collection': {'unique_id': unique_ids}}, include = True, cmp_type = 'IN', dict_type = 'Table')
+		self.assertIn('temp_values_', str(sql_select.selectStatement()))
+		sql_select.select()
+		self.assertEqual(len(sql_select.toDataFrame()), 2500)
+
+		# Check that the temporary table is dropped after the select, and created again if needed
+		self.assertEqual(sql_connection.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'").fetchall(), [])
+		self.assertEqual(sum([len(select_chunk) for select_chunk in sql_select.selectChunks()]), 2500)
+		self.assertEqual(sql_connection.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'").fetchall(), [])
+
+		# Check that the connection and threshold are assigned from the config
+		sql_where = SQLWhere.fromConfig(self.db_config_data, sql_connection)
+		sql_where.addTableDictWhere({'collection': {'unique_id': unique_ids}}, include = True, cmp_type = 'IN')
+		self.assertIn('temp_values_', str(sql_where.where_statement))
+
+		# Check the values may be excluded
+		sql_where = SQLWhere.fromQuery(self.db_config_data.sql_tables, sql_connection = sql_connection, in_threshold = 100)
+		sql_where.addTableDictWhere({'collection': {'unique_id': unique_ids}}, include = False, cmp_type = 'IN')
+		sql_where.addTableDictWhere({'collection': {'site_code': 'BLK'}}, include = True, cmp_type = 'EQ')
+		select_results = sql_connection.execute(select([self.db_config_data['collection']]).where(sql_where.where_statement)).fetchall()
+		self.assertEqual(len(select_results), 0)
+
+		# Check that chunked IN statements are used without a connection
+		sql_where = SQLWhere.fromQuery(self.db_config_data.sql_tables, in_threshold = 100)
+		sql_where.addTableDictWhere({'collection': {'unique_id': unique_ids}}, include = True, cmp_type = 'IN')
+		self.assertEqual(str(sql_where.where_statement).count(' IN '), 30)
+		select_results = sql_connection.execute(select([self.db_config_data['collection']]).where(sql_where.where_statement)).fetchall()
+		self.assertEqual(len(select_results), 2500)
+		sql_connection.close()
+
+	# Check upsert function
+	def test_13_upsert (self):
+
+		# Insert the plates without boxes
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_insert.addTableToInsert(self.db_config_data['plates'])
+		sql_insert.addDataFrameValues(pd.DataFrame({'plate': ['Upsert-P1', 'Upsert-P2']}))
+		sql_insert.bulkInsert()
+		sql_connection.commit()
+
+		# Upsert the plates, updating the existing plates and inserting a new plate, using multiple batches
+		sql_upsert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_upsert._sql_batch_size = 2
+		sql_upsert.addTableToInsert(self.db_config_data['plates'])
+		sql_upsert.addDataFrameValues(pd.DataFrame({'plate': ['Upsert-P1', 'Upsert-P2', 'Upsert-P3'], 'box': ['Upsert-B1', 'Upsert-B1', 'Upsert-B2']}))
+		sql_upsert.upsert(['plate'])
+		sql_connection.commit()
+
+		# Check that the values were inserted or updated
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'plate', 'Upsert-P1', expected_count = 1))
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'box', 'Upsert-B1', expected_count = 2))
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'box', 'Upsert-B2', expected_count = 1))
+
+		# Check that only the update columns are updated
+		sql_upsert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_upsert.addTableToInsert(self.db_config_data['plates'])
+		sql_upsert.addDataFrameValues(pd.DataFrame({'plate': ['Upsert-P3'], 'box': ['Upsert-B3']}))
+		sql_upsert.upsert(['plate'], update_cols = [])
+		sql_connection.commit()
+		self.assertTrue(checkValue(self.database_filename, 'plates', 'box', 'Upsert-B2', expected_count = 1))
+
+		# Check the postgresql statement
+		sql_upsert._sql_type = 'postgresql'
+		upsert_str = str(sql_upsert.upsertStatement(('plate', 'box'), ['plate'], ['box']).compile(dialect = postgresql_dialect()))
+		self.assertIn('ON CONFLICT (plate) DO UPDATE SET box = excluded.box', upsert_str)
+		sql_connection.close()
+
+	# Check SQL statement statistics
+	def test_14_sqlStatistics (self):
+
+		# Check the fingerprints, i.e. the literals and value lists are replaced
+		self.assertEqual(SQLStatistics.fingerprint("SELECT * FROM plates WHERE plate IN (?, ?, ?) AND box = 'B1'"), 'SELECT * FROM plates WHERE plate IN (?...) AND box = ?')
+		self.assertEqual(SQLStatistics.fingerprint('INSERT INTO plates (plate) VALUES (%(plate_m0)s), (%(plate_m1)s)'), 'INSERT INTO plates (plate) VALUES (?)...')
+		self.assertEqual(SQLStatistics.parameterBucket(5), '4-7')
+
+		# Confirm logging is enabled, as other tests may disable logging
+		logging.disable(logging.NOTSET)
+
+		# Record the statistics of a bulk insert and a selection, logging all statements
+		sql_statistics = startSQLStatisticsFromConfig(self.db_config_data, slow_seconds = 0)
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_insert = SQLInsert.fromConfig(self.db_config_data, sql_connection)
+		sql_insert.addTableToInsert(self.db_config_data['plates'])
+		sql_insert.addDataFrameValues(pd.DataFrame({'plate': ['Stats-P1', 'Stats-P2', 'Stats-P3']}))
+
+		# Insert the plates, the statement is logged as a warning
+		with self.assertLogs(level = 'WARNING'):
+			sql_insert.bulkInsert()
+		sql_connection.commit()
+
+		# Select the plates, the statement is logged as a warning
+		sql_select = SQLSelect.fromConfig(self.db_config_data, sql_connection)
+		sql_select.addTableToSelect(self.db_config_data['plates'])
+		sql_select.addDictWhere({'plates': {'plate': ['Stats-P1', 'Stats-P2']}}, include = True, cmp_type = 'IN', dict_type = 'Table')
+		with self.assertLogs(level = 'WARNING'):
+			sql_select.select()
+		self.assertEqual(len(sql_select.toDataFrame()), 2)
+		sql_connection.close()
+		sql_statistics.detach()
+
+		# Check the insert and selection were recorded
+		stats_summary = sql_statistics.summary(top_n = None)
+		insert_summary = stats_summary[stats_summary['statement'].str.startswith('INSERT INTO plates')]
+		self.assertEqual(len(insert_summary), 1)
+		self.assertEqual(insert_summary['rows'].sum(), 3)
+		self.assertTrue(stats_summary['statement'].str.contains('IN (?...)', regex = False).any())
+		self.assertEqual(len(sql_statistics.summary(top_n = 1)), 1)
+
+		# Check that statements are not recorded once detached
+		statement_count = stats_summary['count'].sum()
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_connection.execute(text('SELECT 1'))
+		sql_connection.close()
+		self.assertEqual(sql_statistics.summary(top_n = None)['count'].sum(), statement_count)
+
+	# Check summary tables
+	def test_15_summaries (self):
+
+		# Read in the config file
+		with open(self.config_filename) as config_file:
+			config_yaml = yaml.safe_load(config_file)
+
+		# Create a copy of the config with summaries, using a separate database
+		config_yaml['sql']['filename'] = os.path.join(self.test_dir, 'testDB_summaries.sqlite')
+		config_yaml['database']['summaries'] = {'species_counts': {'table': 'sequencing', 'group_by': 'species'},
+												'plate_well_counts': {'table': 'storage', 'group_by': ['plate', 'well']}}
+
+		# Write the copy of the config, then check the summaries are assigned
+		summary_config_filename = os.path.join(self.test_dir, 'testDB_summaries.yml')
+		with open(summary_config_filename, 'w') as config_file:
+			yaml.safe_dump(config_yaml, config_file)
+		summary_config_data = ConfigDB.readConfig(summary_config_filename)
+		self.assertEqual(sorted(summary_config_data.summaries), ['plate_well_counts', 'species_counts'])
+		self.assertNotIn('species_counts', summary_config_data.tables)
+		createAllFromConfig(summary_config_data, createEngineFromConfig(summary_config_data))
+
+		# Insert the sequences, the summary is updated by the triggers
+		sql_connection = startSessionFromConfig(summary_config_data)
+		sql_insert = SQLInsert.fromConfig(summary_config_data, sql_connection)
+		sql_insert.addTableToInsert(summary_config_data['sequencing'])
+		sql_insert.addDataFrameValues(pd.DataFrame({'sequence_id': ['Seq-1', 'Seq-2', 'Seq-3', 'Seq-4'], 'sample_id': ['S1', 'S2', 'S3', 'S4'],
+													'sequence_status': 'Species Identified', 'reads': '10', 'species': ['Bee A', 'Bee A', 'Bee B', None]}))
+		sql_insert.bulkInsert()
+		self.assertIn('species_counts', sql_connection.info['modified_tables'])
+		sql_connection.commit()
+
+		# Check the summary, including the group without a species
+		def speciesCounts ():
+			species_counts = pd.read_sql('SELECT species, row_count FROM species_counts', sql_connection.bind)
+			return dict(zip(species_counts['species'].fillna('None'), species_counts['row_count']))
+		self.assertEqual(speciesCounts(), {'Bee A': 2, 'Bee B': 1, 'None': 1})
+
+		# Check that updates and deletes are summarized, removing empty groups
+		sql_connection.execute(text("UPDATE sequencing SET species = 'Bee A' WHERE sequence_id = 'Seq-3'"))
+		sql_connection.execute(text("DELETE FROM sequencing WHERE sequence_id = 'Seq-4'"))
+		sql_connection.commit()
+		self.assertEqual(speciesCounts(), {'Bee A': 3})
+
+		# Check that the summaries are rebuilt from the source tables
+		sql_connection.execute(text('DELETE FROM species_counts'))
+		sql_connection.commit()
+		sql_connection.close()
+		self.assertEqual(rebuildSummariesFromConfig(summary_config_data, ['species_counts']), {'species_counts': 1})
+		sql_connection = startSessionFromConfig(summary_config_data)
+		self.assertEqual(speciesCounts(), {'Bee A': 3})
+		sql_connection.close()
+
+	# Check SQLSelect toColumnarFile function
+	@unittest.skipIf(pyarrow is None, 'pyarrow not installed')
+	def test_16_columnarFile (self):
+
+		# Select the rows inserted by bulkInsert
+		sql_connection = startSessionFromConfig(self.db_config_data)
+		sql_select = SQLSelect.fromConfig(self.db_config_data, sql_connection)
+		sql_select.addTableToSelect(self.db_config_data['collection'])
+		sql_select.addDictWhere({'collection': {'site_code': 'BLK'}}, include = True, cmp_type = 'EQ', dict_type = 'Table')
+		sql_select.select()
+		select_dataframe = sql_select.toDataFrame()
+
+		# Check the files are written in record batches, keeping the column types
+		for out_format, read_function in [('parquet', pyarrow.parquet.read_table), ('feather', pyarrow.feather.read_table)]:
+			columnar_filename = os.path.join(self.test_dir, f'select.{out_format}')
+			sql_select.toColumnarFile(columnar_filename, out_format, chunk_size = 1000)
+			columnar_table = read_function(columnar_filename)
+			self.assertEqual(columnar_table.column_names, list(select_dataframe.columns))
+			self.assertEqual(str(columnar_table.schema.field('date_collected').type), 'date32[day]')
+			self.assertEqual(sorted(columnar_table.column('unique_id').to_pylist()), sorted(select_dataframe['unique_id']))
+
+		# Check that unknown formats are not written
+		with self.assertRaises(Exception):
+			sql_select.toColumnarFile(os.path.join(self.test_dir, 'select.orc'), 'orc')
+		sql_connection.close()
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)
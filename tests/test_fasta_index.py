@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+import shutil
+import tempfile
+
+from Bio import SeqIO
+
+from kocher_tools.fasta_index import FASTAIndex
+
+# Run tests for fasta_index.py
+class test_fasta_index (unittest.TestCase):
+
+	@classmethod
+	def setUpClass (cls):
+
+		# Create a temporary directory
+		cls.test_dir = tempfile.mkdtemp()
+
+		# Assign the script directory
+		cls.script_dir = os.path.dirname(os.path.realpath(__file__))
+
+		# Assign the expected output directory
+		cls.expected_dir = 'test_files'
+
+		# Assign the expected path
+		cls.expected_path = os.path.join(cls.script_dir, cls.expected_dir)
+
+		# Copy the FASTA file, to keep the index within the test directory
+		cls.fasta_filename = os.path.join(cls.test_dir, 'test_barcode_01_input.fasta')
+		shutil.copy(os.path.join(cls.expected_path, 'test_barcode_01_input.fasta'), cls.fasta_filename)
+
+	@classmethod
+	def tearDownClass (cls):
+
+		# Remove the test directory after the tests
+		shutil.rmtree(cls.test_dir)
+
+	# Check FASTAIndex records function
+	def test_01_records (self):
+
+		# Assign the records using Biopython
+		seq_index = SeqIO.index(self.fasta_filename, 'fasta')
+		record_ids = list(seq_index.keys())
+		expected_records = [seq_index[record_id].format('fasta') for record_id in record_ids]
+		seq_index.close()
+
+		# Confirm the records are the same, in any order
+		with FASTAIndex(self.fasta_filename) as fasta_index:
+			self.assertEqual(len(fasta_index), len(record_ids))
+			self.assertEqual(fasta_index.records(record_ids), expected_records)
+			self.assertEqual(fasta_index.records(record_ids[::-1]), expected_records[::-1])
+
+			# Confirm missing IDs fail
+			with self.assertRaises(Exception):
+				fasta_index.records(['Missing-ID'])
+
+	# Check FASTAIndex sidecar index
+	def test_02_sidecarIndex (self):
+
+		# Create the index, then confirm the sidecar was written
+		FASTAIndex(self.fasta_filename).close()
+		self.assertTrue(os.path.isfile(f'{self.fasta_filename}.offsets'))
+
+		# Confirm the sidecar is read, without building the index
+		fasta_index = FASTAIndex(self.fasta_filename)
+		self.assertIsNone(fasta_index._fasta_mmap)
+		self.assertTrue('DBtest-A1_1;size=500' in fasta_index)
+		fasta_index.close()
+
+		# Confirm an out of date sidecar is rebuilt
+		with open(self.fasta_filename, 'a') as fasta_file:
+			fasta_file.write('\n>DBtest-Z1_1;size=1\nACGT\n')
+		with FASTAIndex(self.fasta_filename) as fasta_index:
+			self.assertEqual(fasta_index['DBtest-Z1_1;size=1'], '>DBtest-Z1_1;size=1\nACGT\n')
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)
@@ -9,10 +9,16 @@ import io
 import string
 import random
 import logging
+import zipfile
+import yaml
+
+from unittest.mock import patch
+from sqlalchemy import event
 
 from kocher_tools.config_file import ConfigDB
 from kocher_tools.database import *
 from kocher_tools.kocher_database import *
+from kocher_tools.fasta_index import FASTAIndex
 from tests.functions import checkValue, updateConfigFilename
 #from functions import checkValue
 
@@ -134,8 +140,139 @@ class test_kocher_database (unittest.TestCase):
 		json_filename = os.path.join(self.expected_path, 'test_barcode_01_input.json')
 		insertBarcodeFilesUsingConfig(self.db_config_data, 'sequencing', [blast_filename, fasta_filename, json_filename])
 
+		# Check that the offset index was not written next to the input
+		self.assertFalse(os.path.isfile(f'{fasta_filename}.offsets'))
+
 		# Check that the values were correctly inserted
 		self.assertTrue(checkValue(self.database_filename, 'sequencing', 'sample_id', 'DBtest-A1'))
 		self.assertTrue(checkValue(self.database_filename, 'sequencing', 'sequence_id', 'DBtest-A2_1'))
 		self.assertTrue(checkValue(self.database_filename, 'sequencing', 'species', 'Lasioglossum oenotherae'))
 		self.assertTrue(checkValue(self.database_filename, 'sequencing', 'sequence_status', 'Ambiguous Hits'))
+
+	# Check insertFilesUsingConfig
+	def test_04_insertFilesUsingConfig (self):
+
+		# Check if the config data wasn't assigned
+		if self.database_filename == None:
+
+			# Skip the test if so
+			self.skipTest('Requires database to operate. Check database tests for errors')
+
+		# Create a second database, to insert all the files
+		upload_config_filename = os.path.join(self.test_dir, 'testDB_upload.yml')
+		shutil.copy(os.path.join(self.expected_path, 'testDB_large.yml'), upload_config_filename)
+		updateConfigFilename(upload_config_filename, os.path.join(self.test_dir, 'testDB_upload.sqlite'))
+		upload_config_data = ConfigDB.readConfig(upload_config_filename)
+		createAllFromConfig(upload_config_data, createEngineFromConfig(upload_config_data))
+
+		# Assign the files, with the schemas out of dependency order
+		fasta_filename = os.path.join(self.expected_path, 'test_barcode_01_input.fasta')
+		upload_jobs = [('sequencing', [os.path.join(self.expected_path, 'test_barcode_01_input.out'), fasta_filename, os.path.join(self.expected_path, 'test_barcode_01_input.json')]),
+					   ('storage', [os.path.join(self.expected_path, 'test_storage_01_input.tsv')]),
+					   ('collection', [os.path.join(self.expected_path, 'test_collection_01_input.tsv')])]
+
+		# Record the synchronous pragma of the connection used by each insert
+		insert_pragmas = {}
+		def recordPragma (conn, cursor, statement, parameters, context, executemany):
+			if not statement.startswith('INSERT'):
+				return
+			insert_table = statement.split()[2].strip('"')
+			insert_pragmas.setdefault(insert_table, set()).add(conn.connection.execute('PRAGMA synchronous').fetchone()[0])
+		upload_engine = cachedEngineFromConfig(upload_config_data)
+		event.listen(upload_engine, 'before_cursor_execute', recordPragma)
+
+		# Insert the files, using a process pool
+		try:
+			upload_report = insertFilesUsingConfig(upload_config_data, upload_jobs, processes = 2)
+
+		# Remove the listener, even if the insert fails
+		finally:
+			event.remove(upload_engine, 'before_cursor_execute', recordPragma)
+
+		# Check that the inserts of every schema were fast-loaded
+		self.assertTrue({'collection', 'storage', 'sequencing'} <= set(insert_pragmas))
+		self.assertEqual(set().union(*insert_pragmas.values()), {0})
+
+		# Check the report is in dependency order and all were committed
+		self.assertEqual([job_report['schema'] for job_report in upload_report], ['collection', 'storage', 'sequencing'])
+		self.assertEqual(set([job_report['status'] for job_report in upload_report]), {'committed'})
+
+		# Check that the values were correctly inserted
+		self.assertTrue(checkValue(upload_config_data.filename, 'collection', 'unique_id', 'DBtest-0001'))
+		self.assertTrue(checkValue(upload_config_data.filename, 'storage', 'sample_id', 'DBtest-A2'))
+		self.assertTrue(checkValue(upload_config_data.filename, 'plates', 'box', 'DBBox'))
+		self.assertTrue(checkValue(upload_config_data.filename, 'sequencing', 'sequence_id', 'DBtest-A2_1'))
+
+		# Check that an invalid file fails before inserting
+		with self.assertRaises(Exception):
+			insertFilesUsingConfig(upload_config_data, [('storage', [fasta_filename])])
+
+	# Check prepBarcodeFilesUsingConfig using zip members
+	def test_05_prepBarcodeFilesFromZip (self):
+
+		# Check if the config data wasn't assigned
+		if self.database_filename == None:
+
+			# Skip the test if so
+			self.skipTest('Requires database to operate. Check database tests for errors')
+
+		# Assign the barcode files, then archive without the usual extensions
+		barcode_filenames = [os.path.join(self.expected_path, f'test_barcode_01_input.{barcode_ext}') for barcode_ext in ['out', 'fasta', 'json']]
+		zip_filename = os.path.join(self.test_dir, 'test_barcode_01_input.zip')
+		with zipfile.ZipFile(zip_filename, 'w', compression = zipfile.ZIP_DEFLATED) as zip_archive:
+			for barcode_filename, member_name in zip(barcode_filenames, ['failed.txt', 'blast.txt', 'seqs.txt']):
+				zip_archive.write(barcode_filename, arcname = member_name)
+
+		# Prep the files using the zip members, assigned by content
+		with zipfile.ZipFile(zip_filename) as zip_archive:
+			zip_members = [zip_archive.open(zip_member) for zip_member in zip_archive.infolist()]
+			zip_dataframes = prepBarcodeFilesUsingConfig(self.db_config_data, 'sequencing', zip_members)
+
+			# Close the zip members
+			for zip_member in zip_members:
+				zip_member.close()
+
+		# Check the zip members match the files
+		fasta_filename = os.path.join(self.test_dir, 'test_barcode_zip.fasta')
+		shutil.copy(barcode_filenames[1], fasta_filename)
+		file_dataframes = prepBarcodeFilesUsingConfig(self.db_config_data, 'sequencing', [barcode_filenames[0], fasta_filename, barcode_filenames[2]])
+		self.assertEqual(len(zip_dataframes), len(file_dataframes))
+		for zip_dataframe, file_dataframe in zip(zip_dataframes, file_dataframes):
+			self.assertTrue(zip_dataframe.equals(file_dataframe))
+
+	def test_06_prepBarcodeFilesIndexDir (self):
+
+		# Check if the config data wasn't assigned
+		if self.database_filename == None:
+
+			# Skip the test if so
+			self.skipTest('Requires database to operate. Check database tests for errors')
+
+		# Assign the barcode files, using a copy of the FASTA file to check the input directory is unchanged
+		barcode_filenames = [os.path.join(self.expected_path, f'test_barcode_01_input.{barcode_ext}') for barcode_ext in ['out', 'fasta', 'json']]
+		fasta_filename = os.path.join(self.test_dir, 'test_barcode_index.fasta')
+		shutil.copy(barcode_filenames[1], fasta_filename)
+		barcode_filenames[1] = fasta_filename
+
+		# Read in the config file
+		with open(self.config_filename) as config_file:
+			config_yaml = yaml.safe_load(config_file)
+
+		# Write a copy of the config file, with an index directory relative to the config
+		config_yaml['upload'] = {'fasta_index_dir': 'fasta_indexes'}
+		index_config_filename = os.path.join(self.test_dir, 'testDB_fasta_indexes.yml')
+		with open(index_config_filename, 'w') as config_file:
+			yaml.safe_dump(config_yaml, config_file, sort_keys = False)
+		index_config_data = ConfigDB.readConfig(index_config_filename)
+
+		# Check the index is only written within the index directory
+		index_dataframes = prepBarcodeFilesUsingConfig(index_config_data, 'sequencing', barcode_filenames)
+		self.assertEqual(len(os.listdir(os.path.join(self.test_dir, 'fasta_indexes'))), 1)
+		self.assertFalse(os.path.exists(f'{fasta_filename}.offsets'))
+
+		# Check the cached index is used, rather than being rebuilt
+		with patch.object(FASTAIndex, '_buildIndex', side_effect = Exception('FASTA index was rebuilt')):
+			cached_dataframes = prepBarcodeFilesUsingConfig(index_config_data, 'sequencing', barcode_filenames)
+		self.assertEqual(len(index_dataframes), len(cached_dataframes))
+		for index_dataframe, cached_dataframe in zip(index_dataframes, cached_dataframes):
+			self.assertTrue(index_dataframe.equals(cached_dataframe))
@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+import shutil
+import tempfile
+
+from kocher_tools.config_file import ConfigDB
+from kocher_tools.database import *
+from kocher_tools.synthetic_database import SyntheticDatabase
+from kocher_tools.benchmark_database import writeBenchmarkConfig, createBenchmarkTables
+from tests.functions import checkValue
+
+# Run tests for synthetic_database.py
+class test_synthetic_database (unittest.TestCase):
+
+	@classmethod
+	def setUpClass (cls):
+
+		# Create a temporary directory
+		cls.test_dir = tempfile.mkdtemp()
+
+		# Assign the script directory
+		cls.script_dir = os.path.dirname(os.path.realpath(__file__))
+
+		# Assign the expected output directory
+		cls.expected_dir = 'test_files'
+
+		# Assign the expected path
+		cls.expected_path = os.path.join(cls.script_dir, cls.expected_dir)
+
+		# Create the benchmark config and tables
+		sql_dict = {'type': 'sqlite', 'filename': os.path.join(cls.test_dir, 'benchmark.sqlite')}
+		cls.config_filename = writeBenchmarkConfig(os.path.join(cls.expected_path, 'testDB_large.yml'), sql_dict, os.path.join(cls.test_dir, 'benchmark.yml'))
+		cls.config_data = ConfigDB.readConfig(cls.config_filename)
+		createBenchmarkTables(cls.config_data, False)
+
+	@classmethod
+	def tearDownClass (cls):
+
+		# Remove the test directory after the tests
+		shutil.rmtree(cls.test_dir)
+
+	# Check SyntheticDatabase dataframes
+	def test_01_dataFrames (self):
+
+		# Simulate more samples than a single plate
+		simulation_job = SyntheticDatabase(rows = 200, seed = 1)
+		storage_dataframe = simulation_job.storageDataFrame()
+
+		# Confirm the samples are assigned to wells of each plate
+		self.assertEqual(len(simulation_job.platesDataFrame()), 3)
+		self.assertEqual(len(simulation_job.boxesDataFrame()), 1)
+		self.assertEqual(storage_dataframe['sample_id'].iloc[96], 'SYN-P00001-A1')
+		self.assertFalse(storage_dataframe['sample_id'].duplicated().any())
+
+		# Confirm the sequencing samples match the storage samples
+		self.assertTrue(simulation_job.sequencingDataFrame()['sample_id'].equals(storage_dataframe['sample_id']))
+
+	# Check the dataframes may be inserted and joined
+	def test_02_insertDataFrames (self):
+
+		# Insert the dataframes, in dependency order
+		simulation_job = SyntheticDatabase(rows = 200, seed = 1)
+		sql_connection = startSessionFromConfig(self.config_data)
+		bulk_loader = BulkLoader.fromConfig(self.config_data, sql_connection)
+		bulk_loader.load(self.config_data['collection'], simulation_job.collectionDataFrame())
+		bulk_loader.load(self.config_data['boxes'], simulation_job.boxesDataFrame())
+		bulk_loader.load(self.config_data['plates'], simulation_job.platesDataFrame())
+		bulk_loader.load(self.config_data['storage'], simulation_job.storageDataFrame())
+		bulk_loader.load(self.config_data['sequencing'], simulation_job.sequencingDataFrame())
+		sql_connection.commit()
+		self.assertTrue(checkValue(self.config_data.filename, 'sequencing', 'sample_id', 'SYN-P00002-A1'))
+
+		# Confirm the tables are joined, using multiple where statements
+		sql_select = SQLSelect.fromConfig(self.config_data, sql_connection)
+		for table in ['collection', 'storage', 'sequencing']:
+			sql_select.addTableToSelect(self.config_data[table])
+		sql_select.addDictWhere({'collection': {'unique_id': ['SYN-0000000', 'SYN-0000199', 'Unknown']}}, include = True, cmp_type = 'IN', dict_type = 'Table')
+		sql_select.select()
+		self.assertEqual(len(sql_select.select_results), 2)
+		sql_connection.close()
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)
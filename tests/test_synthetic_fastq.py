@@ -0,0 +1,108 @@
+import os
+import sys
+import gzip
+import unittest
+import shutil
+import tempfile
+import pkg_resources
+
+from Bio import SeqIO
+
+from kocher_tools.synthetic_fastq import SyntheticFASTQs
+
+# Run tests for synthetic_fastq.py
+class test_synthetic_fastq (unittest.TestCase):
+
+	@classmethod
+	def setUpClass (cls):
+
+		# Create a temporary directory
+		cls.test_dir = tempfile.mkdtemp()
+
+		# Assign the script directory
+		cls.script_dir = os.path.dirname(os.path.realpath(__file__))
+
+		# Assign the expected output directory
+		cls.expected_dir = 'test_files'
+
+		# Assign the expected path
+		cls.expected_path = os.path.join(cls.script_dir, cls.expected_dir)
+
+		# Assign the map files
+		cls.i5_map = os.path.join(cls.expected_path, 'test_pipeline_i5_map.txt')
+		cls.i7_map = pkg_resources.resource_filename('kocher_tools', 'data/i7_map.txt')
+
+	@classmethod
+	def tearDownClass (cls):
+
+		# Remove the test directory after the tests
+		shutil.rmtree(cls.test_dir)
+
+	# Check SyntheticFASTQs fromMaps function
+	def test_01_fromMaps (self):
+
+		# Assign the samples using the maps
+		simulation_job = SyntheticFASTQs.fromMaps(self.i5_map, self.i7_map)
+
+		# Confirm each plate/well combination was assigned
+		self.assertEqual(len(simulation_job.samples), 2 * 96)
+		self.assertEqual(simulation_job.samples[0], ('SD_04_Lep_A1', 'ATGCGGAT', 'CTTTGGAC'))
+
+	# Check SyntheticFASTQs writeFASTQs function
+	def test_02_writeFASTQs (self):
+
+		# Simulate reads without index errors, using multiple chunks
+		simulation_job = SyntheticFASTQs.fromMaps(self.i5_map, self.i7_map, read_count = 250, chunk_size = 100, read_len = 50, well_skew = 1.0, seed = 1)
+		fastq_filenames, sample_counts = simulation_job.writeFASTQs(os.path.join(self.test_dir, 'Reads'))
+
+		# Confirm the reads were assigned
+		self.assertEqual(sum(sample_counts.values()), 250)
+
+		# Confirm the skew assigned the most reads to the first sample
+		self.assertEqual(max(sample_counts, key = sample_counts.get), 'SD_04_Lep_A1')
+
+		# Assign the barcodes of each sample
+		sample_barcodes = set([(i7_barcode, i5_barcode) for _, i7_barcode, i5_barcode in simulation_job.samples])
+
+		# Open the simulated files
+		with gzip.open(fastq_filenames['i7'], 'rt') as i7_file, gzip.open(fastq_filenames['i5'], 'rt') as i5_file, gzip.open(fastq_filenames['R1'], 'rt') as r1_file:
+
+			# Confirm the reads are paired and the barcodes are from the samples
+			read_count = 0
+			for i7_record, i5_record, r1_record in zip(SeqIO.parse(i7_file, 'fastq'), SeqIO.parse(i5_file, 'fastq'), SeqIO.parse(r1_file, 'fastq')):
+				self.assertEqual(i7_record.id, r1_record.id)
+				self.assertIn((str(i7_record.seq), str(i5_record.seq)), sample_barcodes)
+				self.assertEqual(len(r1_record.seq), 50)
+				read_count += 1
+			self.assertEqual(read_count, 250)
+
+	# Check SyntheticFASTQs index errors
+	def test_03_indexErrors (self):
+
+		# Simulate reads with every index base substituted
+		simulation_job = SyntheticFASTQs.fromMaps(self.i5_map, self.i7_map, read_count = 50, index_error_rate = 1.0, seed = 1)
+		fastq_filenames, _ = simulation_job.writeFASTQs(os.path.join(self.test_dir, 'Errors'))
+
+		# Confirm no i5 read matches the barcodes
+		i5_barcodes = set([i5_barcode for _, _, i5_barcode in simulation_job.samples])
+		with gzip.open(fastq_filenames['i5'], 'rt') as i5_file:
+			for i5_record in SeqIO.parse(i5_file, 'fastq'):
+				self.assertNotIn(str(i5_record.seq), i5_barcodes)
+
+	# Check SyntheticFASTQs fromIndex and writeIndex functions
+	def test_04_writeIndex (self):
+
+		# Write an index from the maps, then reload it
+		simulation_job = SyntheticFASTQs.fromMaps(self.i5_map, self.i7_map)
+		index_filename = simulation_job.writeIndex(os.path.join(self.test_dir, 'index.tsv'), method = 'deML')
+		index_job = SyntheticFASTQs.fromIndex(index_filename, 'tsv')
+
+		# Confirm the samples are the same
+		self.assertEqual(index_job.samples, simulation_job.samples)
+
+		# Confirm unknown quality profiles fail
+		with self.assertRaises(Exception):
+			SyntheticFASTQs.fromMaps(self.i5_map, self.i7_map, quality_profile = 'unknown')
+
+if __name__ == "__main__":
+	unittest.main(verbosity = 2)